@@ -6,7 +6,6 @@ import hashlib
 from itsdangerous import URLSafeTimedSerializer
 from flask_cors import CORS
 from datetime import datetime, timedelta
-import random
 from werkzeug.utils import secure_filename
 import os
 from zoneinfo import ZoneInfo
@@ -24,8 +23,14 @@ from email.mime.multipart import MIMEMultipart
 import pandas as pd
 import traceback
 import uuid
-import requests
-from io import BytesIO
+import threading
+import time
+from functools import lru_cache
+from collections import OrderedDict
+import json
+import queue
+import tempfile
+from io import BytesIO, StringIO
 from html import escape
 from email.mime.application import MIMEApplication
 
@@ -34,8 +39,54 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from db import get_db, execute_query, execute_insert, execute_update, get_pool_status
-from flask import send_file
+from db import (
+    get_db,
+    get_read_db,
+    execute_query,
+    execute_insert,
+    execute_update,
+    get_pool_status,
+    get_replica_status,
+)
+import query_profiler
+from outbox import enqueue_email, start_outbox_workers
+from catalogue_sync import (
+    CATALOGUE_BUNDLE,
+    CATALOGUE_PRODUCT,
+    current_catalogue_version,
+    note_catalogue_changes,
+    read_catalogue_changes,
+    record_catalogue_changes
+)
+from import_jobs import (
+    IMPORT_JOB_DIR,
+    IMPORT_JOB_MAX_ERRORS,
+    create_import_job,
+    get_import_job,
+    import_job_path,
+    new_import_job_id,
+    start_import_job_workers,
+)
+from material_ledger import (
+    draw_material_supplies,
+    record_material_movements,
+    record_material_supply,
+    record_sale_consumption,
+    return_material_supplies,
+    reverse_sale_consumption,
+)
+from sales_archive import archived_sale_id, sales_sources, tier_source
+from stk_payments import (
+    create_stk_payment,
+    record_stk_callback,
+    get_stk_payment,
+    submit_stk_push,
+)
+from kitchen_feed import (
+    KITCHEN_FEED_HEARTBEAT, KITCHEN_FEED_RESUME_LIMIT, kitchen_hub, record_kitchen_event,
+    read_kitchen_events, oldest_kitchen_event_id, latest_kitchen_event_id
+)
+from flask import send_file, Response, stream_with_context
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import mm
 from itsdangerous import URLSafeTimedSerializer, URLSafeSerializer
@@ -51,6 +102,8 @@ serializer = URLSafeSerializer(
     salt="invoice-link"
 )
 
+# Tokens are deterministic, so listing pages reuse them instead of re-signing
+@lru_cache(maxsize=50000)
 def generate_invoice_token(invoice_id, business_id):
     return serializer.dumps({
         "invoice_id": invoice_id,
@@ -83,6 +136,12 @@ EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Background delivery of queued emails (OUTBOX_WORKERS=0 disables it)
+start_outbox_workers()
+
+# Query count, DB time and pool wait per request, served on /metrics
+query_profiler.init_app(app)
+
 
 @app.before_request
 def before_request():
@@ -140,18 +199,97 @@ def send_email(to_email, subject, html_content):
         return False
 
 
-def generate_order_number():
-    """Generate unique order number"""
-    while True:
-        number = str(random.randint(0, 999999)).zfill(6)
-        order_number = "ORD" + number
-        result = execute_query(
-            "SELECT 1 FROM sales WHERE order_number = :order_number",
-            {"order_number": order_number},
-            fetch_all=True
+# Order numbers are handed out from blocks reserved per business by each worker
+ORDER_NUMBER_BLOCK_SIZE = int(os.getenv("ORDER_NUMBER_BLOCK_SIZE", 100))
+# Legacy orders carry random ORD numbers spread over all six digits, so the
+# sequence numbers its own prefix from 1 instead of continuing past them
+ORDER_NUMBER_PREFIX = "ORS"
+
+order_number_blocks = {}
+order_number_lock = threading.Lock()
+
+def reserve_order_number_block(business_id, block_size=ORDER_NUMBER_BLOCK_SIZE):
+    """
+    Reserve a contiguous block of order numbers for this worker.
+    The first reservation for a business seeds the sequence past any
+    ORDER_NUMBER_PREFIX number already used in sales or restaurant_orders.
+    Returns (first_value, end_value) with end_value exclusive.
+    """
+    with get_db() as db:
+        db.execute(
+            text("""
+                INSERT IGNORE INTO order_number_sequences (business_id, next_value)
+                SELECT :business_id, GREATEST(
+                    (
+                        SELECT COALESCE(MAX(CAST(SUBSTRING(order_number, :number_start) AS UNSIGNED)), 0)
+                        FROM sales
+                        WHERE business_id = :business_id
+                        AND order_number LIKE :prefix_pattern
+                    ),
+                    (
+                        SELECT COALESCE(MAX(CAST(SUBSTRING(order_number, :number_start) AS UNSIGNED)), 0)
+                        FROM sales_archive
+                        WHERE business_id = :business_id
+                        AND order_number LIKE :prefix_pattern
+                    ),
+                    (
+                        SELECT COALESCE(MAX(CAST(SUBSTRING(order_number, :number_start) AS UNSIGNED)), 0)
+                        FROM restaurant_orders
+                        WHERE business_id = :business_id
+                        AND order_number LIKE :prefix_pattern
+                    )
+                ) + 1
+            """),
+            {
+                "business_id": business_id,
+                "number_start": len(ORDER_NUMBER_PREFIX) + 1,
+                "prefix_pattern": f"{ORDER_NUMBER_PREFIX}%"
+            }
+        )
+
+        first_value = db.execute(
+            text("""
+                SELECT next_value
+                FROM order_number_sequences
+                WHERE business_id = :business_id
+                FOR UPDATE
+            """),
+            {"business_id": business_id}
+        ).scalar()
+
+        db.execute(
+            text("""
+                UPDATE order_number_sequences
+                SET next_value = next_value + :block_size
+                WHERE business_id = :business_id
+            """),
+            {
+                "block_size": block_size,
+                "business_id": business_id
+            }
         )
-        if not result:
-            return order_number
+
+    first_value = int(first_value)
+    return first_value, first_value + block_size
+
+
+def generate_order_number(business_id):
+    """
+    Generate unique order number from this worker's reserved block.
+    Numbers are zero-padded to six digits; a business past 999999 orders
+    gets seven, which stay unique since the prefix is the sequence's own.
+    """
+    with order_number_lock:
+        block = order_number_blocks.get(business_id)
+
+        if not block or block[0] >= block[1]:
+            block = list(reserve_order_number_block(business_id))
+            order_number_blocks[business_id] = block
+
+        value = block[0]
+        block[0] += 1
+
+    return ORDER_NUMBER_PREFIX + str(value).zfill(6)
 
 def get_business_id():
     if session.get("role") == "super_admin":
@@ -785,6 +923,8 @@ def update_business(business_id):
             }
         )
 
+        business_cache.invalidate(business_id)
+
         execute_update(
             """
             UPDATE users
@@ -1100,6 +1240,138 @@ def reset_password(token):
             "error": "Database update failed"
         }), 500
 
+# ==================== BUSINESS PROFILE CACHE ====================
+
+BUSINESS_CACHE_MAX_ENTRIES = int(os.getenv("BUSINESS_CACHE_MAX_ENTRIES", 5000))
+BUSINESS_CACHE_TTL_SECONDS = float(os.getenv("BUSINESS_CACHE_TTL_SECONDS", 300))
+BUSINESS_CACHE_POLL_SECONDS = float(os.getenv("BUSINESS_CACHE_POLL_SECONDS", 5))
+
+
+class BusinessProfileCache:
+    """
+    Per-worker cache of businesses rows, bounded by entries and TTL.
+    Updates made in this worker invalidate their business directly. Updates
+    made by other workers are picked up by one poll of businesses.updated_at
+    per BUSINESS_CACHE_POLL_SECONDS for the whole worker, so a cached read
+    costs no query and a change is seen everywhere within the poll interval.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, poll_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.poll_seconds = poll_seconds
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.polled_at = None
+        self.polled_monotonic = 0.0
+        self.lock = threading.Lock()
+        self.poll_lock = threading.Lock()
+
+    def get(self, business_id):
+        """The business's profile, or None when the business does not exist"""
+        business_id = str(business_id)
+        self.poll_changes()
+
+        with self.lock:
+            entry = self.entries.get(business_id)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+                self.entries.move_to_end(business_id)
+                return entry[0]
+
+            generation = self.generations.get(business_id, 0)
+
+        profile = load_business_profile(business_id)
+
+        if profile is not None:
+            self.put(business_id, profile, generation)
+
+        return profile
+
+    def put(self, business_id, profile, generation):
+        with self.lock:
+            # The business was updated while this profile was loading
+            if self.generations.get(business_id, 0) != generation:
+                return
+
+            self.entries[business_id] = (profile, time.monotonic())
+            self.entries.move_to_end(business_id)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, business_id):
+        business_id = str(business_id)
+
+        with self.lock:
+            self.generations[business_id] = self.generations.get(business_id, 0) + 1
+            self.entries.pop(business_id, None)
+
+    def poll_changes(self):
+        """Drop businesses updated since the last poll, at most once per poll interval"""
+        if time.monotonic() - self.polled_monotonic < self.poll_seconds:
+            return
+
+        # One request polls, the others keep serving from the cache meanwhile
+        if not self.poll_lock.acquire(blocking=False):
+            return
+
+        try:
+            with get_db() as db:
+                now = db.execute(text("SELECT NOW()")).scalar()
+                changed = []
+
+                if self.polled_at is not None:
+                    # updated_at has one-second resolution, so look back an extra second
+                    changed = db.execute(
+                        text("""
+                            SELECT id
+                            FROM businesses
+                            WHERE updated_at >= :since
+                        """),
+                        {"since": self.polled_at - timedelta(seconds=1)}
+                    ).fetchall()
+
+            for row in changed:
+                self.invalidate(row[0])
+
+            self.polled_at = now
+            self.polled_monotonic = time.monotonic()
+
+        except Exception as e:
+            print("⚠ Business cache poll failed, dropping cached profiles:", e)
+            with self.lock:
+                for business_id in list(self.entries):
+                    self.generations[business_id] = self.generations.get(business_id, 0) + 1
+                self.entries.clear()
+
+        finally:
+            self.poll_lock.release()
+
+
+business_cache = BusinessProfileCache(
+    BUSINESS_CACHE_MAX_ENTRIES,
+    BUSINESS_CACHE_TTL_SECONDS,
+    BUSINESS_CACHE_POLL_SECONDS
+)
+
+
+def load_business_profile(business_id):
+    with get_db() as db:
+        business = db.execute(
+            text("""
+                SELECT id, name, email, phone, address, city, country, logo,
+                       business_type, language, currency, monthly_target, updated_at,
+                       has_stk_api, stk_app_id, stk_api_key,
+                       stk_callback_url, stk_error_callback_url
+                FROM businesses
+                WHERE id = :business_id
+            """),
+            {"business_id": business_id}
+        ).mappings().fetchone()
+
+    return dict(business) if business else None
+
+
 @app.route("/check-session")
 def check_session():
     if "user" not in session:
@@ -1112,21 +1384,12 @@ def check_session():
     currency = "KES"
 
     if business_id:
-        with get_db() as conn:
-            result = conn.execute(text("""
-                SELECT has_stk_api, language, currency
-                FROM businesses
-                WHERE id = :business_id
-            """), {
-                "business_id": business_id
-            })
-
-            business = result.mappings().fetchone()
+        business = business_cache.get(business_id)
 
-            if business:
-                has_stk_api = bool(business["has_stk_api"])
-                language = business["language"] or "en"
-                currency = business["currency"] or "KES"
+        if business:
+            has_stk_api = bool(business["has_stk_api"])
+            language = business["language"] or "en"
+            currency = business["currency"] or "KES"
 
     return jsonify({
         "logged_in": True,
@@ -1143,12 +1406,14 @@ def check_session():
 
 @app.route("/api/stk-push", methods=["POST"])
 def stk_push():
+    """
+    Queue an STK push and return its tracking reference at once; the
+    gateway call runs on the stk_payments thread pool, so a slow gateway
+    no longer holds a request worker.
+    """
     try:
         business_id = get_business_id()
-        data = request.get_json()
-
-        print("STK DATA RECEIVED:", data)
-        print("BUSINESS ID:", business_id)
+        data = request.get_json() or {}
 
         phone = data.get("phoneNumber")
         amount = data.get("amount")
@@ -1159,15 +1424,7 @@ def stk_push():
         if not amount:
             return jsonify({"error": "Amount is required"}), 400
 
-        with get_db() as conn:
-            business = conn.execute(text("""
-                SELECT has_stk_api, stk_app_id, stk_api_key,
-                       stk_callback_url, stk_error_callback_url
-                FROM businesses
-                WHERE id = :business_id
-            """), {"business_id": business_id}).mappings().fetchone()
-
-        print("BUSINESS STK CONFIG:", business)
+        business = business_cache.get(business_id) if business_id else None
 
         if not business:
             return jsonify({"error": "Business not found"}), 404
@@ -1175,54 +1432,66 @@ def stk_push():
         if not business["has_stk_api"]:
             return jsonify({"error": "STK Push is not enabled for this business"}), 400
 
-        payload = {
-            "phoneNumber": phone,
-            "amount": str(amount),
-            "reference": str(uuid.uuid4())[:12],
-            "countryCode": "KE",
-            "telco": "SAFARICOM",
-            "narration": "POS Payment",
-            "callBackUrl": business["stk_callback_url"],
-            "errorCallBackUrl": business["stk_error_callback_url"],
-        }
+        reference, callback_token = create_stk_payment(business_id, phone, amount)
+        submit_stk_push(reference, callback_token, phone, amount, business)
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "x-app-id": business["stk_app_id"],
-            "x-api-key": business["stk_api_key"],
-        }
+        return jsonify({
+            "reference": reference,
+            "status": "queued",
+            "status_url": f"/api/stk-push/{reference}"
+        }), 202
 
-        print("STK PAYLOAD:", payload)
-        print("STK HEADERS:", {
-            "Accept": headers["Accept"],
-            "Content-Type": headers["Content-Type"],
-            "x-app-id": headers["x-app-id"],
-            "x-api-key": "HIDDEN"
-        })
+    except Exception as e:
+        print("❌ STK PUSH ERROR:", e)
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
-        response = requests.post(
-            "https://sandboxkonnectapi.creditbank.co.ke/safaricom-stkpush",
-            json=payload,
-            headers=headers,
-            timeout=30
-        )
 
-        print("CREDIT BANK STATUS:", response.status_code)
-        print("CREDIT BANK RESPONSE:", response.text)
+@app.route("/api/stk-push/<reference>", methods=["GET"])
+def stk_push_status(reference):
+    """
+    Current status of a push, read without waiting; the till polls it
+    with a growing interval until the payment settles.
+    """
+    business_id = get_business_id()
 
-        try:
-            response_data = response.json()
-        except Exception:
-            response_data = {"raw_response": response.text}
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
+
+    try:
+        payment = get_stk_payment(business_id, reference)
+
+        if not payment:
+            return jsonify({"error": "Payment not found"}), 404
 
-        if response.status_code >= 500:
-           return jsonify(response_data), 400    
+        payment["amount"] = float(payment["amount"])
+        for key in ("created_at", "updated_at", "completed_at"):
+            if payment[key]:
+                payment[key] = payment[key].isoformat()
 
-        return jsonify(response_data), response.status_code
+        return jsonify(payment), 200
 
     except Exception as e:
-        print("❌ STK PUSH ERROR:", e)
+        print("❌ STK STATUS ERROR:", e)
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/stk-callback/<reference>/<callback_token>", methods=["POST"])
+def stk_callback(reference, callback_token):
+    """Gateway callback for a push sent with STK_CALLBACK_BASE_URL set"""
+    try:
+        payload = request.get_json(silent=True) or request.form.to_dict()
+        errored = request.args.get("outcome") == "error"
+
+        if not record_stk_callback(reference, callback_token, payload, errored):
+            return jsonify({"error": "Unknown payment"}), 404
+
+        return jsonify({"ResultCode": 0, "ResultDesc": "Accepted"}), 200
+
+    except Exception as e:
+        print("❌ STK CALLBACK ERROR:", e)
+        traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 
@@ -1296,92 +1565,65 @@ def sales_data():
 
     try:
         current_date = datetime.now()
-        first_day_of_month = current_date.replace(day=1).strftime('%Y-%m-%d')
-        last_day_of_month = (current_date.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        last_day_str = last_day_of_month.strftime('%Y-%m-%d')
+        first_day_of_month = current_date.replace(day=1).date()
+
+        # Last 6 months, oldest first, built without a database round trip
+        months = []
+        month_start = first_day_of_month
+        for _ in range(6):
+            months.insert(0, month_start)
+            month_start = (month_start - timedelta(days=1)).replace(day=1)
+
+        with get_read_db() as db:
+            # Chart and totals come from the pre-aggregated daily rollup
+            monthly_rows = db.execute(
+                text("""
+                    SELECT 
+                        DATE_FORMAT(sale_day, '%Y-%m') AS month_key,
+                        SUM(total_sales) AS total_sales
+                    FROM sales_daily_rollups
+                    WHERE business_id = :business_id
+                    AND sale_day >= :start_date
+                    GROUP BY month_key
+                """),
+                {
+                    "business_id": business_id,
+                    "start_date": months[0]
+                }
+            ).mappings().fetchall()
 
-        # Get date range for chart (last 6 months)
-        date_range_query = """
-            SELECT 
-                DATE_FORMAT(DATE_SUB(CURRENT_DATE(), INTERVAL 5 MONTH), '%Y-%m-01') AS start_date,
-                LAST_DAY(CURRENT_DATE()) AS end_date
-        """
-        date_range = execute_query(date_range_query, fetch_all=True)[0]
-
-        # Generate all months in range
-        all_months_query = """
-            WITH RECURSIVE months AS (
-                SELECT :start_date AS month_start
-                UNION ALL
-                SELECT DATE_ADD(month_start, INTERVAL 1 MONTH)
-                FROM months
-                WHERE month_start < :end_date
-            )
-            SELECT DATE_FORMAT(month_start, '%b') AS month_abbr,
-                   DATE_FORMAT(month_start, '%Y-%m') AS month_key
-            FROM months
-            ORDER BY month_start
-            LIMIT 6
-        """
-        all_months = execute_query(
-            all_months_query, 
-            {"start_date": date_range['start_date'], "end_date": date_range['end_date']},
-            fetch_all=True
-        )
+            metrics = db.execute(
+                text("""
+                    SELECT 
+                        (SELECT COUNT(*) FROM products WHERE business_id = :business_id) AS products_count,
+                        (SELECT COALESCE(SUM(order_count), 0) FROM sales_daily_rollups WHERE business_id = :business_id) AS orders_count,
+                        (SELECT COUNT(*) FROM customers WHERE business_id = :business_id) AS customers_count,
+                        (SELECT SUM(total_sales) FROM sales_daily_rollups WHERE business_id = :business_id) AS total_sales,
+                        (SELECT SUM(total_sales) FROM sales_daily_rollups
+                         WHERE business_id = :business_id
+                         AND sale_day >= :first_day) AS current_month_sales
+                """),
+                {
+                    "business_id": business_id,
+                    "first_day": first_day_of_month
+                }
+            ).mappings().fetchone()
 
-        # Get sales data for chart
-        sales_query = """
-            SELECT 
-                DATE_FORMAT(s.sale_date, '%b') AS month,
-                DATE_FORMAT(s.sale_date, '%Y-%m') AS month_key,
-                SUM(s.total_price) AS total_sales
-            FROM sales s
-            WHERE s.sale_date >= :start_date
-                AND s.sale_date <= :end_date
-                AND s.status = 'completed'
-                AND s.business_id = :business_id
-            GROUP BY month_key, month
-        """
-        sales_data = execute_query(
-            sales_query,
-            {"start_date": date_range['start_date'], "end_date": date_range['end_date'], "business_id": business_id},
-            fetch_all=True
-        )
-        
-        sales_dict = {row['month_key']: row for row in sales_data}
+        sales_dict = {row['month_key']: row for row in monthly_rows}
 
         # Prepare chart data
         labels = []
         sales_values = []
-        for month in all_months:
-            labels.append(month['month_abbr'])
-            if month['month_key'] in sales_dict:
-                sales_values.append(float(sales_dict[month['month_key']]['total_sales']))
+        for month in months:
+            labels.append(month.strftime('%b'))
+            month_key = month.strftime('%Y-%m')
+            if month_key in sales_dict:
+                sales_values.append(float(sales_dict[month_key]['total_sales']))
             else:
                 sales_values.append(0.0)
 
-        # Get metrics data
-        metrics_query = """
-            SELECT 
-                (SELECT COUNT(*) FROM products WHERE business_id = :business_id) AS products_count,
-                (SELECT COUNT(*) FROM sales WHERE status = 'completed' AND business_id = :business_id) AS orders_count,
-                (SELECT COUNT(*) FROM customers WHERE business_id = :business_id) AS customers_count,
-                (SELECT SUM(total_price) FROM sales WHERE status = 'completed' AND business_id = :business_id) AS total_sales,
-                (SELECT SUM(total_price) FROM sales 
-                 WHERE status = 'completed'
-                 AND sale_date BETWEEN :first_day AND :last_day
-                 AND business_id = :business_id) AS current_month_sales,
-(SELECT monthly_target FROM businesses WHERE id = :business_id) AS monthly_target
-        """
-        metrics = execute_query(
-            metrics_query,
-            {
-                "business_id": business_id,
-                "first_day": first_day_of_month,
-                "last_day": last_day_str
-            },
-            fetch_all=True
-        )[0]
+        business = business_cache.get(business_id)
+        monthly_target = business["monthly_target"] if business else None
 
         return jsonify({
             "labels": labels,
@@ -1389,9 +1631,9 @@ def sales_data():
             "metrics": {
                 "total_sales": float(metrics['total_sales']) if metrics['total_sales'] else 0.0,
                 "current_month_sales": float(metrics['current_month_sales']) if metrics['current_month_sales'] else 0.0,
-                "monthly_target": float(metrics['monthly_target']) if metrics['monthly_target'] else 500000.0,
+                "monthly_target": float(monthly_target) if monthly_target else 500000.0,
                 "products_count": metrics['products_count'],
-                "orders_count": metrics['orders_count'],
+                "orders_count": int(metrics['orders_count'] or 0),
                 "customers_count": metrics['customers_count']
             }
         })
@@ -1716,6 +1958,9 @@ def add_product():
             "business_id": business_id
         })
 
+        note_catalogue_changes(business_id, product_ids=[product_id])
+        barcode_index.invalidate(business_id, [product_id])
+
         if ingredients and isinstance(ingredients, list):
             for material_id in ingredients:
                 execute_insert(
@@ -1753,134 +1998,114 @@ def add_product():
         traceback.print_exc()
         return jsonify({"error": "Internal server error"}), 500
 
-def send_low_stock_email_if_needed(product_id, business_id):
-    try:
-        with get_db() as db:
-            product = db.execute(text("""
-                SELECT 
-                    p.product_id,
-                    p.product_name,
-                    p.product_number,
-                    p.product_stock,
-                    p.reorder_threshold,
-                    p.low_stock_notified,
-                    b.name AS business_name,
-                    b.email AS business_email,
-                    b.phone AS business_phone
-                FROM products p
-                JOIN businesses b ON p.business_id = b.id
-                WHERE p.product_id = :product_id
-                AND p.business_id = :business_id
-                AND p.deleted_at IS NULL
-                LIMIT 1
-            """), {
-                "product_id": product_id,
-                "business_id": business_id
-            }).mappings().fetchone()
-
-            if not product:
-                return
-
-            stock = float(product["product_stock"] or 0)
-            threshold = float(product["reorder_threshold"] or 0)
-            already_notified = int(product["low_stock_notified"] or 0)
-
-            if threshold <= 0:
-                return
-
-            if already_notified == 1:
-                return
-
-            if stock > threshold:
-                return
-
-            if not product["business_email"]:
-                print("Low stock email skipped: business has no email.")
-                return
+def queue_low_stock_emails(db, product_ids, business_id):
+    """
+    Queue a low stock alert for every product that has reached its reorder
+    threshold. Runs on the caller's session, delivery happens in outbox.py.
+    """
+    if not product_ids:
+        return
 
-            email_host = os.getenv("EMAIL_HOST")
-            email_port = int(os.getenv("EMAIL_PORT", 465))
-            email_user = os.getenv("EMAIL_USER")
-            email_password = os.getenv("EMAIL_PASSWORD")
+    email_user = os.getenv("EMAIL_USER")
 
-            if not email_host or not email_user or not email_password:
-                print("Low stock email skipped: email settings missing.")
-                return
+    if not os.getenv("EMAIL_HOST") or not email_user or not os.getenv("EMAIL_PASSWORD"):
+        print("Low stock email skipped: email settings missing.")
+        return
 
-            subject = f"⚠ Low Stock Alert - {product['product_name']}"
-
-            html_body = f"""
-            <html>
-              <body style="font-family:Arial,sans-serif;background:#f6f7f9;padding:20px;color:#333;">
-                <div style="max-width:650px;margin:auto;background:#ffffff;padding:25px;border-radius:12px;">
-                  <h2 style="color:#dc2626;margin-top:0;">⚠ Low Stock Alert</h2>
-
-                  <p>Hello <strong>{product['business_name']}</strong>,</p>
-
-                  <p>
-                    The following product has reached or gone below its reorder threshold.
-                  </p>
-
-                  <div style="background:#fff7ed;border:1px solid #fed7aa;padding:18px;border-radius:10px;margin:20px 0;">
-                    <p><strong>Product:</strong> {product['product_name']}</p>
-                    <p><strong>Product Number:</strong> {product['product_number'] or 'N/A'}</p>
-                    <p><strong>Current Stock:</strong> 
-                      <span style="color:#dc2626;font-weight:bold;">{stock}</span>
-                    </p>
-                    <p><strong>Reorder Threshold:</strong> {threshold}</p>
-                  </div>
-
-                  <p>
-                    Please restock this item to avoid running out of stock.
-                  </p>
-
-                  <p style="margin-top:25px;">
-                    Thank you,<br>
-                    <strong>Peakers POS</strong>
-                  </p>
-                </div>
-              </body>
-            </html>
-            """
+    ordered_ids = sorted(product_ids)
+    placeholders = ",".join([f":id{i}" for i in range(len(ordered_ids))])
+    params = {f"id{i}": pid for i, pid in enumerate(ordered_ids)}
+    params["business_id"] = business_id
+
+    products = db.execute(text(f"""
+        SELECT 
+            p.product_id,
+            p.product_name,
+            p.product_number,
+            p.product_stock,
+            p.reorder_threshold,
+            b.name AS business_name,
+            b.email AS business_email
+        FROM products p
+        JOIN businesses b ON p.business_id = b.id
+        WHERE p.product_id IN ({placeholders})
+        AND p.business_id = :business_id
+        AND p.deleted_at IS NULL
+        AND p.reorder_threshold > 0
+        AND COALESCE(p.low_stock_notified, 0) = 0
+        AND p.product_stock <= p.reorder_threshold
+    """), params).mappings().fetchall()
+
+    notified_ids = []
+
+    for product in products:
+        if not product["business_email"]:
+            print("Low stock email skipped: business has no email.")
+            continue
+
+        stock = float(product["product_stock"] or 0)
+        threshold = float(product["reorder_threshold"] or 0)
+
+        subject = f"⚠ Low Stock Alert - {product['product_name']}"
+
+        html_body = f"""
+        <html>
+          <body style="font-family:Arial,sans-serif;background:#f6f7f9;padding:20px;color:#333;">
+            <div style="max-width:650px;margin:auto;background:#ffffff;padding:25px;border-radius:12px;">
+              <h2 style="color:#dc2626;margin-top:0;">⚠ Low Stock Alert</h2>
+
+              <p>Hello <strong>{product['business_name']}</strong>,</p>
+
+              <p>
+                The following product has reached or gone below its reorder threshold.
+              </p>
+
+              <div style="background:#fff7ed;border:1px solid #fed7aa;padding:18px;border-radius:10px;margin:20px 0;">
+                <p><strong>Product:</strong> {product['product_name']}</p>
+                <p><strong>Product Number:</strong> {product['product_number'] or 'N/A'}</p>
+                <p><strong>Current Stock:</strong> 
+                  <span style="color:#dc2626;font-weight:bold;">{stock}</span>
+                </p>
+                <p><strong>Reorder Threshold:</strong> {threshold}</p>
+              </div>
 
-            msg = MIMEMultipart("alternative")
-            msg["Subject"] = subject
-            msg["From"] = email_user
-            msg["To"] = product["business_email"]
-            msg.attach(MIMEText(html_body, "html"))
+              <p>
+                Please restock this item to avoid running out of stock.
+              </p>
 
-            print("=" * 50)
-            print("LOW STOCK EMAIL DEBUG")
-            print("LOW STOCK EMAIL TO:", product["business_email"])
-            print("LOW STOCK EMAIL FROM:", email_user)
-            print("LOW STOCK SMTP:", email_host, email_port)
-            print("PRODUCT:", product["product_name"])
-            print("STOCK:", stock)
-            print("THRESHOLD:", threshold)
-            print("=" * 50)
+              <p style="margin-top:25px;">
+                Thank you,<br>
+                <strong>Peakers POS</strong>
+              </p>
+            </div>
+          </body>
+        </html>
+        """
 
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = subject
+        msg["From"] = email_user
+        msg["To"] = product["business_email"]
+        msg.attach(MIMEText(html_body, "html"))
 
-            with smtplib.SMTP_SSL(email_host, email_port) as server:
-                server.login(email_user, email_password)
-                server.send_message(msg)
+        enqueue_email(db, product["business_email"], msg, "low_stock", business_id)
+        notified_ids.append(product["product_id"])
 
-            db.execute(text("""
-                UPDATE products
-                SET low_stock_notified = 1
-                WHERE product_id = :product_id
-                AND business_id = :business_id
-            """), {
-                "product_id": product_id,
-                "business_id": business_id
-            })
+    if not notified_ids:
+        return
 
-            db.commit()
+    notified_placeholders = ",".join([f":id{i}" for i in range(len(notified_ids))])
+    notified_params = {f"id{i}": pid for i, pid in enumerate(notified_ids)}
+    notified_params["business_id"] = business_id
 
-            print(f"Low stock email sent for product ID {product_id}")
+    db.execute(text(f"""
+        UPDATE products
+        SET low_stock_notified = 1
+        WHERE product_id IN ({notified_placeholders})
+        AND business_id = :business_id
+    """), notified_params)
 
-    except Exception as e:
-        print("Low stock email error:", e)
-        traceback.print_exc()
+    print(f"Low stock email queued for product IDs {notified_ids}")
 
 
 def reset_low_stock_notification_if_restocked(product_id, business_id):
@@ -1902,57 +2127,205 @@ def reset_low_stock_notification_if_restocked(product_id, business_id):
     except Exception as e:
         print("Reset low stock notification error:", e)
 
-@app.route("/product-by-barcode/<barcode>", methods=["GET"])
-def product_by_barcode(barcode):
-    try:
-        business_id = get_business_id()
-        if not business_id:
-            return jsonify({"error": "Business ID not found"}), 401
+# ==================== BARCODE INDEX ====================
 
-        product = execute_query(
-            """
-            SELECT *
-            FROM products
-            WHERE product_number = :barcode
-            AND business_id = :business_id
-            AND deleted_at IS NULL
-            LIMIT 1
-            """,
-            {
-                "barcode": barcode,
-                "business_id": business_id,
-            },
-            fetch_all=True,
-        )
+BARCODE_INDEX_MAX_ENTRIES = int(os.getenv("BARCODE_INDEX_MAX_ENTRIES", 50000))
+BARCODE_INDEX_REVALIDATE_SECONDS = float(os.getenv("BARCODE_INDEX_REVALIDATE_SECONDS", 2))
 
-        if not product:
-            return jsonify({"error": "Product not found for this business"}), 404
 
-        return jsonify(product[0]), 200
+class BarcodeIndex:
+    """
+    Entry-bounded in-memory LRU of scanned products keyed by
+    (business_id, barcode), warmed one barcode at a time on a miss.
+    Writes in this worker invalidate their products directly. Writes in
+    other workers are picked up by comparing the business's catalogue
+    version at most every BARCODE_INDEX_REVALIDATE_SECONDS and dropping the
+    products logged since.
+    """
 
-    except Exception as e:
-        print("Barcode scan error:", e)
-        traceback.print_exc()
-        return jsonify({"error": "Internal server error"}), 500
-        
-@app.route("/add-bundle", methods=["POST"])
-def add_bundle():
-    try:
-        data = request.json
-        bundle_items = data.get("bundle_items", [])
-        selling_price = data.get("selling_price")
+    def __init__(self, max_entries, revalidate_seconds):
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self.entries = OrderedDict()
+        self.product_keys = {}
+        self.versions = {}
+        self.generations = {}
+        self.lock = threading.Lock()
 
-        business_id = get_business_id()
-        if not business_id:
-            return jsonify({"error": "Business ID not found"}), 401
+    def lookup(self, business_id, barcode, load):
+        """Cached product for the barcode, calling load(db) on a miss"""
+        business_id = str(business_id)
+        key = (business_id, str(barcode))
 
-        if not bundle_items:
-            return jsonify({"error": "Bundle must contain products"}), 400
+        if self.revalidation_due(business_id):
+            with get_db() as db:
+                self.revalidate(db, business_id)
 
-        if selling_price is None:
-            return jsonify({"error": "Selling price is required"}), 400
+        with self.lock:
+            product = self.entries.get(key)
+            if product is not None:
+                self.entries.move_to_end(key)
+                return product
 
-        child_product_ids = [item["product_id"] for item in bundle_items]
+            generation = self.generations.get(business_id, 0)
+
+        with get_db() as db:
+            product = load(db)
+
+        if product is not None:
+            self.put(key, product, generation)
+
+        return product
+
+    def revalidation_due(self, business_id):
+        with self.lock:
+            state = self.versions.get(business_id)
+
+        return not state or time.monotonic() - state[1] >= self.revalidate_seconds
+
+    def revalidate(self, db, business_id):
+        with self.lock:
+            state = self.versions.get(business_id)
+
+        version = current_catalogue_version(db, business_id)
+        changed_ids = ()
+
+        if state and version > state[0]:
+            changed_ids = read_catalogue_changes(db, business_id, state[0])[CATALOGUE_PRODUCT]
+
+        if state and version < state[0]:
+            self.invalidate_business(business_id)
+        elif changed_ids:
+            self.invalidate(business_id, changed_ids)
+
+        with self.lock:
+            self.versions[business_id] = (version, time.monotonic())
+
+    def put(self, key, product, generation):
+        business_id = key[0]
+        product_key = (business_id, str(product["product_id"]))
+
+        with self.lock:
+            # An invalidation ran while this product was loading
+            if self.generations.get(business_id, 0) != generation:
+                return
+
+            previous_key = self.product_keys.get(product_key)
+            if previous_key and previous_key != key:
+                self.entries.pop(previous_key, None)
+
+            self.entries[key] = product
+            self.entries.move_to_end(key)
+            self.product_keys[product_key] = key
+
+            while len(self.entries) > self.max_entries:
+                evicted_key, evicted = self.entries.popitem(last=False)
+                evicted_product_key = (evicted_key[0], str(evicted["product_id"]))
+                if self.product_keys.get(evicted_product_key) == evicted_key:
+                    del self.product_keys[evicted_product_key]
+
+    def invalidate(self, business_id, product_ids):
+        business_id = str(business_id)
+
+        with self.lock:
+            self.generations[business_id] = self.generations.get(business_id, 0) + 1
+
+            for product_id in product_ids:
+                key = self.product_keys.pop((business_id, str(product_id)), None)
+                if key:
+                    self.entries.pop(key, None)
+
+    def invalidate_business(self, business_id):
+        business_id = str(business_id)
+
+        with self.lock:
+            self.generations[business_id] = self.generations.get(business_id, 0) + 1
+
+            for key in [key for key in self.entries if key[0] == business_id]:
+                product = self.entries.pop(key)
+                self.product_keys.pop((business_id, str(product["product_id"])), None)
+
+
+barcode_index = BarcodeIndex(BARCODE_INDEX_MAX_ENTRIES, BARCODE_INDEX_REVALIDATE_SECONDS)
+
+
+def note_sale_stock_changes(business_id, product_ids, invoice_id=None):
+    """
+    Bookkeeping after a sale or invoice has committed: drop the cached
+    barcode lookups and invoice PDF, then bump the catalogue version of the
+    products whose stock changed. A failure here is logged and swallowed,
+    the write itself is done and reporting an error would make the till
+    retry it.
+    """
+    product_ids = [product_id for product_id in product_ids if product_id]
+
+    try:
+        barcode_index.invalidate(business_id, product_ids)
+        if invoice_id is not None:
+            invoice_pdf_cache.invalidate(business_id, invoice_id)
+        note_catalogue_changes(business_id, product_ids=product_ids)
+
+    except Exception as e:
+        print(f"❌ Catalogue bookkeeping failed after commit for business {business_id}:", e)
+        traceback.print_exc()
+
+
+@app.route("/product-by-barcode/<barcode>", methods=["GET"])
+def product_by_barcode(barcode):
+    try:
+        business_id = get_business_id()
+        if not business_id:
+            return jsonify({"error": "Business ID not found"}), 401
+
+        def load(db):
+            product = db.execute(
+                text("""
+                    SELECT *
+                    FROM products
+                    WHERE product_number = :barcode
+                    AND business_id = :business_id
+                    AND deleted_at IS NULL
+                    LIMIT 1
+                """),
+                {
+                    "barcode": barcode,
+                    "business_id": business_id,
+                }
+            ).mappings().fetchone()
+
+            return dict(product) if product else None
+
+        product = barcode_index.lookup(business_id, barcode, load)
+
+        if not product:
+            return jsonify({"error": "Product not found for this business"}), 404
+
+        return jsonify(product), 200
+
+    except Exception as e:
+        print("Barcode scan error:", e)
+        traceback.print_exc()
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@app.route("/add-bundle", methods=["POST"])
+def add_bundle():
+    try:
+        data = request.json
+        bundle_items = data.get("bundle_items", [])
+        selling_price = data.get("selling_price")
+
+        business_id = get_business_id()
+        if not business_id:
+            return jsonify({"error": "Business ID not found"}), 401
+
+        if not bundle_items:
+            return jsonify({"error": "Bundle must contain products"}), 400
+
+        if selling_price is None:
+            return jsonify({"error": "Selling price is required"}), 400
+
+        child_product_ids = [item["product_id"] for item in bundle_items]
 
         # Prevent adding products that are already part of another ACTIVE bundle
         combination_check_query = """
@@ -2096,6 +2469,8 @@ def add_bundle():
                 "business_id": business_id
             })
 
+        note_catalogue_changes(business_id, bundle_ids=[bundle_id])
+
         return jsonify({
             "message": "Bundle created successfully",
             "bundle_id": bundle_id,
@@ -2189,6 +2564,8 @@ def update_bundle(bundle_id):
                 }
             )
 
+        note_catalogue_changes(business_id, bundle_ids=[bundle_id])
+
         return jsonify({
             "message": "Bundle updated successfully",
             "buying_price": float(existing_buying_price)
@@ -2284,6 +2661,9 @@ def updating_product(product_id):
             "business_id": business_id
         })
 
+        note_catalogue_changes(business_id, product_ids=[product_id])
+        barcode_index.invalidate(business_id, [product_id])
+
         if ingredients is not None and isinstance(ingredients, list):
             existing_query = """
                 SELECT material_id
@@ -2436,61 +2816,32 @@ def add_recipe():
         existing_result = execute_query(existing_query, {"product_id": product_id}, fetch_all=True)
         existing_recipe = {row["material_id"]: row["quantity"] for row in existing_result}
 
-        # Calculate material differences
-        material_diffs = {}
+        # Net change per material for the product stock already made:
+        # new recipe minus old recipe (materials dropped from the recipe go back)
+        stock_changes = {
+            material_id: -Decimal(str(old_quantity_per_unit or 0)) * Decimal(str(product_stock or 0))
+            for material_id, old_quantity_per_unit in existing_recipe.items()
+        }
         for item in new_materials:
-            material_id = item.get("material_id")
-            new_quantity_per_unit = item.get("quantity", 0)
-            old_quantity_per_unit = existing_recipe.get(material_id, 0)
-            diff = (new_quantity_per_unit - old_quantity_per_unit) * product_stock
-            material_diffs[material_id] = diff
-
-        # Check if materials are sufficient for increase
-        for material_id, diff_qty in material_diffs.items():
-            if diff_qty > 0:
-                material_query = """
-                    SELECT quantity FROM material_supplies 
-                    WHERE material_id = :material_id AND business_id = :business_id
-                """
-                material_result = execute_query(
-                    material_query,
-                    {"material_id": material_id, "business_id": business_id},
-                    fetch_all=True
-                )
-                available_qty = material_result[0]["quantity"] if material_result else 0
-
-                if available_qty < diff_qty:
-                    return jsonify({
-                        "error": f"Insufficient stock for material ID {material_id}. Needed: {diff_qty}, Available: {available_qty}"
-                    }), 400
+            stock_changes[item["material_id"]] = (
+                stock_changes.get(item["material_id"], 0)
+                + Decimal(str(item["quantity"] or 0)) * Decimal(str(product_stock or 0))
+            )
 
         # Start transaction
         with get_db() as db:
-            # Revert material stock from old recipe
-            for material_id, old_quantity_per_unit in existing_recipe.items():
-                db.execute(
-                    text("""
-                        UPDATE material_supplies
-                        SET quantity = quantity + :qty
-                        WHERE material_id = :material_id AND business_id = :business_id
-                    """),
-                    {"qty": old_quantity_per_unit * product_stock, "material_id": material_id, "business_id": business_id}
-                )
-
-            # Apply material stock changes for new recipe
-            for item in new_materials:
-                material_id = item["material_id"]
-                quantity_per_unit = item["quantity"]
-                used_total = quantity_per_unit * product_stock
-
-                db.execute(
-                    text("""
-                        UPDATE material_supplies
-                        SET quantity = quantity - :qty
-                        WHERE material_id = :material_id AND business_id = :business_id
-                    """),
-                    {"qty": used_total, "material_id": material_id, "business_id": business_id}
-                )
+            for material_id, change in sorted(stock_changes.items()):
+                if change > 0:
+                    shortfall = draw_material_supplies(
+                        db, business_id, material_id, change, "recipe", product_id
+                    )
+                    if shortfall > 0:
+                        db.rollback()
+                        return jsonify({
+                            "error": f"Insufficient stock for material ID {material_id}. Short by {float(shortfall)}"
+                        }), 400
+                elif change < 0:
+                    return_material_supplies(db, business_id, material_id, -change, "recipe", product_id)
 
             # Clear old recipe
             db.execute(text("DELETE FROM product_recipes WHERE product_id = :product_id"), {"product_id": product_id})
@@ -2624,18 +2975,24 @@ def add_material_supply():
         if not check_result:
             return jsonify({"error": "Material not found or access denied"}), 404
 
-        # Insert supply
-        execute_insert("""
-            INSERT INTO material_supplies (material_id, supplier_name, quantity, unit_price, total_cost, business_id)
-            VALUES (:material_id, :supplier_name, :quantity, :unit_price, :total_cost, :business_id)
-        """, {
-            "material_id": material_id,
-            "supplier_name": supplier_name,
-            "quantity": quantity,
-            "unit_price": unit_price,
-            "total_cost": total_cost,
-            "business_id": business_id
-        })
+        # Insert supply and its ledger entry together
+        with get_db() as db:
+            result = db.execute(
+                text("""
+                    INSERT INTO material_supplies (material_id, supplier_name, quantity, unit_price, total_cost, business_id)
+                    VALUES (:material_id, :supplier_name, :quantity, :unit_price, :total_cost, :business_id)
+                """),
+                {
+                    "material_id": material_id,
+                    "supplier_name": supplier_name,
+                    "quantity": quantity,
+                    "unit_price": unit_price,
+                    "total_cost": total_cost,
+                    "business_id": business_id
+                }
+            )
+
+            record_material_supply(db, business_id, result.lastrowid, material_id, quantity, unit_price)
 
         return jsonify({"message": "Material supply recorded successfully"}), 201
 
@@ -2851,6 +3208,9 @@ def update_product(product_id):
             }
         )
 
+        note_catalogue_changes(business_id, product_ids=[product_id])
+        barcode_index.invalidate(business_id, [product_id])
+
         return jsonify({"message": "Product updated successfully!"}), 200
 
     except Exception as e:
@@ -3182,7 +3542,7 @@ def add_supplier_product(supplier_id):
                             "error": f"❌ Insufficient {material_name}. Short by {float(remaining)} units"
                         }), 400
 
-            db.execute(text("""
+            supplier_product = db.execute(text("""
                 INSERT INTO supplier_products
                 (supplier_id, product_id, stock_supplied, price, supply_date, business_id)
                 VALUES (:supplier_id, :product_id, :stock_supplied, :price, :supply_date, :business_id)
@@ -3211,41 +3571,15 @@ def add_supplier_product(supplier_id):
                 "business_id": business_id
             })
 
+            record_catalogue_changes(db, business_id, product_ids=[product_id])
+
             for material_id, material_qty_per_unit in recipes:
                 material_qty_per_unit = Decimal(str(material_qty_per_unit or 0))
-                total_needed = material_qty_per_unit * stock_supplied
-                remaining = total_needed
-
-                supplies = db.execute(text("""
-                    SELECT supply_id, quantity
-                    FROM material_supplies
-                    WHERE material_id = :material_id
-                    AND quantity > 0
-                    AND business_id = :business_id
-                    ORDER BY supply_date ASC
-                    FOR UPDATE
-                """), {
-                    "material_id": material_id,
-                    "business_id": business_id
-                }).fetchall()
-
-                for supply_id, available_qty in supplies:
-                    if remaining <= 0:
-                        break
-
-                    available_qty = Decimal(str(available_qty or 0))
-                    deduct = min(available_qty, remaining)
-
-                    db.execute(text("""
-                        UPDATE material_supplies
-                        SET quantity = quantity - :deduct
-                        WHERE supply_id = :supply_id
-                    """), {
-                        "deduct": deduct,
-                        "supply_id": supply_id
-                    })
 
-                    remaining -= deduct
+                draw_material_supplies(
+                    db, business_id, material_id, material_qty_per_unit * stock_supplied,
+                    "supplier_product", supplier_product.lastrowid
+                )
 
         return jsonify({
             "message": "✅ Supply added successfully. Buying price was not changed.",
@@ -3322,6 +3656,8 @@ def delete_supplier_product(supplier_id, supplier_product_id):
                 }
             )
 
+            record_catalogue_changes(db, business_id, product_ids=[supply["product_id"]])
+
             db.execute(
                 text("""
                     DELETE FROM supplier_products
@@ -3708,6 +4044,8 @@ def update_supplier_product(supplier_product_id):
                 }
             )
 
+            record_catalogue_changes(db, business_id, product_ids=[product_id])
+
             has_recipes = db.execute(
                 text("""
                     SELECT EXISTS(
@@ -3747,91 +4085,22 @@ def update_supplier_product(supplier_product_id):
                     total_adjustment = quantity_per_product * material_adjustment
 
                     if stock_difference > 0:
-                        supplies = db.execute(
-                            text("""
-                                SELECT supply_id, quantity 
-                                FROM material_supplies 
-                                WHERE material_id = :material_id
-                                AND quantity > 0
-                                AND business_id = :business_id
-                                ORDER BY supply_date ASC
-                                FOR UPDATE
-                            """),
-                            {
-                                "material_id": material_id,
-                                "business_id": business_id
-                            }
-                        ).fetchall()
-
-                        remaining = total_adjustment
-
-                        for supply_id, available_qty in supplies:
-                            if remaining <= 0:
-                                break
-
-                            available_qty = Decimal(str(available_qty or 0))
-                            deduct = min(available_qty, remaining)
-
-                            db.execute(
-                                text("""
-                                    UPDATE material_supplies 
-                                    SET quantity = quantity - :deduct 
-                                    WHERE supply_id = :supply_id
-                                """),
-                                {
-                                    "deduct": deduct,
-                                    "supply_id": supply_id
-                                }
-                            )
-
-                            remaining -= deduct
+                        remaining = draw_material_supplies(
+                            db, business_id, material_id, total_adjustment,
+                            "supplier_product", supplier_product_id
+                        )
 
                         if remaining > 0:
+                            db.rollback()
                             return jsonify({
                                 "error": f"Insufficient {material_name} short by {float(remaining)} units"
                             }), 400
 
                     else:
-                        recent_supply = db.execute(
-                            text("""
-                                SELECT supply_id 
-                                FROM material_supplies 
-                                WHERE material_id = :material_id
-                                AND business_id = :business_id
-                                ORDER BY supply_date DESC
-                                LIMIT 1
-                            """),
-                            {
-                                "material_id": material_id,
-                                "business_id": business_id
-                            }
-                        ).fetchone()
-
-                        if recent_supply:
-                            db.execute(
-                                text("""
-                                    UPDATE material_supplies 
-                                    SET quantity = quantity + :adjustment 
-                                    WHERE supply_id = :supply_id
-                                """),
-                                {
-                                    "adjustment": total_adjustment,
-                                    "supply_id": recent_supply[0]
-                                }
-                            )
-                        else:
-                            db.execute(
-                                text("""
-                                    INSERT INTO material_supplies 
-                                    (material_id, quantity, supply_date, business_id) 
-                                    VALUES (:material_id, :quantity, CURDATE(), :business_id)
-                                """),
-                                {
-                                    "material_id": material_id,
-                                    "quantity": total_adjustment,
-                                    "business_id": business_id
-                                }
-                            )
+                        return_material_supplies(
+                            db, business_id, material_id, total_adjustment,
+                            "supplier_product", supplier_product_id
+                        )
 
         return jsonify({
             "message": "Supplier product updated successfully. Buying price was not changed.",
@@ -3846,226 +4115,320 @@ def update_supplier_product(supplier_product_id):
         return jsonify({"error": "Internal server error"}), 500
         
 
-@app.route("/process-sale", methods=["POST"])
-def process_sale():
-    data = request.json
+# ==================== SALES ROLLUPS ====================
 
-    customer_id = data.get("customer_id")
-    payment_type = data.get("payment_type")
-    cart_items = data.get("cart_items")
-    vat = float(data.get("vat", 0.00))
-    discount = float(data.get("discount", 0.00))
-    status = "completed"
-    user_id = data.get("user_id")
+def apply_sale_rollup(db, business_id, sale_id, sign):
+    """
+    Add (sign=1) or remove (sign=-1) a completed sale from its day in
+    sales_daily_rollups. Call with 1 after a sale is written as completed
+    and with -1 before it is changed, deleted or leaves the completed state.
+    Only the sale's own rows are read, so concurrent sales of the same day
+    do not lock each other out. Runs on the caller's session.
+    """
+    if not sale_id:
+        return
 
-    business_id = get_business_id()
-    if not business_id:
-        return jsonify({"error": "Business ID not found"}), 401
+    db.execute(
+        text("""
+            INSERT INTO sales_daily_rollups (
+                business_id, sale_day, total_sales, order_count, profit
+            )
+            SELECT
+                s.business_id,
+                DATE(s.sale_date),
+                :sign * COALESCE(s.total_price, 0),
+                :sign,
+                :sign * COALESCE((
+                    SELECT SUM(si.profit)
+                    FROM sales_items si
+                    WHERE si.sale_id = s.sale_id
+                    AND si.business_id = s.business_id
+                ), 0)
+            FROM sales s
+            WHERE s.sale_id = :sale_id
+            AND s.business_id = :business_id
+            AND s.status = 'completed'
+            ON DUPLICATE KEY UPDATE
+                total_sales = total_sales + VALUES(total_sales),
+                order_count = order_count + VALUES(order_count),
+                profit = profit + VALUES(profit)
+        """),
+        {
+            "sign": sign,
+            "sale_id": sale_id,
+            "business_id": business_id
+        }
+    )
 
-    if not cart_items or payment_type not in ["Mpesa", "Cash", "Bank", "Credit"]:
-        return jsonify({"error": "Invalid request"}), 400
 
-    if not user_id:
-        return jsonify({"error": "User ID is required"}), 400
+# ==================== SALE COMMIT ENGINE ====================
 
-    try:
-        with get_db() as db:
-            total_amount = sum(float(item["subtotal"]) for item in cart_items)
-            final_total = total_amount + vat - discount
-            order_number = generate_order_number()
+def lock_sale_stock(db, cart_items, business_id):
+    """
+    Resolve every cart line and lock all affected products in one query.
+    Rows are locked in product_id order so two tills selling overlapping
+    items always queue on the same row first instead of deadlocking.
+    Returns (lines, deductions, None) or (None, None, (error_payload, status_code)).
+    """
+    lines = []
+    bundle_ids = set()
+
+    for item in cart_items:
+        product_id = item["product_id"]
+        line = {
+            "cart_product_id": product_id,
+            "quantity": float(item["quantity"]),
+            "subtotal": float(item["subtotal"]),
+            "product_id": None,
+            "bundle_id": None,
+        }
 
-            result = db.execute(
-                text("""
-                    INSERT INTO sales (
-                        customer_id, total_price, payment_type, vat, discount,
-                        status, order_number, business_id, user_id
-                    )
-                    VALUES (
-                        :customer_id, :total_price, :payment_type, :vat, :discount,
-                        :status, :order_number, :business_id, :user_id
-                    )
-                """),
-                {
-                    "customer_id": customer_id if customer_id else None,
-                    "total_price": final_total,
-                    "payment_type": payment_type,
-                    "vat": vat,
-                    "discount": discount,
-                    "status": status,
-                    "order_number": order_number,
-                    "business_id": business_id,
-                    "user_id": user_id,
-                }
-            )
+        if isinstance(product_id, str) and product_id.startswith("bundle-"):
+            line["bundle_id"] = int(product_id.replace("bundle-", ""))
+            bundle_ids.add(line["bundle_id"])
+        else:
+            line["product_id"] = int(product_id)
 
-            sale_id = result.lastrowid
-            discount_ratio = discount / total_amount if total_amount > 0 else 0
-            affected_product_ids = set()
+        lines.append(line)
 
-            for item in cart_items:
-                product_id = item["product_id"]
-                quantity = float(item["quantity"])
-                subtotal = float(item["subtotal"])
-                item_discount = subtotal * discount_ratio
+    # Bundle composition and buying price for every bundle in the cart
+    bundle_children = {}
+    bundle_buying_prices = {}
 
-                if isinstance(product_id, str) and product_id.startswith("bundle-"):
-                    bundle_id = int(product_id.replace("bundle-", ""))
+    if bundle_ids:
+        ordered_bundle_ids = sorted(bundle_ids)
+        bundle_placeholders = ",".join([f":bundle_id{i}" for i in range(len(ordered_bundle_ids))])
+        bundle_params = {f"bundle_id{i}": bid for i, bid in enumerate(ordered_bundle_ids)}
+        bundle_params["business_id"] = business_id
 
-                    bundle_result = db.execute(
-                        text("""
-                            SELECT pb.bundle_buying_price
-                            FROM product_bundles pb
-                            JOIN products p ON pb.child_product_id = p.product_id
-                            WHERE pb.bundle_id = :bundle_id
-                            AND p.business_id = :business_id
-                            LIMIT 1
-                        """),
-                        {
-                            "bundle_id": bundle_id,
-                            "business_id": business_id
-                        }
-                    ).fetchone()
+        bundle_rows = db.execute(
+            text(f"""
+                SELECT
+                    pb.bundle_id,
+                    pb.child_product_id,
+                    pb.quantity,
+                    pb.bundle_buying_price
+                FROM product_bundles pb
+                JOIN products p
+                    ON pb.child_product_id = p.product_id
+                    AND p.business_id = :business_id
+                WHERE pb.bundle_id IN ({bundle_placeholders})
+            """),
+            bundle_params
+        ).fetchall()
 
-                    bundle_buying_price = float(bundle_result[0]) if bundle_result else 0
+        for bundle_id, child_id, child_qty, buying_price in bundle_rows:
+            bundle_children.setdefault(bundle_id, []).append((child_id, float(child_qty)))
+            bundle_buying_prices.setdefault(bundle_id, float(buying_price or 0))
 
-                    cost = quantity * bundle_buying_price
-                    profit = subtotal - cost - item_discount
+    product_ids = {line["product_id"] for line in lines if line["product_id"] is not None}
+    for children in bundle_children.values():
+        product_ids.update(child_id for child_id, _ in children)
 
-                    bundle_items = db.execute(
-                        text("""
-                            SELECT
-                                pb.child_product_id,
-                                pb.quantity,
-                                p.product_stock
-                            FROM product_bundles pb
-                            JOIN products p
-                                ON pb.child_product_id = p.product_id
-                                AND p.business_id = :business_id
-                            WHERE pb.bundle_id = :bundle_id
-                            FOR UPDATE
-                        """),
-                        {
-                            "business_id": business_id,
-                            "bundle_id": bundle_id
-                        }
-                    ).fetchall()
+    locked_products = {}
 
-                    if not bundle_items:
-                        return jsonify({"error": "Invalid bundle"}), 400
+    if product_ids:
+        ordered_product_ids = sorted(product_ids)
+        product_placeholders = ",".join([f":product_id{i}" for i in range(len(ordered_product_ids))])
+        product_params = {f"product_id{i}": pid for i, pid in enumerate(ordered_product_ids)}
+        product_params["business_id"] = business_id
 
-                    max_bundles = min(
-                        float(item_stock) / float(child_qty)
-                        for (_, child_qty, item_stock) in bundle_items
-                    )
+        locked_rows = db.execute(
+            text(f"""
+                SELECT product_id, product_stock, buying_price
+                FROM products
+                WHERE business_id = :business_id
+                AND product_id IN ({product_placeholders})
+                ORDER BY product_id
+                FOR UPDATE
+            """),
+            product_params
+        ).fetchall()
 
-                    if max_bundles < quantity:
-                        return jsonify({"error": "Insufficient stock for bundle"}), 400
+        locked_products = {
+            row[0]: {
+                "stock": float(row[1] or 0),
+                "buying_price": float(row[2]) if row[2] else 0
+            }
+            for row in locked_rows
+        }
 
-                    db.execute(
-                        text("""
-                            INSERT INTO sales_items (
-                                sale_id, product_id, bundle_id, quantity,
-                                subtotal, buying_price, profit, business_id
-                            )
-                            VALUES (
-                                :sale_id, NULL, :bundle_id, :quantity,
-                                :subtotal, :buying_price, :profit, :business_id
-                            )
-                        """),
-                        {
-                            "sale_id": sale_id,
-                            "bundle_id": bundle_id,
-                            "quantity": quantity,
-                            "subtotal": subtotal,
-                            "buying_price": bundle_buying_price,
-                            "profit": profit,
-                            "business_id": business_id
-                        }
-                    )
+    # Stock is checked in memory against what earlier lines already claimed
+    deductions = {}
 
-                    for child_id, child_qty, _ in bundle_items:
-                        db.execute(
-                            text("""
-                                UPDATE products
-                                SET product_stock = product_stock - :deduct_qty
-                                WHERE product_id = :product_id
-                                AND business_id = :business_id
-                            """),
-                            {
-                                "deduct_qty": float(child_qty) * quantity,
-                                "product_id": child_id,
-                                "business_id": business_id
-                            }
-                        )
-                        affected_product_ids.add(product_id)
+    for line in lines:
+        quantity = line["quantity"]
 
-                else:
-                    product = db.execute(
-                        text("""
-                            SELECT product_stock, buying_price
-                            FROM products
-                            WHERE product_id = :product_id
-                            AND business_id = :business_id
-                            FOR UPDATE
-                        """),
-                        {
-                            "product_id": product_id,
-                            "business_id": business_id
-                        }
-                    ).fetchone()
+        if line["bundle_id"] is not None:
+            children = bundle_children.get(line["bundle_id"])
+            if not children:
+                return None, None, ({"error": "Invalid bundle"}, 400)
 
-                    if not product or float(product[0]) < quantity:
-                        return jsonify({
-                            "error": "INSUFFICIENT_STOCK",
-                            "message": f"Only {product[0] if product else 0} item(s) left in stock",
-                            "product_id": product_id,
-                            "requested": quantity,
-                            "available": product[0] if product else 0
-                        }), 400
+            max_bundles = min(
+                (locked_products.get(child_id, {"stock": 0})["stock"] - deductions.get(child_id, 0)) / child_qty
+                for child_id, child_qty in children
+            )
 
-                    buying_price = float(product[1]) if product[1] else 0
+            if max_bundles < quantity:
+                return None, None, ({"error": "Insufficient stock for bundle"}, 400)
 
-                    cost = quantity * buying_price
-                    profit = subtotal - cost - item_discount
+            line["buying_price"] = bundle_buying_prices.get(line["bundle_id"], 0)
 
-                    db.execute(
-                        text("""
-                            INSERT INTO sales_items (
-                                sale_id, product_id, bundle_id, quantity,
-                                subtotal, buying_price, profit, business_id
-                            )
-                            VALUES (
-                                :sale_id, :product_id, NULL, :quantity,
-                                :subtotal, :buying_price, :profit, :business_id
-                            )
-                        """),
-                        {
-                            "sale_id": sale_id,
-                            "product_id": product_id,
-                            "quantity": quantity,
-                            "subtotal": subtotal,
-                            "buying_price": buying_price,
-                            "profit": profit,
-                            "business_id": business_id
-                        }
-                    )
+            for child_id, child_qty in children:
+                deductions[child_id] = deductions.get(child_id, 0) + child_qty * quantity
 
-                    db.execute(
-                        text("""
-                            UPDATE products
-                            SET product_stock = product_stock - :quantity
-                            WHERE product_id = :product_id
-                            AND business_id = :business_id
-                        """),
-                        {
-                            "quantity": quantity,
-                            "product_id": product_id,
-                            "business_id": business_id
-                        }
+        else:
+            product_id = line["product_id"]
+            product = locked_products.get(product_id)
+            available = product["stock"] - deductions.get(product_id, 0) if product else 0
+
+            if not product or available < quantity:
+                return None, None, ({
+                    "error": "INSUFFICIENT_STOCK",
+                    "message": f"Only {available:g} item(s) left in stock",
+                    "product_id": line["cart_product_id"],
+                    "requested": quantity,
+                    "available": available
+                }, 400)
+
+            line["buying_price"] = product["buying_price"]
+            deductions[product_id] = deductions.get(product_id, 0) + quantity
+
+    return lines, deductions, None
+
+
+def apply_sale_stock(db, sale_id, lines, deductions, business_id, discount_ratio):
+    """
+    Bulk-insert all sales_items rows and apply every stock decrement
+    in a single UPDATE. Expects the rows to be locked by lock_sale_stock().
+    """
+    sale_item_rows = []
+
+    for line in lines:
+        item_discount = line["subtotal"] * discount_ratio
+        cost = line["quantity"] * line["buying_price"]
+
+        sale_item_rows.append({
+            "sale_id": sale_id,
+            "product_id": line["product_id"],
+            "bundle_id": line["bundle_id"],
+            "quantity": line["quantity"],
+            "subtotal": line["subtotal"],
+            "buying_price": line["buying_price"],
+            "profit": line["subtotal"] - cost - item_discount,
+            "business_id": business_id
+        })
+
+    # A list of parameter sets is sent as one executemany batch
+    db.execute(
+        text("""
+            INSERT INTO sales_items (
+                sale_id, product_id, bundle_id, quantity,
+                subtotal, buying_price, profit, business_id
+            )
+            VALUES (
+                :sale_id, :product_id, :bundle_id, :quantity,
+                :subtotal, :buying_price, :profit, :business_id
+            )
+        """),
+        sale_item_rows
+    )
+
+    if not deductions:
+        return
+
+    ordered_product_ids = sorted(deductions)
+    cases = " ".join(
+        f"WHEN :product_id{i} THEN :deduct_qty{i}"
+        for i in range(len(ordered_product_ids))
+    )
+    placeholders = ",".join([f":product_id{i}" for i in range(len(ordered_product_ids))])
+
+    params = {"business_id": business_id}
+    for i, product_id in enumerate(ordered_product_ids):
+        params[f"product_id{i}"] = product_id
+        params[f"deduct_qty{i}"] = deductions[product_id]
+
+    db.execute(
+        text(f"""
+            UPDATE products
+            SET product_stock = product_stock - CASE product_id {cases} ELSE 0 END
+            WHERE business_id = :business_id
+            AND product_id IN ({placeholders})
+        """),
+        params
+    )
+
+
+@app.route("/process-sale", methods=["POST"])
+def process_sale():
+    data = request.json
+
+    customer_id = data.get("customer_id")
+    payment_type = data.get("payment_type")
+    cart_items = data.get("cart_items")
+    vat = float(data.get("vat", 0.00))
+    discount = float(data.get("discount", 0.00))
+    status = "completed"
+    user_id = data.get("user_id")
+
+    business_id = get_business_id()
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
+
+    if not cart_items or payment_type not in ["Mpesa", "Cash", "Bank", "Credit"]:
+        return jsonify({"error": "Invalid request"}), 400
+
+    if not user_id:
+        return jsonify({"error": "User ID is required"}), 400
+
+    try:
+        order_number = generate_order_number(business_id)
+
+        with get_db() as db:
+            # Every product touched by the cart is locked here, in one ordered query
+            lines, deductions, stock_error = lock_sale_stock(db, cart_items, business_id)
+            if stock_error:
+                error_payload, status_code = stock_error
+                return jsonify(error_payload), status_code
+
+            total_amount = sum(line["subtotal"] for line in lines)
+            final_total = total_amount + vat - discount
+
+            result = db.execute(
+                text("""
+                    INSERT INTO sales (
+                        customer_id, total_price, payment_type, vat, discount,
+                        status, order_number, business_id, user_id
+                    )
+                    VALUES (
+                        :customer_id, :total_price, :payment_type, :vat, :discount,
+                        :status, :order_number, :business_id, :user_id
                     )
-                    affected_product_ids.add(product_id)
-        for affected_product_id in affected_product_ids:
-            send_low_stock_email_if_needed(affected_product_id, business_id)             
+                """),
+                {
+                    "customer_id": customer_id if customer_id else None,
+                    "total_price": final_total,
+                    "payment_type": payment_type,
+                    "vat": vat,
+                    "discount": discount,
+                    "status": status,
+                    "order_number": order_number,
+                    "business_id": business_id,
+                    "user_id": user_id,
+                }
+            )
+
+            sale_id = result.lastrowid
+            discount_ratio = discount / total_amount if total_amount > 0 else 0
+
+            apply_sale_stock(db, sale_id, lines, deductions, business_id, discount_ratio)
+            record_sale_consumption(db, business_id, [sale_id])
+            queue_low_stock_emails(db, deductions.keys(), business_id)
+            apply_sale_rollup(db, business_id, sale_id, 1)
+
+        # Versioned after the sale commits, so checkouts never hold the version row
+        note_sale_stock_changes(business_id, deductions.keys())
 
         return jsonify({
             "message": "Sale processed successfully",
@@ -4076,21 +4439,33 @@ def process_sale():
         print("❌ ERROR in process_sale:", str(e))
         traceback.print_exc()
         return jsonify({"error": "Internal server error"})
-        
-@app.route("/get-sales-products", methods=["GET"])
-def get_sales_products():
-    page = request.args.get("page", 1, type=int)
-    per_page = 20000
-    offset = (page - 1) * per_page
 
-    business_id = get_business_id()
-    if not business_id:
-        return jsonify({"error": "Business ID not found"}), 401
 
-    try:
-        # Fetch active normal products only
-        products_query = """
-            SELECT 
+def load_sales_products(db, business_id, product_ids=None, limit=None, offset=0):
+    """
+    Active non-bundle products in the /get-sales-products shape, newest
+    first. product_ids limits the result to those products.
+    """
+    product_filter = ""
+    paging = ""
+    params = {"business_id": business_id}
+
+    if product_ids is not None:
+        if not product_ids:
+            return []
+
+        ordered_ids = sorted(product_ids)
+        placeholders = ",".join([f":product_id{i}" for i in range(len(ordered_ids))])
+        product_filter = f"AND p.product_id IN ({placeholders})"
+        params.update({f"product_id{i}": pid for i, pid in enumerate(ordered_ids)})
+
+    if limit is not None:
+        paging = "LIMIT :limit OFFSET :offset"
+        params.update({"limit": limit, "offset": offset})
+
+    products = db.execute(
+        text(f"""
+            SELECT
                 p.product_id,
                 p.product_name,
                 p.product_price,
@@ -4099,102 +4474,119 @@ def get_sales_products():
             FROM products p
             WHERE p.business_id = :business_id
             AND p.deleted_at IS NULL
+            {product_filter}
             ORDER BY p.created_at DESC
-            LIMIT :limit OFFSET :offset
-        """
-
-        products = execute_query(
-            products_query,
-            {
-                "business_id": business_id,
-                "limit": per_page,
-                "offset": offset
-            },
-            fetch_all=True
-        )
+            {paging}
+        """),
+        params
+    ).mappings().fetchall()
 
-        formatted_products = [
-            {
-                "product_id": row["product_id"],
-                "product_name": row["product_name"],
-                "product_price": float(row["product_price"] or 0),
-                "product_stock": float(row["product_stock"] or 0),
-                "unit": row["unit"],
-                "is_bundle": False
-            }
-            for row in products
-        ]
+    return [
+        {
+            "product_id": row["product_id"],
+            "product_name": row["product_name"],
+            "product_price": float(row["product_price"] or 0),
+            "product_stock": float(row["product_stock"] or 0),
+            "unit": row["unit"],
+            "is_bundle": False
+        }
+        for row in products
+    ]
 
-        # Fetch active bundles only
-        bundles_query = """
-            SELECT
-                pb.bundle_id,
-                MAX(pb.selling_price) AS selling_price,
-                MIN(pb.quantity) AS quantity,
-                MIN(FLOOR(p.product_stock / pb.quantity)) AS bundle_stock
-            FROM product_bundles pb
-            JOIN products p 
-                ON p.product_id = pb.child_product_id
-                AND p.business_id = :business_id
-                AND p.deleted_at IS NULL
-            WHERE pb.business_id = :business_id
-            AND pb.deleted_at IS NULL
-            GROUP BY pb.bundle_id
-        """
 
-        bundles = execute_query(
-            bundles_query,
-            {"business_id": business_id},
-            fetch_all=True
-        )
+def load_sales_bundles(db, business_id, bundle_ids=None):
+    """
+    Active bundles with price, available stock and the name/unit of their
+    first child product, computed in a single set-based query regardless
+    of how many bundles the business has. bundle_ids limits the result to
+    those bundles.
+    """
+    bundle_filter = ""
+    params = {"business_id": business_id}
 
-        formatted_bundles = []
+    if bundle_ids is not None:
+        if not bundle_ids:
+            return []
 
-        for bundle in bundles:
-            bundle_id = bundle["bundle_id"]
+        ordered_ids = sorted(bundle_ids)
+        placeholders = ",".join([f":bundle_id{i}" for i in range(len(ordered_ids))])
+        bundle_filter = f"AND pb.bundle_id IN ({placeholders})"
+        params.update({f"bundle_id{i}": bid for i, bid in enumerate(ordered_ids)})
 
-            product_info = execute_query(
-                """
-                SELECT 
-                    p.product_name,
-                    p.unit
+    bundles = db.execute(
+        text(f"""
+            SELECT
+                b.bundle_id,
+                b.selling_price,
+                b.quantity,
+                b.bundle_stock,
+                fp.product_name,
+                fp.unit
+            FROM (
+                SELECT
+                    pb.bundle_id,
+                    MAX(pb.selling_price) AS selling_price,
+                    MIN(pb.quantity) AS quantity,
+                    MIN(FLOOR(p.product_stock / pb.quantity)) AS bundle_stock,
+                    MIN(pb.child_product_id) AS first_child_id
                 FROM product_bundles pb
-                JOIN products p 
+                JOIN products p
                     ON p.product_id = pb.child_product_id
                     AND p.business_id = :business_id
                     AND p.deleted_at IS NULL
-                WHERE pb.bundle_id = :bundle_id
-                AND pb.business_id = :business_id
+                WHERE pb.business_id = :business_id
                 AND pb.deleted_at IS NULL
-                ORDER BY pb.child_product_id
-                LIMIT 1
-                """,
-                {
-                    "business_id": business_id,
-                    "bundle_id": bundle_id
-                },
-                fetch_all=True
-            )
+                {bundle_filter}
+                GROUP BY pb.bundle_id
+            ) b
+            JOIN products fp
+                ON fp.product_id = b.first_child_id
+                AND fp.business_id = :business_id
+            ORDER BY b.bundle_id
+        """),
+        params
+    ).mappings().fetchall()
 
-            if not product_info:
-                continue
+    return [
+        {
+            "product_id": f"bundle-{bundle['bundle_id']}",
+            "product_name": bundle["product_name"],
+            "product_price": float(bundle["selling_price"] or 0),
+            "product_stock": int(bundle["bundle_stock"] or 0),
+            "quantity": bundle["quantity"],
+            "unit": bundle["unit"],
+            "is_bundle": True
+        }
+        for bundle in bundles
+    ]
 
-            formatted_bundles.append({
-                "product_id": f"bundle-{bundle_id}",
-                "product_name": product_info[0]["product_name"],
-                "product_price": float(bundle["selling_price"] or 0),
-                "product_stock": int(bundle["bundle_stock"] or 0),
-                "quantity": bundle["quantity"],
-                "unit": product_info[0]["unit"],
-                "is_bundle": True
-            })
+
+@app.route("/get-sales-products", methods=["GET"])
+def get_sales_products():
+    page = request.args.get("page", 1, type=int)
+    per_page = 20000
+    offset = (page - 1) * per_page
+
+    business_id = get_business_id()
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
+
+    try:
+        with get_db() as db:
+            # Read the version first so changes made while loading are resent
+            catalogue_version = current_catalogue_version(db, business_id)
+            formatted_products = load_sales_products(
+                db, business_id, limit=per_page, offset=offset
+            )
+            formatted_bundles = load_sales_bundles(db, business_id)
 
         combined_products = formatted_products + formatted_bundles
 
         return jsonify({
             "products": combined_products,
             "total_products": len(combined_products),
-            "page": page
+            "page": page,
+            "catalogue_version": catalogue_version
         }), 200
 
     except Exception as e:
@@ -4203,6 +4595,89 @@ def get_sales_products():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/catalogue-changes", methods=["GET"])
+def get_catalogue_changes():
+    """
+    Products and bundles changed since the client's catalogue version.
+    Clients without a version, or with one this server never issued,
+    get full_sync_required and reload /get-sales-products.
+    """
+    business_id = get_business_id()
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
+
+    since = request.args.get("since", type=int)
+
+    try:
+        with get_db() as db:
+            catalogue_version = current_catalogue_version(db, business_id)
+
+            if since is None or since < 0 or since > catalogue_version:
+                return jsonify({
+                    "catalogue_version": catalogue_version,
+                    "full_sync_required": True,
+                    "products": [],
+                    "deleted": []
+                }), 200
+
+            if since == catalogue_version:
+                return jsonify({
+                    "catalogue_version": catalogue_version,
+                    "full_sync_required": False,
+                    "products": [],
+                    "deleted": []
+                }), 200
+
+            changes = read_catalogue_changes(db, business_id, since)
+            product_ids = changes[CATALOGUE_PRODUCT]
+            bundle_ids = set(changes[CATALOGUE_BUNDLE])
+
+            # A bundle's available stock follows the stock of its children
+            if product_ids:
+                ordered_ids = sorted(product_ids)
+                placeholders = ",".join([f":id{i}" for i in range(len(ordered_ids))])
+                params = {f"id{i}": pid for i, pid in enumerate(ordered_ids)}
+                params["business_id"] = business_id
+
+                bundle_ids.update(
+                    row[0] for row in db.execute(text(f"""
+                        SELECT DISTINCT bundle_id
+                        FROM product_bundles
+                        WHERE business_id = :business_id
+                        AND deleted_at IS NULL
+                        AND child_product_id IN ({placeholders})
+                    """), params).fetchall()
+                )
+
+            changed_products = load_sales_products(db, business_id, product_ids=product_ids)
+            changed_bundles = load_sales_bundles(db, business_id, bundle_ids=bundle_ids)
+
+        # Anything logged but no longer active is reported as deleted
+        active_products = {row["product_id"] for row in changed_products}
+        active_bundles = {row["product_id"] for row in changed_bundles}
+
+        deleted = (
+            [pid for pid in sorted(product_ids) if pid not in active_products] +
+            [
+                f"bundle-{bid}"
+                for bid in sorted(bundle_ids)
+                if f"bundle-{bid}" not in active_bundles
+            ]
+        )
+
+        return jsonify({
+            "catalogue_version": catalogue_version,
+            "full_sync_required": False,
+            "products": changed_products + changed_bundles,
+            "deleted": deleted
+        }), 200
+
+    except Exception as e:
+        print("❌ ERROR in get_catalogue_changes:", str(e))
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/suppliers/<int:supplier_id>/soft-delete", methods=["DELETE"])
 def soft_delete_supplier(supplier_id):
     business_id = get_business_id()
@@ -4463,29 +4938,11 @@ def get_company_details():
         return jsonify({"error": "Business ID not found"}), 401
 
     try:
-        company_details = execute_query(
-            """
-            SELECT
-                name,
-                phone,
-                email,
-                address,
-                city,
-                country,
-                logo
-            FROM businesses
-            WHERE id = :business_id
-            LIMIT 1
-            """,
-            {"business_id": business_id},
-            fetch_all=True
-        )
+        business = business_cache.get(business_id)
 
-        if not company_details:
+        if not business:
             return jsonify({"error": "No company details found"}), 404
 
-        business = company_details[0]
-
         return jsonify({
             "company": business["name"] or "",
             "company_phone": business["phone"] or "",
@@ -4500,163 +4957,250 @@ def get_company_details():
         print("❌ ERROR in get_company_details:", str(e))
         return jsonify({"error": str(e)}), 500
 
+ORDERS_DEFAULT_WINDOW_DAYS = 30
+ORDERS_PAGE_SIZE = 200
+ORDERS_MAX_PAGE_SIZE = 1000
+# Columns the orders report reads when it unions the hot and archive tiers
+ORDER_PAGE_COLUMNS = ("sale_id", "sale_date", "business_id")
+ORDER_SALE_COLUMNS = (
+    "sale_id", "order_number", "customer_id", "total_price", "payment_type",
+    "sale_date", "status", "vat", "discount", "user_id", "business_id"
+)
+ORDER_ITEM_COLUMNS = (
+    "sale_id", "product_id", "bundle_id", "quantity", "subtotal",
+    "buying_price", "profit", "business_id"
+)
+# Status changes and invoice edits refuse sales in the archive tier
+ARCHIVED_SALE_ERROR = "This sale is archived and can no longer be changed"
+
 @app.route("/get-orders", methods=["GET"])
 def get_orders():
+    """
+    Orders for a date window (last ORDERS_DEFAULT_WINDOW_DAYS by default),
+    paged by (sale_date, sale_id) and streamed as JSON while rows are grouped.
+    Pass the returned next_cursor back as ?cursor= to get the next page.
+    """
     business_id = get_business_id()
     if not business_id:
         return jsonify({"error": "Business ID not found"}), 401
 
-    try:
-        # Get date range from query parameters
-        start_date = request.args.get("start_date")
-        end_date = request.args.get("end_date")
+    # Get date range from query parameters
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
 
-        # Base query - added u.username to SELECT and LEFT JOIN users
-        query = """
-            SELECT 
-                s.sale_id,
-                s.order_number,
-                s.customer_id,
-                c.customer_name,
-                s.total_price,
-                s.payment_type,
-                s.sale_date,
-                s.status,
-                s.vat,
-                s.discount,
-                s.user_id,
-                u.username AS username,
-                si.product_id,
-                si.bundle_id,
-                si.quantity,
-                si.subtotal,
-                si.buying_price,
-                si.profit,
-
-                p.product_name AS product_name,
-                p.product_price AS product_price,
-
-                pb.selling_price AS bundle_selling_price,
-                pb.bundle_buying_price AS bundle_buying_price,
-
-                pb.child_product_id,
-                pb.quantity AS bundle_quantity,
-                cp.product_name AS child_product_name
+    if not (start_date and end_date):
+        today = datetime.now(pytz.timezone("Africa/Nairobi")).date()
+        start_date = str(today - timedelta(days=ORDERS_DEFAULT_WINDOW_DAYS - 1))
+        end_date = str(today)
 
-            FROM sales s
-            LEFT JOIN customers c ON s.customer_id = c.customer_id
-            LEFT JOIN users u ON s.user_id = u.user_id
-            LEFT JOIN sales_items si ON s.sale_id = si.sale_id AND si.business_id = :business_id
-            LEFT JOIN products p ON si.product_id = p.product_id AND p.business_id = :business_id
-            LEFT JOIN product_bundles pb ON si.bundle_id = pb.bundle_id
-            LEFT JOIN products cp ON pb.child_product_id = cp.product_id AND cp.business_id = :business_id
-            WHERE s.business_id = :business_id
-        """
+    limit = request.args.get("limit", ORDERS_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), ORDERS_MAX_PAGE_SIZE)
 
-        params = {"business_id": business_id}
+    params = {
+        "business_id": business_id,
+        "start_date": f"{start_date} 00:00:00",
+        "end_date": f"{end_date} 23:59:59",
+        "limit": limit + 1
+    }
 
-        if start_date and end_date:
-            query += " AND s.sale_date BETWEEN :start_date AND :end_date"
-            params["start_date"] = f"{start_date} 00:00:00"
-            params["end_date"] = f"{end_date} 23:59:59"
+    try:
+        window_start = datetime.fromisoformat(params["start_date"])
+        window_end = datetime.fromisoformat(params["end_date"])
+    except ValueError:
+        return jsonify({"error": "Invalid date range"}), 400
 
-        query += " ORDER BY s.sale_date DESC"
+    cursor_filter = ""
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            cursor_sale_date, cursor_sale_id = cursor.rsplit("|", 1)
+            params["cursor_sale_date"] = datetime.fromisoformat(cursor_sale_date)
+            params["cursor_sale_id"] = int(cursor_sale_id)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        cursor_filter = """
+            AND (
+                sale_date < :cursor_sale_date
+                OR (sale_date = :cursor_sale_date AND sale_id < :cursor_sale_id)
+            )
+        """
 
-        results = execute_query(query, params, fetch_all=True)
-        
-        # DEBUG: Print the first result to see what's coming from the query
-        if results:
-            print("FIRST RAW RESULT KEYS:", results[0].keys())
-            print("FIRST RAW RESULT user_id:", results[0].get('user_id'))
-            print("FIRST RAW RESULT username:", results[0].get('username'))
-
-        grouped_orders = {}
-
-        for order in results:
-            sale_id = order["sale_id"]
-
-            if sale_id not in grouped_orders:
-                # DEBUG: Print what we're putting in the response for this sale
-                if sale_id == 38:
-                    print(f"SALE 38 - user_id from query: {order.get('user_id')}")
-                    print(f"SALE 38 - username from query: {order.get('username')}")
-                
-                grouped_orders[sale_id] = {
-                    "sale_id": sale_id,
-                    "order_number": order["order_number"],
-                    "customer_id": order["customer_id"],
-                    "customer_name": order["customer_name"],
-                    "total_price": float(order["total_price"]),
-                    "payment_type": order["payment_type"],
-                    "sale_date": order["sale_date"]
-                        .astimezone(pytz.timezone("Africa/Nairobi"))
-                        .isoformat(),
-                    "vat": float(order["vat"] or 0),
-                    "discount": float(order["discount"] or 0),
-                    "status": order["status"],
-                    "user_id": order["user_id"],
-                    "username": order.get("username"),  # Use .get() to avoid KeyError
-                    "items": [],
-                    "profit": 0.0
-                }
+    page_filter = f"""
+        business_id = :business_id
+        AND sale_date BETWEEN :start_date AND :end_date
+        {cursor_filter}
+    """
 
-            quantity_sold = float(order["quantity"] or 0)
-            is_bundle = order["bundle_id"] is not None
+    try:
+        with get_read_db() as db:
+            # Windows reaching back past the archive boundary also read the archive tier
+            sales_tables, sales_items_tables = sales_sources(db, window_start, window_end)
 
-            selling_price = float(
-                order["bundle_selling_price"]
-                if is_bundle
-                else order["product_price"] or 0
-            )
+            page = db.execute(
+                text(f"""
+                    SELECT s.sale_id, s.sale_date
+                    FROM {tier_source(sales_tables, ORDER_PAGE_COLUMNS, page_filter)} s
+                    WHERE {page_filter}
+                    ORDER BY s.sale_date DESC, s.sale_id DESC
+                    LIMIT :limit
+                """),
+                params
+            ).fetchall()
 
-            buying_price = float(order["buying_price"] or 0)
-            item_profit = float(order["profit"] or 0)
-            subtotal = float(order["subtotal"] or 0)
+    except Exception as e:
+        print(f"❌ Error in get_orders: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
-            if is_bundle:
-                display_name = f"Bundle #{order['bundle_id']}"
-                if order["child_product_name"]:
-                    display_name = f"Bundle ({order['child_product_name']} + more)"
-            else:
-                display_name = order["product_name"] or "Unknown Product"
-
-            grouped_orders[sale_id]["items"].append({
-                "product_id": order["product_id"],
-                "bundle_id": order["bundle_id"],
-                "product_name": display_name,
-                "product_price": selling_price,
-                "buying_price": buying_price,
-                "quantity": quantity_sold,
-                "subtotal": subtotal,
-                "is_bundle": is_bundle,
-                "profit": round(item_profit, 2),
-            })
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = f"{page[-1][1].isoformat()}|{page[-1][0]}"
+
+    sale_ids = [row[0] for row in page]
+
+    def new_order(order):
+        return {
+            "sale_id": order["sale_id"],
+            "order_number": order["order_number"],
+            "customer_id": order["customer_id"],
+            "customer_name": order["customer_name"],
+            "total_price": float(order["total_price"]),
+            "payment_type": order["payment_type"],
+            "sale_date": order["sale_date"]
+                .astimezone(pytz.timezone("Africa/Nairobi"))
+                .isoformat(),
+            "vat": float(order["vat"] or 0),
+            "discount": float(order["discount"] or 0),
+            "status": order["status"],
+            "user_id": order["user_id"],
+            "username": order.get("username"),  # Use .get() to avoid KeyError
+            "items": [],
+            "profit": 0.0
+        }
 
-        # Calculate total profit for each order
-        for order in grouped_orders.values():
-            total_profit = sum(item["profit"] for item in order["items"])
-            order["profit"] = round(total_profit, 2)
+    def order_item(order):
+        quantity_sold = float(order["quantity"] or 0)
+        is_bundle = order["bundle_id"] is not None
 
-        # DEBUG: Check what's actually in grouped_orders before sending
-        if 38 in grouped_orders:
-            print("GROUPED_ORDERS[38] keys:", grouped_orders[38].keys())
-            print("GROUPED_ORDERS[38] username:", grouped_orders[38].get('username'))
+        selling_price = float(
+            order["bundle_selling_price"]
+            if is_bundle
+            else order["product_price"] or 0
+        )
 
-        # DEBUG: Print what we're sending to the frontend for sale 38
-        if 38 in grouped_orders:
-            print("FINAL RESPONSE for sale 38:", grouped_orders[38].get('username'))
+        if is_bundle:
+            display_name = f"Bundle #{order['bundle_id']}"
+            if order["child_product_name"]:
+                display_name = f"Bundle ({order['child_product_name']} + more)"
+        else:
+            display_name = order["product_name"] or "Unknown Product"
+
+        return {
+            "product_id": order["product_id"],
+            "bundle_id": order["bundle_id"],
+            "product_name": display_name,
+            "product_price": selling_price,
+            "buying_price": float(order["buying_price"] or 0),
+            "quantity": quantity_sold,
+            "subtotal": float(order["subtotal"] or 0),
+            "is_bundle": is_bundle,
+            "profit": round(float(order["profit"] or 0), 2),
+        }
 
-        response = jsonify({"orders": list(grouped_orders.values())})
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
+    def encode_order(order):
+        order["profit"] = round(sum(item["profit"] for item in order["items"]), 2)
+        return json.dumps(order, default=str)
+
+    def generate():
+        yield '{"orders": ['
+
+        if sale_ids:
+            placeholders = ",".join([f":sale_id{i}" for i in range(len(sale_ids))])
+            detail_params = {f"sale_id{i}": sale_id for i, sale_id in enumerate(sale_ids)}
+            detail_params["business_id"] = business_id
+            detail_filter = f"business_id = :business_id AND sale_id IN ({placeholders})"
+
+            with get_read_db() as db:
+                # Rows arrive grouped by sale, so each order is written as soon as it is complete
+                results = db.execute(
+                    text(f"""
+                        SELECT 
+                            s.sale_id,
+                            s.order_number,
+                            s.customer_id,
+                            c.customer_name,
+                            s.total_price,
+                            s.payment_type,
+                            s.sale_date,
+                            s.status,
+                            s.vat,
+                            s.discount,
+                            s.user_id,
+                            u.username AS username,
+                            si.product_id,
+                            si.bundle_id,
+                            si.quantity,
+                            si.subtotal,
+                            si.buying_price,
+                            si.profit,
+
+                            p.product_name AS product_name,
+                            p.product_price AS product_price,
+
+                            pb.selling_price AS bundle_selling_price,
+                            pb.bundle_buying_price AS bundle_buying_price,
+
+                            pb.child_product_id,
+                            pb.quantity AS bundle_quantity,
+                            cp.product_name AS child_product_name
+
+                        FROM {tier_source(sales_tables, ORDER_SALE_COLUMNS, detail_filter)} s
+                        LEFT JOIN customers c ON s.customer_id = c.customer_id
+                        LEFT JOIN users u ON s.user_id = u.user_id
+                        LEFT JOIN {tier_source(sales_items_tables, ORDER_ITEM_COLUMNS, detail_filter)} si
+                            ON s.sale_id = si.sale_id AND si.business_id = :business_id
+                        LEFT JOIN products p ON si.product_id = p.product_id AND p.business_id = :business_id
+                        LEFT JOIN product_bundles pb ON si.bundle_id = pb.bundle_id
+                        LEFT JOIN products cp ON pb.child_product_id = cp.product_id AND cp.business_id = :business_id
+                        WHERE s.business_id = :business_id
+                        AND s.sale_id IN ({placeholders})
+                        ORDER BY s.sale_date DESC, s.sale_id DESC
+                    """).execution_options(stream_results=True),
+                    detail_params
+                ).mappings()
+
+                current = None
+                separator = ""
+
+                for row in results:
+                    if current is None or row["sale_id"] != current["sale_id"]:
+                        if current is not None:
+                            yield separator + encode_order(current)
+                            separator = ","
+                        current = new_order(row)
+
+                    current["items"].append(order_item(row))
+
+                if current is not None:
+                    yield separator + encode_order(current)
+
+        yield (
+            f'], "next_cursor": {json.dumps(next_cursor)}, '
+            f'"has_more": {json.dumps(has_more)}, '
+            f'"start_date": {json.dumps(start_date)}, '
+            f'"end_date": {json.dumps(end_date)}}}'
+        )
 
-        return response
+    response = Response(stream_with_context(generate()), mimetype="application/json")
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    response.headers["Pragma"] = "no-cache"
+    response.headers["Expires"] = "0"
 
-    except Exception as e:
-        print(f"❌ Error in get_orders: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+    return response
 
 @app.route("/update-order-status", methods=["POST"])
 def update_order_status():
@@ -4671,6 +5215,8 @@ def update_order_status():
     if not sale_id or not new_status:
         return jsonify({"error": "Missing sale_id or status"}), 400
 
+    changed_product_ids = set()
+
     try:
         with get_db() as db:
             sale = db.execute(
@@ -4685,6 +5231,8 @@ def update_order_status():
             ).fetchone()
 
             if not sale:
+                if archived_sale_id(db, business_id, sale_id=sale_id):
+                    return jsonify({"error": ARCHIVED_SALE_ERROR}), 409
                 return jsonify({"error": "Sale not found or access denied"}), 404
 
             current_status = sale[0]
@@ -4706,8 +5254,6 @@ def update_order_status():
                     {"sale_id": sale_id, "business_id": business_id}
                 ).fetchall()
 
-                changed_product_ids = set()
-
                 for item in items:
                     product_id = item[0]
                     bundle_id = item[1]
@@ -4781,8 +5327,9 @@ def update_order_status():
                         changed_product_ids.add(product_id)
 
                 if entering_completed:
-                    for product_id in changed_product_ids:
-                        send_low_stock_email_if_needed(product_id, business_id)
+                    queue_low_stock_emails(db, changed_product_ids, business_id)
+
+            apply_sale_rollup(db, business_id, sale_id, -1)
 
             db.execute(
                 text("""
@@ -4798,8 +5345,12 @@ def update_order_status():
                 }
             )
 
+            apply_sale_rollup(db, business_id, sale_id, 1)
+
             db.commit()
 
+        note_sale_stock_changes(business_id, changed_product_ids)
+
         return jsonify({"success": True}), 200
 
     except Exception as e:
@@ -4814,42 +5365,35 @@ def get_material_inventory():
         return jsonify({"error": "Business ID not found"}), 401
 
     try:
+        # One material_balances row per material, kept current by material_ledger.py
         query = """
             SELECT 
                 m.material_id,
                 m.material_name,
                 m.unit,
-                IFNULL(SUM(ms.quantity), 0) AS total_supplied,
-                IFNULL((
-                    SELECT SUM(pr.quantity * si.quantity)
-                    FROM product_recipes pr
-                    JOIN sales_items si ON pr.product_id = si.product_id AND si.business_id = :business_id
-                    WHERE pr.material_id = m.material_id
-                ), 0) AS total_used,
-                IFNULL(SUM(ms.quantity), 0) - IFNULL((
-                    SELECT SUM(pr.quantity * si.quantity)
-                    FROM product_recipes pr
-                    JOIN sales_items si ON pr.product_id = si.product_id AND si.business_id = :business_id
-                    WHERE pr.material_id = m.material_id
-                ), 0) AS current_stock,
-                IFNULL(SUM(ms.quantity * ms.unit_price), 0) AS total_cost,
+                IFNULL(b.supplied_quantity, 0) AS total_supplied,
+                IFNULL(b.used_quantity, 0) AS total_used,
+                IFNULL(b.wasted_quantity, 0) AS total_wasted,
+                IFNULL(b.balance, 0) AS current_stock,
+                IFNULL(b.supplied_cost, 0) AS total_cost,
                 CASE 
-                    WHEN IFNULL(SUM(ms.quantity), 0) > 0 
-                    THEN IFNULL(SUM(ms.quantity * ms.unit_price), 0) / IFNULL(SUM(ms.quantity), 0)
+                    WHEN IFNULL(b.supplied_quantity, 0) > 0 
+                    THEN b.supplied_cost / b.supplied_quantity
                     ELSE 0
                 END AS avg_unit_cost
             FROM raw_materials m
-            LEFT JOIN material_supplies ms ON m.material_id = ms.material_id AND ms.business_id = :business_id
+            LEFT JOIN material_balances b
+                ON b.business_id = :business_id
+                AND b.material_id = m.material_id
             WHERE m.business_id = :business_id
-            GROUP BY m.material_id, m.material_name, m.unit
             ORDER BY m.material_name
         """
         
-        materials = execute_query(query, {"business_id": business_id}, fetch_all=True)
+        materials = execute_query(query, {"business_id": business_id}, fetch_all=True, replica=True)
 
         # Convert decimal values to float
         for material in materials:
-            for key in ['total_supplied', 'total_used', 'current_stock', 'total_cost', 'avg_unit_cost']:
+            for key in ['total_supplied', 'total_used', 'total_wasted', 'current_stock', 'total_cost', 'avg_unit_cost']:
                 if material[key] is not None:
                     material[key] = float(material[key])
                 else:
@@ -4869,6 +5413,138 @@ def get_material_inventory():
             "error": str(e)
         }), 500
 
+MATERIAL_MOVEMENTS_PAGE_SIZE = 100
+MATERIAL_MOVEMENTS_MAX_PAGE_SIZE = 500
+
+@app.route('/api/v1/material-movements', methods=['POST'])
+def add_material_movement():
+    """
+    Record wastage (a positive quantity lost) or a stock count adjustment
+    (signed: positive adds stock, negative removes it) for a material.
+    """
+    business_id = get_business_id()
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
+
+    data = request.json or {}
+    material_id = data.get("material_id")
+    movement_type = data.get("movement_type")
+    note = data.get("note")
+
+    if not material_id or movement_type not in ("wastage", "adjustment"):
+        return jsonify({"error": "material_id and a movement_type of wastage or adjustment are required"}), 400
+
+    try:
+        quantity = Decimal(str(data.get("quantity")))
+    except (ArithmeticError, ValueError):
+        return jsonify({"error": "Invalid quantity"}), 400
+
+    if not quantity.is_finite() or quantity == 0 or (movement_type == "wastage" and quantity < 0):
+        return jsonify({"error": "Invalid quantity"}), 400
+
+    try:
+        with get_db() as db:
+            material = db.execute(
+                text("""
+                    SELECT material_id
+                    FROM raw_materials
+                    WHERE material_id = :material_id
+                    AND business_id = :business_id
+                """),
+                {"material_id": material_id, "business_id": business_id}
+            ).fetchone()
+
+            if not material:
+                return jsonify({"error": "Material not found or access denied"}), 404
+
+            record_material_movements(db, business_id, [{
+                "material_id": material_id,
+                "movement_type": movement_type,
+                "quantity": -quantity if movement_type == "wastage" else quantity,
+                "reference_type": "user",
+                "reference_id": session.get("user_id"),
+                "note": str(note)[:255] if note else None
+            }])
+
+        return jsonify({"message": "Material movement recorded successfully"}), 201
+
+    except Exception as e:
+        print("❌ Error recording material movement:", e)
+        traceback.print_exc()
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/api/v1/material-movements/<int:material_id>', methods=['GET'])
+def get_material_movements(material_id):
+    """
+    Ledger of one material, newest first.
+    Pass the returned next_cursor back as ?cursor= to get the next page.
+    """
+    business_id = get_business_id()
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
+
+    limit = request.args.get("limit", MATERIAL_MOVEMENTS_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), MATERIAL_MOVEMENTS_MAX_PAGE_SIZE)
+
+    cursor_filter = ""
+    params = {"business_id": business_id, "material_id": material_id, "limit": limit + 1}
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            cursor_created_at, cursor_movement_id = cursor.rsplit("|", 1)
+            params["cursor_created_at"] = datetime.fromisoformat(cursor_created_at)
+            params["cursor_movement_id"] = int(cursor_movement_id)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        cursor_filter = """
+            AND (
+                created_at < :cursor_created_at
+                OR (created_at = :cursor_created_at AND movement_id < :cursor_movement_id)
+            )
+        """
+
+    try:
+        with get_read_db() as db:
+            movements = db.execute(
+                text(f"""
+                    SELECT movement_id, movement_type, quantity, unit_cost,
+                           reference_type, reference_id, note, created_at
+                    FROM material_movements
+                    WHERE business_id = :business_id
+                    AND material_id = :material_id
+                    {cursor_filter}
+                    ORDER BY created_at DESC, movement_id DESC
+                    LIMIT :limit
+                """),
+                params
+            ).mappings().fetchall()
+
+        has_more = len(movements) > limit
+        movements = [dict(movement) for movement in movements[:limit]]
+
+        next_cursor = None
+        if has_more and movements:
+            last_movement = movements[-1]
+            next_cursor = f"{last_movement['created_at'].isoformat()}|{last_movement['movement_id']}"
+
+        for movement in movements:
+            movement["quantity"] = float(movement["quantity"])
+            movement["unit_cost"] = float(movement["unit_cost"]) if movement["unit_cost"] is not None else None
+            movement["created_at"] = movement["created_at"].isoformat()
+
+        return jsonify({
+            "movements": movements,
+            "next_cursor": next_cursor,
+            "has_more": has_more
+        }), 200
+
+    except Exception as e:
+        print("❌ Error fetching material movements:", e)
+        traceback.print_exc()
+        return jsonify({"error": "Internal server error"}), 500
+
 @app.route("/expenses", methods=["POST"])
 def add_expense():
     data = request.json
@@ -4930,6 +5606,8 @@ def add_expense():
                     }
                 )
 
+                record_catalogue_changes(db, business_id, product_ids=[product_id])
+
             db.execute(
                 text("""
                     INSERT INTO expenses (
@@ -5055,6 +5733,7 @@ def update_expense(expense_id):
                         """),
                         {"old_qty": old_waste_qty, "product_id": old_product_id, "business_id": business_id}
                     )
+                    record_catalogue_changes(db, business_id, product_ids=[old_product_id])
 
             if new_category == "Waste":
                 # Apply new waste deduction
@@ -5085,6 +5764,7 @@ def update_expense(expense_id):
                     """),
                     {"new_qty": new_waste_qty, "product_id": new_product_id, "business_id": business_id}
                 )
+                record_catalogue_changes(db, business_id, product_ids=[new_product_id])
 
             # Update the expense record
             db.execute(
@@ -5150,6 +5830,7 @@ def delete_expense(expense_id):
                     """),
                     {"waste_qty": waste_qty, "product_id": product_id, "business_id": business_id}
                 )
+                record_catalogue_changes(db, business_id, product_ids=[product_id])
 
             # Delete the expense
             db.execute(
@@ -5203,6 +5884,10 @@ def soft_delete_product(product_id):
                 }
             )
 
+            record_catalogue_changes(db, business_id, product_ids=[product_id], deleted=True)
+
+        barcode_index.invalidate(business_id, [product_id])
+
         return jsonify({"message": "Product soft-deleted successfully"}), 200
 
     except Exception as e:
@@ -5252,6 +5937,8 @@ def soft_delete_bundle(bundle_id):
                 }
             )
 
+            record_catalogue_changes(db, business_id, bundle_ids=[bundle_id], deleted=True)
+
         return jsonify({
             "message": "Bundle soft-deleted successfully"
         }), 200
@@ -5278,6 +5965,7 @@ def health_check():
             "status": "healthy",
             "database": "connected",
             "pool": pool_status,
+            "replica": get_replica_status(),
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
@@ -5287,6 +5975,18 @@ def health_check():
             "timestamp": datetime.now().isoformat()
         }), 500
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Per-endpoint query metrics in Prometheus text format"""
+    metrics_token = os.getenv("METRICS_TOKEN")
+    if metrics_token and request.headers.get("Authorization") != f"Bearer {metrics_token}":
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return Response(
+        query_profiler.render_metrics(get_pool_status(), get_replica_status()),
+        mimetype="text/plain; version=0.0.4"
+    )
+
 @app.route("/add-invoice", methods=["POST"])
 def add_invoice():
     data = request.json
@@ -5472,213 +6172,608 @@ def add_invoice():
                 }
             )
 
-            invoice_id = invoice_result.lastrowid
+            invoice_id = invoice_result.lastrowid
+
+            # 7. Create sale
+            order_number = generate_order_number(business_id)
+
+            sale_result = db.execute(
+                text("""
+                   INSERT INTO sales (
+            customer_id,
+            total_price,
+            payment_type,
+            vat,
+            discount,
+            status,
+            order_number,
+            business_id,
+            user_id,
+            invoice_id
+        )
+        VALUES (
+            :customer_id,
+            :total_price,
+            :payment_type,
+            :vat,
+            :discount,
+            :status,
+            :order_number,
+            :business_id,
+            :user_id,
+            :invoice_id
+        )
+    """),
+    {
+        "customer_id": customer_id,
+        "total_price": sale_total,
+        "payment_type": sale_payment_type,
+        "vat": vat,
+        "discount": discount,
+        "status": "completed",
+        "order_number": order_number,
+        "business_id": business_id,
+        "user_id": user_id,
+        "invoice_id": invoice_id,
+                }
+            )
+
+            sale_id = sale_result.lastrowid
+
+            discount_ratio = discount / subtotal if subtotal > 0 else 0
+
+            # 8. Insert invoice items + sales_items + reduce stock
+            for item in items:
+                product_id = item.get("product_id")
+                quantity = float(item.get("quantity", 1) or 1)
+                unit_price = float(item.get("unit_price", 0) or 0)
+                item_subtotal = quantity * unit_price
+                item_discount = item_subtotal * discount_ratio
+
+                product = db.execute(
+                    text("""
+                        SELECT buying_price
+                        FROM products
+                        WHERE product_id = :product_id
+                        AND business_id = :business_id
+                        FOR UPDATE
+                    """),
+                    {
+                        "product_id": product_id,
+                        "business_id": business_id
+                    }
+                ).fetchone()
+
+                buying_price = float(product[0] or 0) if product else 0
+                cost = quantity * buying_price
+                profit = item_subtotal - cost - item_discount
+
+                db.execute(
+                    text("""
+                        INSERT INTO invoice_items (
+                            invoice_id, item_name, quantity, unit_price, subtotal, business_id
+                        )
+                        VALUES (
+                            :invoice_id, :item_name, :quantity, :unit_price, :subtotal, :business_id
+                        )
+                    """),
+                    {
+                        "invoice_id": invoice_id,
+                        "item_name": item.get("item_name"),
+                        "quantity": quantity,
+                        "unit_price": unit_price,
+                        "subtotal": item_subtotal,
+                        "business_id": business_id
+                    }
+                )
+
+                db.execute(
+                    text("""
+                        INSERT INTO sales_items (
+                            sale_id, product_id, bundle_id, quantity,
+                            subtotal, buying_price, profit, business_id
+                        )
+                        VALUES (
+                            :sale_id, :product_id, NULL, :quantity,
+                            :subtotal, :buying_price, :profit, :business_id
+                        )
+                    """),
+                    {
+                        "sale_id": sale_id,
+                        "product_id": product_id,
+                        "quantity": quantity,
+                        "subtotal": item_subtotal,
+                        "buying_price": buying_price,
+                        "profit": profit,
+                        "business_id": business_id
+                    }
+                )
+
+                db.execute(
+                    text("""
+                        UPDATE products
+                        SET product_stock = product_stock - :quantity
+                        WHERE product_id = :product_id
+                        AND business_id = :business_id
+                    """),
+                    {
+                        "quantity": quantity,
+                        "product_id": product_id,
+                        "business_id": business_id
+                    }
+                )
+
+            record_sale_consumption(db, business_id, [sale_id])
+
+            # 9. Add previous balance as invoice display item only
+            for linked_invoice in linked_invoice_rows:
+                db.execute(
+                    text("""
+                        INSERT INTO invoice_items (
+                            invoice_id, item_name, quantity, unit_price, subtotal, business_id
+                        )
+                        VALUES (
+                            :invoice_id, :item_name, :quantity, :unit_price, :subtotal, :business_id
+                        )
+                    """),
+                    {
+                        "invoice_id": invoice_id,
+                        "item_name": f"Previous balance from {linked_invoice['invoice_number']}",
+                        "quantity": 1,
+                        "unit_price": float(linked_invoice["balance_due"] or 0),
+                        "subtotal": float(linked_invoice["balance_due"] or 0),
+                        "business_id": business_id
+                    }
+                )
+
+            apply_sale_rollup(db, business_id, sale_id, 1)
+
+        note_sale_stock_changes(business_id, [item.get("product_id") for item in items])
+
+        return jsonify({
+            "message": "Invoice and sale created successfully",
+            "invoice_id": invoice_id,
+            "invoice_number": invoice_number,
+            "sale_id": sale_id,
+            "order_number": order_number,
+            "subtotal": subtotal,
+            "previous_balance_total": previous_balance_total,
+            "total_amount": total_amount,
+            "sale_total": sale_total,
+            "amount_paid": amount_paid,
+            "balance_due": balance_due,
+            "status": invoice_status,
+            "payment_type": sale_payment_type
+        }), 201
+
+    except Exception as e:
+        print("❌ Error adding invoice:", e)
+        traceback.print_exc()
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+
+class RoundedStatusBadge(Flowable):
+    def __init__(self, text, bg_color, width=95, height=28):
+        super().__init__()
+        self.text = text
+        self.bg_color = bg_color
+        self.width = width
+        self.height = height
+
+    def draw(self):
+        self.canv.setFillColor(self.bg_color)
+        self.canv.roundRect(
+            0,
+            0,
+            self.width,
+            self.height,
+            self.height / 2,
+            fill=1,
+            stroke=0
+        )
+
+        self.canv.setFillColor(colors.white)
+        self.canv.setFont("Helvetica-Bold", 11)
+        self.canv.drawCentredString(
+            self.width / 2,
+            9,
+            self.text
+        )
+
+def render_invoice_pdf_document(invoice, items):
+    """Render the invoice PDF served by /invoice-pdf and /public-invoice"""
+    buffer = BytesIO()
+
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=22 * mm,
+        leftMargin=22 * mm,
+        topMargin=18 * mm,
+        bottomMargin=18 * mm,
+    )
+
+    styles = getSampleStyleSheet()
+
+    navy = colors.HexColor("#0b1446")
+    light_card = colors.HexColor("#f1f4f8")
+    light_note = colors.HexColor("#f8fafc")
+    balance_bg = colors.HexColor("#fff4e5")
+    border = colors.HexColor("#e5e7eb")
+    red = colors.HexColor("#dc2626")
+    green = colors.HexColor("#16a34a")
+    orange = colors.HexColor("#f59e0b")
+    dark = colors.HexColor("#111827")
+
+    status = str(invoice["status"] or "unpaid").lower()
+    status_bg = {
+        "paid": green,
+        "partial": orange,
+        "unpaid": red,
+        "cancelled": dark,
+    }.get(status, red)
+
+    status_text = status.upper()
+
+    normal_style = ParagraphStyle(
+        "NormalStyle",
+        parent=styles["Normal"],
+        fontSize=9,
+        leading=13,
+        textColor=colors.HexColor("#333333"),
+    )
+
+    invoice_title_style = ParagraphStyle(
+        "InvoiceTitle",
+        parent=styles["Normal"],
+        fontName="Helvetica-Bold",
+        fontSize=24,
+        leading=28,
+        textColor=navy,
+        alignment=2,
+    )
+
+    story = []
+
+    company_info = f"""
+    <font size="20" color="#0b1446"><b>{invoice['company_name'] or 'Company Name'}</b></font><br/><br/>
+    {invoice['company_phone'] or ''}<br/>
+    {invoice['company_email'] or ''}<br/>
+    {invoice['company_address'] or ''}
+    """
+
+    invoice_header = f"""
+    <font size="24"><b>INVOICE</b></font><br/>
+    <font size="10"># {invoice['invoice_number']}</font>
+    """
+
+    header_table = Table(
+        [[
+            Paragraph(company_info, normal_style),
+            Paragraph(invoice_header, invoice_title_style),
+        ]],
+        colWidths=[250, 250],
+    )
+
+    header_table.setStyle(TableStyle([
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("ALIGN", (1, 0), (1, 0), "RIGHT"),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
+    ]))
+
+    story.append(header_table)
+
+    badge = RoundedStatusBadge(
+        status_text,
+        status_bg,
+        width=95,
+        height=28
+    )
+
+    badge_wrapper = Table(
+        [["", badge]],
+        colWidths=[405, 95]
+    )
+
+    badge_wrapper.setStyle(TableStyle([
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ]))
+
+    story.append(badge_wrapper)
+    story.append(Spacer(1, 14))
+
+    divider = Table([[""]], colWidths=[500], rowHeights=[2])
+    divider.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, -1), navy),
+    ]))
+
+    story.append(divider)
+    story.append(Spacer(1, 16))
+
+    bill_to = f"""
+    <font size="11" color="#0b1446"><b>Bill To</b></font><br/><br/>
+    <b>{invoice['customer_name'] or 'Customer'}</b><br/>
+    {invoice['customer_phone'] or ''}<br/>
+    {invoice['customer_email'] or ''}<br/>
+    {invoice['customer_address'] or ''}
+    """
+
+    invoice_details = f"""
+    <font size="11" color="#0b1446"><b>Invoice Details</b></font><br/><br/>
+    <b>Invoice Date:</b> {invoice['issue_date']}<br/>
+    <b>Due Date:</b> {invoice['due_date'] or 'N/A'}<br/>
+    <b>Status:</b> {status_text}
+    """
+
+    bill_card = Table(
+        [[Paragraph(bill_to, normal_style)]],
+        colWidths=[230],
+        rowHeights=[92],
+    )
+
+    bill_card.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, -1), light_card),
+        ("BOX", (0, 0), (-1, -1), 0.5, light_card),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("LEFTPADDING", (0, 0), (-1, -1), 14),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 14),
+        ("TOPPADDING", (0, 0), (-1, -1), 14),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 14),
+    ]))
+
+    details_card = Table(
+        [[Paragraph(invoice_details, normal_style)]],
+        colWidths=[230],
+        rowHeights=[92],
+    )
+
+    details_card.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, -1), light_card),
+        ("BOX", (0, 0), (-1, -1), 0.5, light_card),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("LEFTPADDING", (0, 0), (-1, -1), 14),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 14),
+        ("TOPPADDING", (0, 0), (-1, -1), 14),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 14),
+    ]))
+
+    cards_table = Table(
+        [[bill_card, "", details_card]],
+        colWidths=[230, 30, 230],
+        hAlign="CENTER",
+    )
+
+    cards_table.setStyle(TableStyle([
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+
+    story.append(cards_table)
+    story.append(Spacer(1, 18))
+
+    item_data = [["Item", "Qty", "Rate", "Amount"]]
+
+    for item in items:
+        item_data.append([
+            item["item_name"] or "",
+            f"{float(item['quantity'] or 0):,.2f}",
+            f"KES {float(item['unit_price'] or 0):,.2f}",
+            f"KES {float(item['subtotal'] or 0):,.2f}",
+        ])
+
+    items_table = Table(
+        item_data,
+        colWidths=[210, 70, 100, 120],
+    )
+
+    items_table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), navy),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, 0), 8.8),
+        ("ALIGN", (0, 0), (0, -1), "LEFT"),
+        ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 9),
+        ("TOPPADDING", (0, 0), (-1, 0), 9),
+        ("FONTSIZE", (0, 1), (-1, -1), 8.2),
+        ("TEXTCOLOR", (0, 1), (-1, -1), colors.HexColor("#111111")),
+        ("LINEBELOW", (0, 1), (-1, -1), 0.5, colors.HexColor("#dddddd")),
+        ("TOPPADDING", (0, 1), (-1, -1), 8),
+        ("BOTTOMPADDING", (0, 1), (-1, -1), 8),
+    ]))
+
+    story.append(items_table)
+    story.append(Spacer(1, 18))
+
+    totals_data = [
+        ["Subtotal", f"KES {float(invoice['subtotal'] or 0):,.2f}"],
+        ["VAT", f"KES {float(invoice['vat'] or 0):,.2f}"],
+        ["Discount", f"KES {float(invoice['discount'] or 0):,.2f}"],
+        ["Total", f"KES {float(invoice['total_amount'] or 0):,.2f}"],
+        ["Amount Paid", f"KES {float(invoice['amount_paid'] or 0):,.2f}"],
+        ["Balance Due", f"KES {float(invoice['balance_due'] or 0):,.2f}"],
+    ]
+
+    totals_table = Table(
+        totals_data,
+        colWidths=[140, 140],
+        hAlign="RIGHT",
+    )
+
+    totals_table.setStyle(TableStyle([
+        ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
+        ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
+        ("FONTNAME", (0, 3), (-1, 3), "Helvetica-Bold"),
+        ("FONTNAME", (0, 5), (-1, 5), "Helvetica-Bold"),
+        ("TEXTCOLOR", (0, 3), (-1, 3), navy),
+        ("FONTSIZE", (0, 0), (-1, -1), 8.8),
+        ("FONTSIZE", (0, 3), (-1, 3), 10.5),
+        ("FONTSIZE", (0, 5), (-1, 5), 9.5),
+        ("LINEBELOW", (0, 0), (-1, 4), 0.5, border),
+        ("BACKGROUND", (0, 5), (-1, 5), balance_bg),
+        ("TOPPADDING", (0, 0), (-1, -1), 8),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
+        ("LEFTPADDING", (0, 0), (-1, -1), 10),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 10),
+    ]))
+
+    story.append(totals_table)
+    story.append(Spacer(1, 24))
+
+    notes_text = invoice["notes"] or "N/A"
+
+    notes_table = Table(
+        [[
+            Paragraph(
+                f"<font color='#0b1446'><b>Notes:</b></font><br/><br/>{notes_text}",
+                normal_style
+            )
+        ]],
+        colWidths=[500],
+    )
+
+    notes_table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, -1), light_note),
+        ("BOX", (0, 0), (-1, -1), 0.5, light_note),
+        ("LEFTPADDING", (0, 0), (-1, -1), 14),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 14),
+        ("TOPPADDING", (0, 0), (-1, -1), 14),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 14),
+    ]))
+
+    story.append(notes_table)
+
+    doc.build(story)
+    buffer.seek(0)
+
+    return buffer.read()
+
+
+# ==================== INVOICE PDF CACHE ====================
+
+INVOICE_PDF_CACHE_MAX_BYTES = int(os.getenv("INVOICE_PDF_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Digest of the printed item rows, selected with an invoice (aliased i) so
+# its PDF version changes whenever an item does
+INVOICE_ITEMS_DIGEST_COLUMN = """
+    (
+        SELECT MD5(GROUP_CONCAT(
+            CONCAT_WS('|', ii.item_name, ii.quantity, ii.unit_price, ii.subtotal)
+            ORDER BY ii.invoice_item_id SEPARATOR '\\n'
+        ))
+        FROM invoice_items ii
+        WHERE ii.invoice_id = i.invoice_id
+        AND ii.business_id = i.business_id
+    ) AS items_digest
+"""
+
+
+class InvoicePdfCache:
+    """
+    Size-bounded in-memory LRU of rendered invoice PDFs.
+    Entries are keyed by (kind, business_id, invoice_id, version) where the
+    version comes from invoices.updated_at, so an edited invoice never hits
+    a stale entry even before it is explicitly invalidated.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            pdf_bytes = self.entries.get(key)
+            if pdf_bytes is not None:
+                self.entries.move_to_end(key)
+            return pdf_bytes
+
+    def put(self, key, pdf_bytes):
+        if len(pdf_bytes) > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= len(self.entries.pop(key))
 
-            # 7. Create sale
-            order_number = generate_order_number()
+            self.entries[key] = pdf_bytes
+            self.total_bytes += len(pdf_bytes)
 
-            sale_result = db.execute(
-                text("""
-                   INSERT INTO sales (
-            customer_id,
-            total_price,
-            payment_type,
-            vat,
-            discount,
-            status,
-            order_number,
-            business_id,
-            user_id,
-            invoice_id
-        )
-        VALUES (
-            :customer_id,
-            :total_price,
-            :payment_type,
-            :vat,
-            :discount,
-            :status,
-            :order_number,
-            :business_id,
-            :user_id,
-            :invoice_id
-        )
-    """),
-    {
-        "customer_id": customer_id,
-        "total_price": sale_total,
-        "payment_type": sale_payment_type,
-        "vat": vat,
-        "discount": discount,
-        "status": "completed",
-        "order_number": order_number,
-        "business_id": business_id,
-        "user_id": user_id,
-        "invoice_id": invoice_id,
-                }
-            )
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
 
-            sale_id = sale_result.lastrowid
+    def invalidate(self, business_id, invoice_id):
+        with self.lock:
+            for key in [
+                key for key in self.entries
+                if str(key[1]) == str(business_id) and str(key[2]) == str(invoice_id)
+            ]:
+                self.total_bytes -= len(self.entries.pop(key))
 
-            discount_ratio = discount / subtotal if subtotal > 0 else 0
 
-            # 8. Insert invoice items + sales_items + reduce stock
-            for item in items:
-                product_id = item.get("product_id")
-                quantity = float(item.get("quantity", 1) or 1)
-                unit_price = float(item.get("unit_price", 0) or 0)
-                item_subtotal = quantity * unit_price
-                item_discount = item_subtotal * discount_ratio
+invoice_pdf_cache = InvoicePdfCache(INVOICE_PDF_CACHE_MAX_BYTES)
 
-                product = db.execute(
-                    text("""
-                        SELECT buying_price
-                        FROM products
-                        WHERE product_id = :product_id
-                        AND business_id = :business_id
-                        FOR UPDATE
-                    """),
-                    {
-                        "product_id": product_id,
-                        "business_id": business_id
-                    }
-                ).fetchone()
 
-                buying_price = float(product[0] or 0) if product else 0
-                cost = quantity * buying_price
-                profit = item_subtotal - cost - item_discount
+def invoice_pdf_version(invoice):
+    version = str(invoice.get("updated_at") or invoice.get("created_at") or "")
 
-                db.execute(
-                    text("""
-                        INSERT INTO invoice_items (
-                            invoice_id, item_name, quantity, unit_price, subtotal, business_id
-                        )
-                        VALUES (
-                            :invoice_id, :item_name, :quantity, :unit_price, :subtotal, :business_id
-                        )
-                    """),
-                    {
-                        "invoice_id": invoice_id,
-                        "item_name": item.get("item_name"),
-                        "quantity": quantity,
-                        "unit_price": unit_price,
-                        "subtotal": item_subtotal,
-                        "business_id": business_id
-                    }
-                )
+    # PDFs print the company details, so a business update is a new version too
+    if invoice.get("company_updated_at"):
+        version += f"|{invoice['company_updated_at']}"
 
-                db.execute(
-                    text("""
-                        INSERT INTO sales_items (
-                            sale_id, product_id, bundle_id, quantity,
-                            subtotal, buying_price, profit, business_id
-                        )
-                        VALUES (
-                            :sale_id, :product_id, NULL, :quantity,
-                            :subtotal, :buying_price, :profit, :business_id
-                        )
-                    """),
-                    {
-                        "sale_id": sale_id,
-                        "product_id": product_id,
-                        "quantity": quantity,
-                        "subtotal": item_subtotal,
-                        "buying_price": buying_price,
-                        "profit": profit,
-                        "business_id": business_id
-                    }
-                )
+    # The same goes for the customer; the printed fields are hashed as well,
+    # since two edits within one second share an updated_at
+    customer_fields = "|".join(
+        str(invoice.get(field) or "")
+        for field in ("customer_name", "customer_email", "customer_phone", "customer_address")
+    )
+    version += f"|{invoice.get('customer_updated_at') or ''}"
+    version += f"|{hashlib.sha256(customer_fields.encode()).hexdigest()[:16]}"
 
-                db.execute(
-                    text("""
-                        UPDATE products
-                        SET product_stock = product_stock - :quantity
-                        WHERE product_id = :product_id
-                        AND business_id = :business_id
-                    """),
-                    {
-                        "quantity": quantity,
-                        "product_id": product_id,
-                        "business_id": business_id
-                    }
-                )
+    # Item edits that keep the totals leave the invoice row untouched
+    version += f"|{invoice.get('items_digest') or ''}"
 
-            # 9. Add previous balance as invoice display item only
-            for linked_invoice in linked_invoice_rows:
-                db.execute(
-                    text("""
-                        INSERT INTO invoice_items (
-                            invoice_id, item_name, quantity, unit_price, subtotal, business_id
-                        )
-                        VALUES (
-                            :invoice_id, :item_name, :quantity, :unit_price, :subtotal, :business_id
-                        )
-                    """),
-                    {
-                        "invoice_id": invoice_id,
-                        "item_name": f"Previous balance from {linked_invoice['invoice_number']}",
-                        "quantity": 1,
-                        "unit_price": float(linked_invoice["balance_due"] or 0),
-                        "subtotal": float(linked_invoice["balance_due"] or 0),
-                        "business_id": business_id
-                    }
-                )
+    return version
 
-        return jsonify({
-            "message": "Invoice and sale created successfully",
-            "invoice_id": invoice_id,
-            "invoice_number": invoice_number,
-            "sale_id": sale_id,
-            "order_number": order_number,
-            "subtotal": subtotal,
-            "previous_balance_total": previous_balance_total,
-            "total_amount": total_amount,
-            "sale_total": sale_total,
-            "amount_paid": amount_paid,
-            "balance_due": balance_due,
-            "status": invoice_status,
-            "payment_type": sale_payment_type
-        }), 201
 
-    except Exception as e:
-        print("❌ Error adding invoice:", e)
-        traceback.print_exc()
-        return jsonify({"error": f"Database error: {str(e)}"}), 500
+def invoice_company_fields(business_id):
+    """Company columns of the invoice queries, served from the business cache"""
+    business = business_cache.get(business_id) or {}
+
+    return {
+        "company_name": business.get("name"),
+        "company_phone": business.get("phone"),
+        "company_email": business.get("email"),
+        "company_address": business.get("address"),
+        "company_city": business.get("city"),
+        "company_country": business.get("country"),
+        "company_updated_at": business.get("updated_at"),
+    }
 
 
-class RoundedStatusBadge(Flowable):
-    def __init__(self, text, bg_color, width=95, height=28):
-        super().__init__()
-        self.text = text
-        self.bg_color = bg_color
-        self.width = width
-        self.height = height
+def invoice_pdf_etag(kind, business_id, invoice_id, version):
+    digest = hashlib.sha256(f"{kind}:{business_id}:{invoice_id}:{version}".encode()).hexdigest()
+    return digest[:32]
 
-    def draw(self):
-        self.canv.setFillColor(self.bg_color)
-        self.canv.roundRect(
-            0,
-            0,
-            self.width,
-            self.height,
-            self.height / 2,
-            fill=1,
-            stroke=0
-        )
 
-        self.canv.setFillColor(colors.white)
-        self.canv.setFont("Helvetica-Bold", 11)
-        self.canv.drawCentredString(
-            self.width / 2,
-            9,
-            self.text
-        )
+def get_cached_invoice_pdf(kind, business_id, invoice, render):
+    """Return cached PDF bytes for this invoice version, rendering on a miss"""
+    key = (kind, str(business_id), invoice["invoice_id"], invoice_pdf_version(invoice))
+
+    pdf_bytes = invoice_pdf_cache.get(key)
+    if pdf_bytes is None:
+        pdf_bytes = render()
+        invoice_pdf_cache.put(key, pdf_bytes)
+
+    return pdf_bytes
+
 
 def generate_invoice_pdf_response(invoice_id, business_id):
     try:
         with get_db() as db:
             invoice = db.execute(
-                text("""
+                text(f"""
                     SELECT
                         i.invoice_id,
                         i.invoice_number,
@@ -5692,22 +6787,19 @@ def generate_invoice_pdf_response(invoice_id, business_id):
                         i.balance_due,
                         i.status,
                         i.notes,
+                        i.created_at,
+                        i.updated_at,
 
                         c.customer_name AS customer_name,
                         c.email AS customer_email,
                         c.phone AS customer_phone,
                         c.address AS customer_address,
-
-                        b.name AS company_name,
-                        b.phone AS company_phone,
-                        b.email AS company_email,
-                        b.address AS company_address
+                        c.updated_at AS customer_updated_at,
+                        {INVOICE_ITEMS_DIGEST_COLUMN}
                     FROM invoices i
                     LEFT JOIN customers c
                         ON i.customer_id = c.customer_id
                         AND i.business_id = c.business_id
-                    LEFT JOIN businesses b
-                        ON i.business_id = b.id
                     WHERE i.invoice_id = :invoice_id
                     AND i.business_id = :business_id
                 """),
@@ -5720,290 +6812,46 @@ def generate_invoice_pdf_response(invoice_id, business_id):
             if not invoice:
                 return jsonify({"error": "Invoice not found"}), 404
 
-            items = db.execute(
-                text("""
-                    SELECT item_name, quantity, unit_price, subtotal
-                    FROM invoice_items
-                    WHERE invoice_id = :invoice_id
-                    AND business_id = :business_id
-                    ORDER BY invoice_item_id ASC
-                """),
-                {
-                    "invoice_id": invoice_id,
-                    "business_id": business_id
-                }
-            ).mappings().all()
-
-        buffer = BytesIO()
-
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=22 * mm,
-            leftMargin=22 * mm,
-            topMargin=18 * mm,
-            bottomMargin=18 * mm,
-        )
-
-        styles = getSampleStyleSheet()
-
-        navy = colors.HexColor("#0b1446")
-        light_card = colors.HexColor("#f1f4f8")
-        light_note = colors.HexColor("#f8fafc")
-        balance_bg = colors.HexColor("#fff4e5")
-        border = colors.HexColor("#e5e7eb")
-        red = colors.HexColor("#dc2626")
-        green = colors.HexColor("#16a34a")
-        orange = colors.HexColor("#f59e0b")
-        dark = colors.HexColor("#111827")
-
-        status = str(invoice["status"] or "unpaid").lower()
-        status_bg = {
-            "paid": green,
-            "partial": orange,
-            "unpaid": red,
-            "cancelled": dark,
-        }.get(status, red)
-
-        status_text = status.upper()
-
-        normal_style = ParagraphStyle(
-            "NormalStyle",
-            parent=styles["Normal"],
-            fontSize=9,
-            leading=13,
-            textColor=colors.HexColor("#333333"),
-        )
-
-        invoice_title_style = ParagraphStyle(
-            "InvoiceTitle",
-            parent=styles["Normal"],
-            fontName="Helvetica-Bold",
-            fontSize=24,
-            leading=28,
-            textColor=navy,
-            alignment=2,
-        )
-
-        story = []
-
-        company_info = f"""
-        <font size="20" color="#0b1446"><b>{invoice['company_name'] or 'Company Name'}</b></font><br/><br/>
-        {invoice['company_phone'] or ''}<br/>
-        {invoice['company_email'] or ''}<br/>
-        {invoice['company_address'] or ''}
-        """
-
-        invoice_header = f"""
-        <font size="24"><b>INVOICE</b></font><br/>
-        <font size="10"># {invoice['invoice_number']}</font>
-        """
-
-        header_table = Table(
-            [[
-                Paragraph(company_info, normal_style),
-                Paragraph(invoice_header, invoice_title_style),
-            ]],
-            colWidths=[250, 250],
-        )
-
-        header_table.setStyle(TableStyle([
-            ("VALIGN", (0, 0), (-1, -1), "TOP"),
-            ("ALIGN", (1, 0), (1, 0), "RIGHT"),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-        ]))
-
-        story.append(header_table)
-
-        badge = RoundedStatusBadge(
-            status_text,
-            status_bg,
-            width=95,
-            height=28
-        )
-
-        badge_wrapper = Table(
-            [["", badge]],
-            colWidths=[405, 95]
-        )
-
-        badge_wrapper.setStyle(TableStyle([
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ]))
+            invoice = {**invoice, **invoice_company_fields(business_id)}
 
-        story.append(badge_wrapper)
-        story.append(Spacer(1, 14))
+            etag = invoice_pdf_etag("view", business_id, invoice_id, invoice_pdf_version(invoice))
 
-        divider = Table([[""]], colWidths=[500], rowHeights=[2])
-        divider.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, -1), navy),
-        ]))
+            # Repeat viewers revalidate with If-None-Match and get an empty 304
+            if etag in request.if_none_match:
+                response = make_response("", 304)
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = "private, no-cache"
+                return response
 
-        story.append(divider)
-        story.append(Spacer(1, 16))
-
-        bill_to = f"""
-        <font size="11" color="#0b1446"><b>Bill To</b></font><br/><br/>
-        <b>{invoice['customer_name'] or 'Customer'}</b><br/>
-        {invoice['customer_phone'] or ''}<br/>
-        {invoice['customer_email'] or ''}<br/>
-        {invoice['customer_address'] or ''}
-        """
-
-        invoice_details = f"""
-        <font size="11" color="#0b1446"><b>Invoice Details</b></font><br/><br/>
-        <b>Invoice Date:</b> {invoice['issue_date']}<br/>
-        <b>Due Date:</b> {invoice['due_date'] or 'N/A'}<br/>
-        <b>Status:</b> {status_text}
-        """
-
-        bill_card = Table(
-            [[Paragraph(bill_to, normal_style)]],
-            colWidths=[230],
-            rowHeights=[92],
-        )
-
-        bill_card.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, -1), light_card),
-            ("BOX", (0, 0), (-1, -1), 0.5, light_card),
-            ("VALIGN", (0, 0), (-1, -1), "TOP"),
-            ("LEFTPADDING", (0, 0), (-1, -1), 14),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 14),
-            ("TOPPADDING", (0, 0), (-1, -1), 14),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 14),
-        ]))
-
-        details_card = Table(
-            [[Paragraph(invoice_details, normal_style)]],
-            colWidths=[230],
-            rowHeights=[92],
-        )
-
-        details_card.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, -1), light_card),
-            ("BOX", (0, 0), (-1, -1), 0.5, light_card),
-            ("VALIGN", (0, 0), (-1, -1), "TOP"),
-            ("LEFTPADDING", (0, 0), (-1, -1), 14),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 14),
-            ("TOPPADDING", (0, 0), (-1, -1), 14),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 14),
-        ]))
-
-        cards_table = Table(
-            [[bill_card, "", details_card]],
-            colWidths=[230, 30, 230],
-            hAlign="CENTER",
-        )
-
-        cards_table.setStyle(TableStyle([
-            ("VALIGN", (0, 0), (-1, -1), "TOP"),
-        ]))
-
-        story.append(cards_table)
-        story.append(Spacer(1, 18))
-
-        item_data = [["Item", "Qty", "Rate", "Amount"]]
-
-        for item in items:
-            item_data.append([
-                item["item_name"] or "",
-                f"{float(item['quantity'] or 0):,.2f}",
-                f"KES {float(item['unit_price'] or 0):,.2f}",
-                f"KES {float(item['subtotal'] or 0):,.2f}",
-            ])
-
-        items_table = Table(
-            item_data,
-            colWidths=[210, 70, 100, 120],
-        )
-
-        items_table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), navy),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE", (0, 0), (-1, 0), 8.8),
-            ("ALIGN", (0, 0), (0, -1), "LEFT"),
-            ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
-            ("BOTTOMPADDING", (0, 0), (-1, 0), 9),
-            ("TOPPADDING", (0, 0), (-1, 0), 9),
-            ("FONTSIZE", (0, 1), (-1, -1), 8.2),
-            ("TEXTCOLOR", (0, 1), (-1, -1), colors.HexColor("#111111")),
-            ("LINEBELOW", (0, 1), (-1, -1), 0.5, colors.HexColor("#dddddd")),
-            ("TOPPADDING", (0, 1), (-1, -1), 8),
-            ("BOTTOMPADDING", (0, 1), (-1, -1), 8),
-        ]))
-
-        story.append(items_table)
-        story.append(Spacer(1, 18))
-
-        totals_data = [
-            ["Subtotal", f"KES {float(invoice['subtotal'] or 0):,.2f}"],
-            ["VAT", f"KES {float(invoice['vat'] or 0):,.2f}"],
-            ["Discount", f"KES {float(invoice['discount'] or 0):,.2f}"],
-            ["Total", f"KES {float(invoice['total_amount'] or 0):,.2f}"],
-            ["Amount Paid", f"KES {float(invoice['amount_paid'] or 0):,.2f}"],
-            ["Balance Due", f"KES {float(invoice['balance_due'] or 0):,.2f}"],
-        ]
-
-        totals_table = Table(
-            totals_data,
-            colWidths=[140, 140],
-            hAlign="RIGHT",
-        )
-
-        totals_table.setStyle(TableStyle([
-            ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
-            ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-            ("FONTNAME", (0, 3), (-1, 3), "Helvetica-Bold"),
-            ("FONTNAME", (0, 5), (-1, 5), "Helvetica-Bold"),
-            ("TEXTCOLOR", (0, 3), (-1, 3), navy),
-            ("FONTSIZE", (0, 0), (-1, -1), 8.8),
-            ("FONTSIZE", (0, 3), (-1, 3), 10.5),
-            ("FONTSIZE", (0, 5), (-1, 5), 9.5),
-            ("LINEBELOW", (0, 0), (-1, 4), 0.5, border),
-            ("BACKGROUND", (0, 5), (-1, 5), balance_bg),
-            ("TOPPADDING", (0, 0), (-1, -1), 8),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-            ("LEFTPADDING", (0, 0), (-1, -1), 10),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 10),
-        ]))
-
-        story.append(totals_table)
-        story.append(Spacer(1, 24))
-
-        notes_text = invoice["notes"] or "N/A"
-
-        notes_table = Table(
-            [[
-                Paragraph(
-                    f"<font color='#0b1446'><b>Notes:</b></font><br/><br/>{notes_text}",
-                    normal_style
-                )
-            ]],
-            colWidths=[500],
-        )
-
-        notes_table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, -1), light_note),
-            ("BOX", (0, 0), (-1, -1), 0.5, light_note),
-            ("LEFTPADDING", (0, 0), (-1, -1), 14),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 14),
-            ("TOPPADDING", (0, 0), (-1, -1), 14),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 14),
-        ]))
-
-        story.append(notes_table)
+            def render():
+                items = db.execute(
+                    text("""
+                        SELECT item_name, quantity, unit_price, subtotal
+                        FROM invoice_items
+                        WHERE invoice_id = :invoice_id
+                        AND business_id = :business_id
+                        ORDER BY invoice_item_id ASC
+                    """),
+                    {
+                        "invoice_id": invoice_id,
+                        "business_id": business_id
+                    }
+                ).mappings().all()
 
-        doc.build(story)
+                return render_invoice_pdf_document(invoice, items)
 
-        buffer.seek(0)
+            pdf_bytes = get_cached_invoice_pdf("view", business_id, invoice, render)
 
-        return send_file(
-            buffer,
+        response = send_file(
+            BytesIO(pdf_bytes),
             mimetype="application/pdf",
             as_attachment=False,
             download_name=f"{invoice['invoice_number']}.pdf"
         )
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+
+        return response
 
     except Exception as e:
         print("❌ Error generating invoice PDF:", e)
@@ -6051,25 +6899,19 @@ def get_invoice_status_style(status):
 
 def get_invoice_email_data(invoice_id, business_id):
     with get_db() as conn:
-        invoice = conn.execute(text("""
+        invoice = conn.execute(text(f"""
             SELECT 
                 i.*,
                 c.customer_name AS customer_name,
                 c.email AS customer_email,
                 c.phone AS customer_phone,
                 c.address AS customer_address,
-                b.name AS company_name,
-                b.email AS company_email,
-                b.phone AS company_phone,
-                b.address AS company_address,
-                b.city AS company_city,
-                b.country AS company_country
+                c.updated_at AS customer_updated_at,
+                {INVOICE_ITEMS_DIGEST_COLUMN}
             FROM invoices i
             LEFT JOIN customers c 
                 ON i.customer_id = c.customer_id
                 AND i.business_id = c.business_id
-            LEFT JOIN businesses b 
-                ON i.business_id = b.id
             WHERE i.invoice_id = :invoice_id
             AND i.business_id = :business_id
             LIMIT 1
@@ -6081,6 +6923,8 @@ def get_invoice_email_data(invoice_id, business_id):
         if not invoice:
             return None, []
 
+        invoice = {**invoice, **invoice_company_fields(business_id)}
+
         items = conn.execute(text("""
             SELECT item_name, quantity, unit_price, subtotal
             FROM invoice_items
@@ -6479,7 +7323,6 @@ def send_invoice_email(invoice_id):
             return jsonify({"error": "Customer does not have an email address"}), 400
 
         email_host = os.getenv("EMAIL_HOST")
-        email_port = int(os.getenv("EMAIL_PORT", 465))
         email_user = os.getenv("EMAIL_USER")
         email_password = os.getenv("EMAIL_PASSWORD")
 
@@ -6487,7 +7330,12 @@ def send_invoice_email(invoice_id):
             return jsonify({"error": "Email settings are missing in .env"}), 500
 
         html_body = build_invoice_html(invoice, items)
-        pdf_bytes = build_invoice_pdf(invoice, items)
+        pdf_bytes = get_cached_invoice_pdf(
+            "email",
+            business_id,
+            invoice,
+            lambda: build_invoice_pdf(invoice, items)
+        )
 
         msg = MIMEMultipart("mixed")
         msg["Subject"] = f"Invoice {invoice['invoice_number']}"
@@ -6508,11 +7356,10 @@ def send_invoice_email(invoice_id):
         )
         msg.attach(pdf_attachment)
 
-        with smtplib.SMTP_SSL(email_host, email_port) as server:
-            server.login(email_user, email_password)
-            server.send_message(msg)
+        with get_db() as db:
+            enqueue_email(db, invoice["customer_email"], msg, "invoice", business_id)
 
-        return jsonify({"message": "Invoice sent successfully"}), 200
+        return jsonify({"message": "Invoice queued for sending"}), 200
 
     except Exception as e:
         print("Error sending invoice email:", e)
@@ -6525,6 +7372,8 @@ def delete_invoice(invoice_id):
     if not business_id:
         return jsonify({"error": "Business ID not found"}), 401
 
+    changed_product_ids = []
+
     try:
         with get_db() as db:
             invoice = db.execute(
@@ -6556,8 +7405,12 @@ def delete_invoice(invoice_id):
                 }
             ).fetchone()
 
+            if not sale and archived_sale_id(db, business_id, invoice_id=invoice_id):
+                return jsonify({"error": ARCHIVED_SALE_ERROR}), 409
+
             if sale:
                 sale_id = sale[0]
+                apply_sale_rollup(db, business_id, sale_id, -1)
 
                 sale_items = db.execute(
                     text("""
@@ -6588,6 +7441,9 @@ def delete_invoice(invoice_id):
                         }
                     )
 
+                changed_product_ids = [item["product_id"] for item in sale_items]
+                reverse_sale_consumption(db, business_id, [sale_id])
+
                 db.execute(
                     text("""
                         DELETE FROM sales_items
@@ -6638,6 +7494,8 @@ def delete_invoice(invoice_id):
 
             db.commit()
 
+        note_sale_stock_changes(business_id, changed_product_ids, invoice_id)
+
         return jsonify({"message": "Invoice deleted and stock restored successfully"}), 200
 
     except Exception as e:
@@ -6694,65 +7552,132 @@ def get_invoice_products():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+INVOICE_PAGE_SIZE = 100
+INVOICE_MAX_PAGE_SIZE = 500
+
 @app.route("/get-invoices", methods=["GET"])
 def get_invoices():
+    """
+    Keyset-paginated invoice listing, newest first, with invoices that have
+    no created_at last. Pass the returned next_cursor back as ?cursor= to
+    get the next page. ?search= keeps invoices whose number, customer,
+    status, total or balance contains the text; send it with every page.
+    """
     business_id = get_business_id()
     if not business_id:
         return jsonify({"error": "Business ID not found"}), 401
 
-    try:
-        company = execute_query(
-            """
-            SELECT name, email, phone, address, city, country, logo
-            FROM businesses
-            WHERE id = :business_id
-            LIMIT 1
-            """,
-            {"business_id": business_id},
-            fetch_all=True
-        )
+    limit = request.args.get("limit", INVOICE_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), INVOICE_MAX_PAGE_SIZE)
 
-        invoices = execute_query(
+    cursor_filter = ""
+    params = {"business_id": business_id, "limit": limit + 1}
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            cursor_created_at, cursor_invoice_id = cursor.rsplit("|", 1)
+            params["cursor_invoice_id"] = int(cursor_invoice_id)
+            if cursor_created_at:
+                params["cursor_created_at"] = datetime.fromisoformat(cursor_created_at)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+        # NULL created_at sorts after every date in descending order
+        if cursor_created_at:
+            cursor_filter = """
+                AND (
+                    i.created_at < :cursor_created_at
+                    OR (i.created_at = :cursor_created_at AND i.invoice_id < :cursor_invoice_id)
+                    OR i.created_at IS NULL
+                )
             """
-            SELECT 
-                i.*,
-                c.customer_name,
-                c.phone AS customer_phone,
-                c.email AS customer_email,
-                c.address AS customer_address
-            FROM invoices i
-            LEFT JOIN customers c 
-                ON i.customer_id = c.customer_id
-                AND c.business_id = :business_id
-            WHERE i.business_id = :business_id
-            ORDER BY i.created_at DESC
-            """,
-            {"business_id": business_id},
-            fetch_all=True
-        )
+        else:
+            cursor_filter = """
+                AND i.created_at IS NULL
+                AND i.invoice_id < :cursor_invoice_id
+            """
+
+    search_filter = ""
+    search = (request.args.get("search") or "").strip()
+    if search:
+        # '!' escapes LIKE wildcards typed by the user
+        escaped = search.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+        params["search"] = f"%{escaped}%"
+        search_filter = """
+            AND (
+                i.invoice_number LIKE :search ESCAPE '!'
+                OR c.customer_name LIKE :search ESCAPE '!'
+                OR i.status LIKE :search ESCAPE '!'
+                OR CAST(i.total_amount AS CHAR) LIKE :search ESCAPE '!'
+                OR CAST(i.balance_due AS CHAR) LIKE :search ESCAPE '!'
+            )
+        """
+
+    try:
+        business = business_cache.get(business_id)
+
+        with get_read_db() as db:
+            invoices = db.execute(
+                text(f"""
+                    SELECT 
+                        i.*,
+                        c.customer_name,
+                        c.phone AS customer_phone,
+                        c.email AS customer_email,
+                        c.address AS customer_address
+                    FROM invoices i
+                    LEFT JOIN customers c 
+                        ON i.customer_id = c.customer_id
+                        AND c.business_id = :business_id
+                    WHERE i.business_id = :business_id
+                    {cursor_filter}
+                    {search_filter}
+                    ORDER BY i.created_at DESC, i.invoice_id DESC
+                    LIMIT :limit
+                """),
+                params
+            ).mappings().fetchall()
+
+            has_more = len(invoices) > limit
+            invoices = invoices[:limit]
+
+            items_by_invoice = {}
+
+            if invoices:
+                invoice_ids = [invoice["invoice_id"] for invoice in invoices]
+                placeholders = ",".join([f":id{i}" for i in range(len(invoice_ids))])
+                item_params = {f"id{i}": invoice_id for i, invoice_id in enumerate(invoice_ids)}
+                item_params["business_id"] = business_id
+
+                items = db.execute(
+                    text(f"""
+                        SELECT 
+                            invoice_id,
+                            item_name,
+                            quantity,
+                            unit_price,
+                            subtotal,
+                            product_id
+                        FROM invoice_items
+                        WHERE invoice_id IN ({placeholders})
+                        AND business_id = :business_id
+                    """),
+                    item_params
+                ).mappings().fetchall()
+
+                for item in items:
+                    items_by_invoice.setdefault(item["invoice_id"], []).append({
+                        "product_id": item.get("product_id"),
+                        "item_name": item["item_name"],
+                        "quantity": float(item["quantity"] or 0),
+                        "unit_price": float(item["unit_price"] or 0),
+                        "subtotal": float(item["subtotal"] or 0)
+                    })
 
         formatted = []
 
         for invoice in invoices:
-            items = execute_query(
-                """
-                SELECT 
-                    item_name,
-                    quantity,
-                    unit_price,
-                    subtotal,
-                    product_id
-                FROM invoice_items
-                WHERE invoice_id = :invoice_id
-                AND business_id = :business_id
-                """,
-                {
-                    "invoice_id": invoice["invoice_id"],
-                    "business_id": business_id
-                },
-                fetch_all=True
-            )
-
             formatted.append({
                 "invoice_id": invoice["invoice_id"],
                 "public_token": generate_invoice_token(
@@ -6777,19 +7702,16 @@ def get_invoices():
                 "notes": invoice["notes"] or "",
                 "created_at": str(invoice["created_at"]) if invoice.get("created_at") else "",
                 "updated_at": str(invoice["updated_at"]) if invoice.get("updated_at") else "",
-                "items": [
-                    {
-                        "product_id": item.get("product_id"),
-                        "item_name": item["item_name"],
-                        "quantity": float(item["quantity"] or 0),
-                        "unit_price": float(item["unit_price"] or 0),
-                        "subtotal": float(item["subtotal"] or 0)
-                    }
-                    for item in items
-                ]
+                "items": items_by_invoice.get(invoice["invoice_id"], [])
             })
 
-        business = company[0] if company else {}
+        next_cursor = None
+        if has_more and invoices:
+            last_invoice = invoices[-1]
+            last_created_at = last_invoice["created_at"].isoformat() if last_invoice["created_at"] else ""
+            next_cursor = f"{last_created_at}|{last_invoice['invoice_id']}"
+
+        business = business or {}
 
         return jsonify({
             "company": {
@@ -6801,7 +7723,9 @@ def get_invoices():
                 "company_country": business.get("country", ""),
                 "company_logo": business.get("logo", "")
             },
-            "invoices": formatted
+            "invoices": formatted,
+            "next_cursor": next_cursor,
+            "has_more": has_more
         }), 200
 
     except Exception as e:
@@ -6878,6 +7802,9 @@ def update_invoice(invoice_id):
 
             sale_id = linked_sale[0] if linked_sale else None
 
+            if not sale_id and archived_sale_id(db, business_id, invoice_id=invoice_id):
+                return jsonify({"error": ARCHIVED_SALE_ERROR}), 409
+
             old_items = db.execute(
                 text("""
                     SELECT product_id, item_name, quantity
@@ -7003,7 +7930,8 @@ def update_invoice(invoice_id):
                         amount_paid = :amount_paid,
                         balance_due = :balance_due,
                         status = :status,
-                        notes = :notes
+                        notes = :notes,
+                        updated_at = NOW()
                     WHERE invoice_id = :invoice_id
                     AND business_id = :business_id
                 """),
@@ -7025,6 +7953,8 @@ def update_invoice(invoice_id):
             )
 
             if sale_id:
+                apply_sale_rollup(db, business_id, sale_id, -1)
+
                 db.execute(
                     text("""
                         UPDATE sales
@@ -7048,6 +7978,8 @@ def update_invoice(invoice_id):
                     }
                 )
 
+                reverse_sale_consumption(db, business_id, [sale_id])
+
                 db.execute(
                     text("""
                         DELETE FROM sales_items
@@ -7157,6 +8089,8 @@ def update_invoice(invoice_id):
                     }
                 )
 
+            record_sale_consumption(db, business_id, [sale_id])
+
             for balance in previous_balances:
                 invoice_number = balance.get("invoice_number", "Invoice")
                 balance_due_value = float(balance.get("balance_due", 0) or 0)
@@ -7181,6 +8115,14 @@ def update_invoice(invoice_id):
                     }
                 )
 
+            apply_sale_rollup(db, business_id, sale_id, 1)
+
+        note_sale_stock_changes(
+            business_id,
+            [old_item[0] for old_item in old_items] + [item.get("product_id") for item in items],
+            invoice_id
+        )
+
         return jsonify({
             "message": "Invoice and linked sale updated successfully",
             "invoice_id": invoice_id,
@@ -7278,6 +8220,8 @@ def update_invoice_status():
             }
         )
 
+        invoice_pdf_cache.invalidate(business_id, invoice_id)
+
         return jsonify({
             "message": "Invoice status updated",
             "amount_paid": amount_paid,
@@ -7342,23 +8286,43 @@ def mark_credit_paid():
             return jsonify({"error": "Invalid payment type"}), 400
 
         with get_db() as db:
-            result = db.execute(
-                text("""
-                    UPDATE sales
-                    SET payment_type = :payment_type
+            # Settling a credit sale changes no totals, so archived ones are updated in place
+            for sales_table in sales_sources(db)[0]:
+                result = db.execute(
+                    text(f"""
+                        UPDATE {sales_table}
+                        SET payment_type = :payment_type
+                        WHERE sale_id = :sale_id
+                        AND business_id = :business_id
+                        AND payment_type = 'Credit'
+                    """),
+                    {
+                        "payment_type": payment_type,
+                        "sale_id": sale_id,
+                        "business_id": business_id
+                    }
+                )
+
+                if result.rowcount:
+                    break
+            else:
+                return jsonify({"error": "Credit order not found"}), 404
+
+            invoice_id = db.execute(
+                text(f"""
+                    SELECT invoice_id
+                    FROM {sales_table}
                     WHERE sale_id = :sale_id
                     AND business_id = :business_id
-                    AND payment_type = 'Credit'
                 """),
                 {
-                    "payment_type": payment_type,
                     "sale_id": sale_id,
                     "business_id": business_id
                 }
-            )
+            ).scalar()
 
-            if result.rowcount == 0:
-                return jsonify({"error": "Credit order not found"}), 404
+        if invoice_id:
+            invoice_pdf_cache.invalidate(business_id, invoice_id)
 
         return jsonify({"message": "Credit order marked as paid"}), 200
 
@@ -7893,6 +8857,78 @@ def delete_restaurant_addon(addon_id):
         return jsonify({"error": str(e)}), 500        
 
 
+# ==============================
+# RESTAURANT ROLLUPS
+# ==============================
+
+def apply_restaurant_order_rollup(db, business_id, order_id, sign):
+    """
+    Add (sign=1) or remove (sign=-1) a completed order from the per-day and
+    per-product restaurant aggregates. Call with 1 after an order becomes
+    completed and with -1 before it stops being completed.
+    """
+    params = {
+        "sign": sign,
+        "order_id": order_id,
+        "business_id": business_id
+    }
+
+    db.execute(
+        text("""
+            INSERT INTO restaurant_daily_rollups (
+                business_id, sale_day, total_sales, order_count, profit
+            )
+            SELECT
+                ro.business_id,
+                DATE(ro.created_at),
+                :sign * COALESCE(ro.total_price, 0),
+                :sign,
+                :sign * CASE
+                    WHEN ro.payment_type IS NOT NULL AND ro.payment_type != ''
+                    THEN COALESCE((
+                        SELECT SUM(roi.profit)
+                        FROM restaurant_order_items roi
+                        WHERE roi.restaurant_order_id = ro.restaurant_order_id
+                        AND roi.business_id = ro.business_id
+                    ), 0)
+                    ELSE 0
+                END
+            FROM restaurant_orders ro
+            WHERE ro.restaurant_order_id = :order_id
+            AND ro.business_id = :business_id
+            ON DUPLICATE KEY UPDATE
+                total_sales = total_sales + VALUES(total_sales),
+                order_count = order_count + VALUES(order_count),
+                profit = profit + VALUES(profit)
+        """),
+        params
+    )
+
+    db.execute(
+        text("""
+            INSERT INTO restaurant_product_rollups (
+                business_id, product_id, product_name, quantity_sold, total_sales
+            )
+            SELECT
+                roi.business_id,
+                roi.product_id,
+                MAX(roi.product_name),
+                :sign * SUM(roi.quantity),
+                :sign * SUM(roi.subtotal)
+            FROM restaurant_order_items roi
+            WHERE roi.restaurant_order_id = :order_id
+            AND roi.business_id = :business_id
+            AND roi.product_id IS NOT NULL
+            GROUP BY roi.business_id, roi.product_id
+            ON DUPLICATE KEY UPDATE
+                product_name = VALUES(product_name),
+                quantity_sold = quantity_sold + VALUES(quantity_sold),
+                total_sales = total_sales + VALUES(total_sales)
+        """),
+        params
+    )
+
+
 # ==============================
 # HELPER: CREATE RESTAURANT ORDER
 # ==============================
@@ -7946,7 +8982,7 @@ def create_restaurant_order(data, order_status, kitchen_status):
 
             subtotal_amount = sum(float(item["subtotal"]) for item in cart_items)
             total_price = subtotal_amount + vat - discount
-            order_number = generate_order_number()
+            order_number = generate_order_number(business_id)
 
             if order_status == "completed":
                 for item in cart_items:
@@ -8343,6 +9379,12 @@ def create_restaurant_order(data, order_status, kitchen_status):
                         }
                     )
 
+            if order_status == "completed":
+                apply_restaurant_order_rollup(db, business_id, restaurant_order_id, 1)
+
+            if kitchen_status == "pending":
+                record_kitchen_event(db, business_id, restaurant_order_id, "created")
+
             db.commit()
 
         return jsonify({
@@ -8411,16 +9453,29 @@ def restaurant_checkout():
 # GET KITCHEN ORDERS
 # ==============================
 
-@app.route("/restaurant/kitchen-orders", methods=["GET"])
-def get_kitchen_orders():
-    business_id = get_business_id()
+def load_kitchen_orders(db, business_id, order_ids=None):
+    """
+    Load kitchen orders with their items and add-ons in three queries,
+    regardless of how many orders are open. Without order_ids it returns
+    today's active kitchen orders, otherwise exactly the requested orders.
+    """
+    order_filter = """
+        AND ro.kitchen_status IN ('pending', 'preparing', 'ready', 'served')
+        AND DATE(ro.created_at) = CURDATE()
+    """
+    params = {"business_id": business_id}
 
-    if not business_id:
-        return jsonify({"error": "Business ID not found"}), 401
+    if order_ids is not None:
+        if not order_ids:
+            return []
 
-    try:
-        orders = execute_query(
-            """
+        ordered_ids = sorted(order_ids)
+        placeholders = ",".join([f":order_id{i}" for i in range(len(ordered_ids))])
+        order_filter = f"AND ro.restaurant_order_id IN ({placeholders})"
+        params.update({f"order_id{i}": oid for i, oid in enumerate(ordered_ids)})
+
+    orders = db.execute(
+        text(f"""
             SELECT
                 ro.restaurant_order_id,
                 ro.order_number,
@@ -8437,8 +9492,7 @@ def get_kitchen_orders():
             LEFT JOIN users ku
                 ON ro.kitchen_user_id = ku.user_id
             WHERE ro.business_id = :business_id
-              AND ro.kitchen_status IN ('pending', 'preparing', 'ready', 'served')
-              AND DATE(ro.created_at) = CURDATE()
+              {order_filter}
             ORDER BY
                 CASE ro.kitchen_status
                     WHEN 'pending' THEN 1
@@ -8448,105 +9502,244 @@ def get_kitchen_orders():
                     ELSE 5
                 END,
                 ro.created_at ASC
-            """,
-            {"business_id": business_id},
-            fetch_all=True
-        )
-
-        formatted_orders = []
+        """),
+        params
+    ).mappings().fetchall()
 
-        for order in orders:
-            items = execute_query(
-                """
-                SELECT
-                    restaurant_order_item_id,
-                    product_id,
-                    product_name,
-                    quantity,
-                    unit_price,
-                    subtotal,
-                    item_status
-                FROM restaurant_order_items
-                WHERE restaurant_order_id = :restaurant_order_id
-                  AND business_id = :business_id
-                ORDER BY restaurant_order_item_id ASC
-                """,
-                {
-                    "restaurant_order_id": order["restaurant_order_id"],
-                    "business_id": business_id,
-                },
-                fetch_all=True,
-            )
+    if not orders:
+        return []
 
-            formatted_items = []
+    loaded_ids = [order["restaurant_order_id"] for order in orders]
+    id_placeholders = ",".join([f":order_id{i}" for i in range(len(loaded_ids))])
+    id_params = {f"order_id{i}": oid for i, oid in enumerate(loaded_ids)}
+    id_params["business_id"] = business_id
 
-            for item in items:
-                addons = execute_query(
-                    """
-                    SELECT
-                        order_item_addon_id,
-                        addon_id,
-                        addon_name,
-                        addon_price,
-                        quantity,
-                        subtotal
-                    FROM restaurant_order_item_addons
-                    WHERE restaurant_order_item_id = :restaurant_order_item_id
-                      AND restaurant_order_id = :restaurant_order_id
-                      AND business_id = :business_id
-                    ORDER BY order_item_addon_id ASC
-                    """,
-                    {
-                        "restaurant_order_item_id": item["restaurant_order_item_id"],
-                        "restaurant_order_id": order["restaurant_order_id"],
-                        "business_id": business_id,
-                    },
-                    fetch_all=True,
-                )
+    items = db.execute(
+        text(f"""
+            SELECT
+                restaurant_order_item_id,
+                restaurant_order_id,
+                product_id,
+                product_name,
+                quantity,
+                unit_price,
+                subtotal,
+                item_status
+            FROM restaurant_order_items
+            WHERE restaurant_order_id IN ({id_placeholders})
+              AND business_id = :business_id
+            ORDER BY restaurant_order_item_id ASC
+        """),
+        id_params
+    ).mappings().fetchall()
 
-                formatted_items.append({
-                    "restaurant_order_item_id": item["restaurant_order_item_id"],
-                    "product_id": item["product_id"],
-                    "product_name": item["product_name"],
-                    "quantity": float(item["quantity"] or 0),
-                    "unit_price": float(item["unit_price"] or 0),
-                    "subtotal": float(item["subtotal"] or 0),
-                    "item_status": item["item_status"],
-                    "addons": [
-                        {
-                            "order_item_addon_id": addon["order_item_addon_id"],
-                            "addon_id": addon["addon_id"],
-                            "addon_name": addon["addon_name"],
-                            "addon_price": float(addon["addon_price"] or 0),
-                            "quantity": float(addon["quantity"] or 0),
-                            "subtotal": float(addon["subtotal"] or 0),
-                        }
-                        for addon in addons
-                    ],
-                })
+    addons = db.execute(
+        text(f"""
+            SELECT
+                order_item_addon_id,
+                restaurant_order_item_id,
+                addon_id,
+                addon_name,
+                addon_price,
+                quantity,
+                subtotal
+            FROM restaurant_order_item_addons
+            WHERE restaurant_order_id IN ({id_placeholders})
+              AND business_id = :business_id
+            ORDER BY order_item_addon_id ASC
+        """),
+        id_params
+    ).mappings().fetchall()
+
+    addons_by_item = {}
+    for addon in addons:
+        addons_by_item.setdefault(addon["restaurant_order_item_id"], []).append({
+            "order_item_addon_id": addon["order_item_addon_id"],
+            "addon_id": addon["addon_id"],
+            "addon_name": addon["addon_name"],
+            "addon_price": float(addon["addon_price"] or 0),
+            "quantity": float(addon["quantity"] or 0),
+            "subtotal": float(addon["subtotal"] or 0),
+        })
 
-            formatted_orders.append({
-                "restaurant_order_id": order["restaurant_order_id"],
-                "order_number": order["order_number"],
-                "order_type": order["order_type"],
-                "table_name": order["table_name"],
-                "waiter_name": order["waiter_name"],
-                "kitchen_user_id": order["kitchen_user_id"],
-                "kitchen_user_name": order["kitchen_user_name"] or "Not assigned",
-                "total_price": float(order["total_price"] or 0),
-                "order_status": order["order_status"],
-                "kitchen_status": order["kitchen_status"],
-                "created_at": str(order["created_at"]),
-                "items": formatted_items,
-            })
+    items_by_order = {}
+    for item in items:
+        items_by_order.setdefault(item["restaurant_order_id"], []).append({
+            "restaurant_order_item_id": item["restaurant_order_item_id"],
+            "product_id": item["product_id"],
+            "product_name": item["product_name"],
+            "quantity": float(item["quantity"] or 0),
+            "unit_price": float(item["unit_price"] or 0),
+            "subtotal": float(item["subtotal"] or 0),
+            "item_status": item["item_status"],
+            "addons": addons_by_item.get(item["restaurant_order_item_id"], []),
+        })
 
-        return jsonify({"orders": formatted_orders}), 200
+    return [
+        {
+            "restaurant_order_id": order["restaurant_order_id"],
+            "order_number": order["order_number"],
+            "order_type": order["order_type"],
+            "table_name": order["table_name"],
+            "waiter_name": order["waiter_name"],
+            "kitchen_user_id": order["kitchen_user_id"],
+            "kitchen_user_name": order["kitchen_user_name"] or "Not assigned",
+            "total_price": float(order["total_price"] or 0),
+            "order_status": order["order_status"],
+            "kitchen_status": order["kitchen_status"],
+            "created_at": str(order["created_at"]),
+            "items": items_by_order.get(order["restaurant_order_id"], []),
+        }
+        for order in orders
+    ]
+
+
+@app.route("/restaurant/kitchen-orders", methods=["GET"])
+def get_kitchen_orders():
+    business_id = get_business_id()
+
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
+
+    try:
+        with get_db() as db:
+            # Read before the orders, so resuming the stream from it can only replay, not miss
+            event_id = latest_kitchen_event_id(db)
+            formatted_orders = load_kitchen_orders(db, business_id)
+
+        return jsonify({"orders": formatted_orders, "event_id": event_id}), 200
 
     except Exception as e:
         print("❌ ERROR in get_kitchen_orders:", str(e))
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+
+def format_kitchen_deltas(db, business_id, events):
+    """Turn kitchen events into SSE messages carrying the affected orders"""
+    order_ids = {
+        event["restaurant_order_id"]
+        for event in events
+        if event["event_type"] != "cancelled"
+    }
+    orders = {
+        order["restaurant_order_id"]: order
+        for order in load_kitchen_orders(db, business_id, order_ids)
+    }
+
+    messages = []
+    for event in events:
+        payload = {
+            "event_id": event["event_id"],
+            "restaurant_order_id": event["restaurant_order_id"],
+            "order": orders.get(event["restaurant_order_id"])
+        }
+        messages.append(
+            f"id: {event['event_id']}\n"
+            f"event: {event['event_type']}\n"
+            f"data: {json.dumps(payload, default=str)}\n\n"
+        )
+
+    return "".join(messages)
+
+
+@app.route("/restaurant/kitchen-stream", methods=["GET"])
+def kitchen_order_stream():
+    """
+    Server-sent events feed for kitchen screens.
+    A new connection gets a 'snapshot' of today's kitchen orders, then only
+    deltas. Reconnecting with Last-Event-ID (or ?cursor=) replays the events
+    missed since that id instead of reloading everything, unless more than
+    KITCHEN_FEED_RESUME_LIMIT were missed and a new snapshot is cheaper.
+    """
+    business_id = get_business_id()
+
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
+
+    cursor = request.headers.get("Last-Event-ID") or request.args.get("cursor") or ""
+    cursor = int(cursor) if cursor.isdigit() else None
+
+    def stream():
+        # Subscribe first so nothing committed during the catch-up is lost
+        subscriber = kitchen_hub.subscribe(business_id)
+
+        try:
+            with get_db() as db:
+                oldest_event_id = oldest_kitchen_event_id(db)
+                can_resume = cursor is not None and (
+                    oldest_event_id is None or cursor >= oldest_event_id - 1
+                )
+
+                if can_resume:
+                    # A backlog longer than the resume limit is cheaper to replace with a snapshot
+                    backlog = read_kitchen_events(
+                        db, business_id, cursor, limit=KITCHEN_FEED_RESUME_LIMIT + 1
+                    )
+                    can_resume = len(backlog) <= KITCHEN_FEED_RESUME_LIMIT
+
+                if can_resume:
+                    last_sent_id = backlog[-1]["event_id"] if backlog else cursor
+                    initial = format_kitchen_deltas(db, business_id, backlog)
+                else:
+                    last_sent_id = latest_kitchen_event_id(db)
+                    snapshot = {
+                        "event_id": last_sent_id,
+                        "orders": load_kitchen_orders(db, business_id)
+                    }
+                    initial = (
+                        f"id: {last_sent_id}\n"
+                        f"event: snapshot\n"
+                        f"data: {json.dumps(snapshot, default=str)}\n\n"
+                    )
+
+            yield initial or ": connected\n\n"
+
+            # Late commits can arrive below the newest id, so dedupe by id
+            floor_event_id = last_sent_id
+            sent_ids = set()
+
+            while True:
+                try:
+                    events = [subscriber.get(timeout=KITCHEN_FEED_HEARTBEAT)]
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                while not subscriber.empty():
+                    events.append(subscriber.get_nowait())
+
+                events = [
+                    event for event in events
+                    if event["event_id"] > floor_event_id and event["event_id"] not in sent_ids
+                ]
+                if not events:
+                    continue
+
+                events.sort(key=lambda event: event["event_id"])
+                sent_ids.update(event["event_id"] for event in events)
+
+                if len(sent_ids) > 1000:
+                    floor_event_id = max(sent_ids) - 200
+                    sent_ids = {event_id for event_id in sent_ids if event_id > floor_event_id}
+
+                with get_db() as db:
+                    deltas = format_kitchen_deltas(db, business_id, events)
+
+                yield deltas
+
+        finally:
+            kitchen_hub.unsubscribe(business_id, subscriber)
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.route("/restaurant/orders/<int:order_id>/reopen", methods=["PUT"])
 def reopen_restaurant_order(order_id):
     business_id = get_business_id()
@@ -8586,6 +9779,8 @@ def reopen_restaurant_order(order_id):
                     "error": "Only completed orders can be reopened"
                 }), 400
 
+            apply_restaurant_order_rollup(db, business_id, order_id, -1)
+
             items = db.execute(
                 text("""
                     SELECT
@@ -8748,6 +9943,8 @@ def reopen_restaurant_order(order_id):
                 }
             )
 
+            record_kitchen_event(db, business_id, order_id, "reopened")
+
             if table_id:
                 db.execute(
                     text("""
@@ -8824,6 +10021,8 @@ def update_kitchen_status(restaurant_order_id):
                 }
             )
 
+            record_kitchen_event(db, business_id, restaurant_order_id, "status")
+
         return jsonify({"message": "Kitchen status updated"}), 200
 
     except Exception as e:
@@ -8955,6 +10154,8 @@ def update_restaurant_kitchen_status(order_id):
                 }
             )
 
+            record_kitchen_event(db, business_id, order_id, "status")
+
         return jsonify({
             "message": "Kitchen status updated successfully",
             "kitchen_status": kitchen_status
@@ -9411,6 +10612,9 @@ def checkout_existing_restaurant_order(order_id):
                 }
             )
 
+            record_kitchen_event(db, business_id, order_id, "status")
+            apply_restaurant_order_rollup(db, business_id, order_id, 1)
+
             if table_id:
                 db.execute(
                     text("""
@@ -9493,6 +10697,8 @@ def cancel_restaurant_order(order_id):
                 }
             )
 
+            record_kitchen_event(db, business_id, order_id, "cancelled")
+
             table_id = order[0]
 
             if table_id:
@@ -9554,6 +10760,10 @@ def update_restaurant_order_status(order_id):
                 return jsonify({"error": "Order not found"}), 404
 
             table_id = order[0]
+            old_status = order[1]
+
+            if old_status == "completed" and new_status != "completed":
+                apply_restaurant_order_rollup(db, business_id, order_id, -1)
 
             db.execute(
                 text("""
@@ -9569,6 +10779,9 @@ def update_restaurant_order_status(order_id):
                 }
             )
 
+            if new_status == "completed" and old_status != "completed":
+                apply_restaurant_order_rollup(db, business_id, order_id, 1)
+
             if new_status == "cancelled":
                 db.execute(
                     text("""
@@ -9598,6 +10811,13 @@ def update_restaurant_order_status(order_id):
                         }
                     )
 
+            record_kitchen_event(
+                db,
+                business_id,
+                order_id,
+                "cancelled" if new_status == "cancelled" else "status"
+            )
+
         return jsonify({"message": "Restaurant order status updated"}), 200
 
     except Exception as e:
@@ -11450,100 +12670,106 @@ def restaurant_dashboard_data():
         return jsonify({"error": "Business ID not found"}), 401
 
     try:
-        metrics_rows = execute_query("""
-            SELECT
-                COALESCE(SUM(total_price), 0) AS total_sales,
-                COALESCE(SUM(
-                    CASE
-                        WHEN MONTH(created_at) = MONTH(CURRENT_DATE())
-                        AND YEAR(created_at) = YEAR(CURRENT_DATE())
-                        THEN total_price
-                        ELSE 0
-                    END
-                ), 0) AS current_month_sales,
-                COUNT(*) AS orders_count
-            FROM restaurant_orders
-            WHERE business_id = :business_id
-            AND order_status = 'completed'
-        """, {"business_id": business_id}, fetch_all=True)
+        first_day_of_month = datetime.now().replace(day=1).date()
 
-        metrics = metrics_rows[0] if metrics_rows else {}
-
-        products_rows = execute_query("""
-            SELECT COUNT(*) AS count
-            FROM restaurant_products
-            WHERE business_id = :business_id
-        """, {"business_id": business_id}, fetch_all=True)
-
-        products_count = products_rows[0] if products_rows else {}
-
-        materials_rows = execute_query("""
-            SELECT COUNT(*) AS count
-            FROM restaurant_materials
-            WHERE business_id = :business_id
-        """, {"business_id": business_id}, fetch_all=True)
+        # Every section is one JSON row of a single UNION ALL statement,
+        # read from the maintained restaurant rollups
+        rows = execute_query("""
+            SELECT 'metrics' AS section, JSON_OBJECT(
+                'total_sales', (
+                    SELECT COALESCE(SUM(total_sales), 0)
+                    FROM restaurant_daily_rollups
+                    WHERE business_id = :business_id
+                ),
+                'current_month_sales', (
+                    SELECT COALESCE(SUM(total_sales), 0)
+                    FROM restaurant_daily_rollups
+                    WHERE business_id = :business_id
+                    AND sale_day >= :first_day
+                ),
+                'orders_count', (
+                    SELECT COALESCE(SUM(order_count), 0)
+                    FROM restaurant_daily_rollups
+                    WHERE business_id = :business_id
+                ),
+                'total_profit', (
+                    SELECT COALESCE(SUM(profit), 0)
+                    FROM restaurant_daily_rollups
+                    WHERE business_id = :business_id
+                ),
+                'menu_products_count', (
+                    SELECT COUNT(*)
+                    FROM restaurant_products
+                    WHERE business_id = :business_id
+                ),
+                'materials_count', (
+                    SELECT COUNT(*)
+                    FROM restaurant_materials
+                    WHERE business_id = :business_id
+                )
+            ) AS payload
+
+            UNION ALL
+
+            (
+                SELECT 'recent_order' AS section, JSON_OBJECT(
+                    'restaurant_order_id', restaurant_order_id,
+                    'order_number', order_number,
+                    'order_type', order_type,
+                    'table_name', table_name,
+                    'waiter_name', waiter_name,
+                    'subtotal', subtotal,
+                    'vat', vat,
+                    'discount', discount,
+                    'total_price', total_price,
+                    'payment_type', payment_type,
+                    'order_status', order_status,
+                    'kitchen_status', kitchen_status,
+                    'created_at', DATE_FORMAT(created_at, '%Y-%m-%d %H:%i:%s')
+                ) AS payload
+                FROM restaurant_orders
+                WHERE business_id = :business_id
+                ORDER BY created_at DESC
+                LIMIT 5
+            )
 
-        materials_count = materials_rows[0] if materials_rows else {}
+            UNION ALL
 
-        recent_orders = execute_query("""
-            SELECT
-                restaurant_order_id,
-                order_number,
-                order_type,
-                table_name,
-                waiter_name,
-                subtotal,
-                vat,
-                discount,
-                total_price,
-                payment_type,
-                order_status,
-                kitchen_status,
-                created_at
-            FROM restaurant_orders
-            WHERE business_id = :business_id
-            ORDER BY created_at DESC
-            LIMIT 5
-        """, {"business_id": business_id}, fetch_all=True)
+            (
+                SELECT 'top_product' AS section, JSON_OBJECT(
+                    'product_name', product_name,
+                    'quantity_sold', quantity_sold,
+                    'total_sales', total_sales
+                ) AS payload
+                FROM restaurant_product_rollups
+                WHERE business_id = :business_id
+                ORDER BY quantity_sold DESC
+                LIMIT 5
+            )
 
-        top_products = execute_query("""
-            SELECT
-                product_name,
-                SUM(quantity) AS quantity_sold,
-                SUM(subtotal) AS total_sales
-            FROM restaurant_order_items
-            WHERE business_id = :business_id
-            GROUP BY product_id, product_name
-            ORDER BY quantity_sold DESC
-            LIMIT 5
-        """, {"business_id": business_id}, fetch_all=True)
+            UNION ALL
 
-        chart_rows = execute_query("""
-            SELECT
-                DATE(created_at) AS sale_date,
-                COALESCE(SUM(total_price), 0) AS total_sales
-            FROM restaurant_orders
-            WHERE business_id = :business_id
-            AND order_status = 'completed'
-            GROUP BY DATE(created_at)
-            ORDER BY sale_date ASC
-            LIMIT 7
-        """, {"business_id": business_id}, fetch_all=True)
+            (
+                SELECT 'chart' AS section, JSON_OBJECT(
+                    'sale_date', DATE_FORMAT(sale_day, '%Y-%m-%d'),
+                    'total_sales', total_sales
+                ) AS payload
+                FROM restaurant_daily_rollups
+                WHERE business_id = :business_id
+                AND order_count > 0
+                ORDER BY sale_day DESC
+                LIMIT 7
+            )
+        """, {"business_id": business_id, "first_day": first_day_of_month}, fetch_all=True, replica=True)
 
-        profit_rows = execute_query("""
-            SELECT
-                COALESCE(SUM(roi.profit), 0) AS total_profit
-            FROM restaurant_order_items roi
-            JOIN restaurant_orders ro
-                ON roi.restaurant_order_id = ro.restaurant_order_id
-                AND roi.business_id = ro.business_id
-            WHERE ro.business_id = :business_id
-            AND ro.order_status = 'completed'
-            AND ro.payment_type IS NOT NULL
-            AND ro.payment_type != ''
-        """, {"business_id": business_id}, fetch_all=True)
+        sections = {}
+        for row in rows:
+            sections.setdefault(row["section"], []).append(json.loads(row["payload"]))
 
-        profit_data = profit_rows[0] if profit_rows else {}
+        metrics = sections.get("metrics", [{}])[0]
+        recent_orders = sections.get("recent_order", [])
+        top_products = sections.get("top_product", [])
+        chart_rows = sorted(sections.get("chart", []), key=lambda row: row["sale_date"])
 
         return jsonify({
             "metrics": {
@@ -11551,10 +12777,10 @@ def restaurant_dashboard_data():
                 "current_month_sales": float(metrics.get("current_month_sales") or 0),
                 "monthly_target": 125000,
                 "orders_count": int(metrics.get("orders_count") or 0),
-                "menu_products_count": int(products_count.get("count") or 0),
-                "materials_count": int(materials_count.get("count") or 0),
+                "menu_products_count": int(metrics.get("menu_products_count") or 0),
+                "materials_count": int(metrics.get("materials_count") or 0),
                 "customers_count": 0,
-                "total_profit": float(profit_data.get("total_profit") or 0),
+                "total_profit": float(metrics.get("total_profit") or 0),
             },
 
             "recent_orders": [
@@ -11599,332 +12825,567 @@ def normalize_product_name(name):
     return " ".join(str(name or "").lower().strip().split())
 
 
-def safe_float(value, default=0):
-    try:
-        if value is None or str(value).strip() == "" or str(value).lower() == "nan":
-            return default
-        cleaned = str(value).replace("Ksh", "").replace(",", "").strip()
-        return float(cleaned)
-    except Exception:
-        return default
+IMPORT_COLUMN_ALIASES = {
+    "product_name": ["Product Name", "product_name", "Book Title", "BOOK TITLE", "Title", "TITLE", "Item Name"],
+    "author": ["Author", "AUTHOR"],
+    "publisher": ["Publisher", "PUBLISHER"],
+    "category_name": ["Category", "CATEGORY", "category_name"],
+    "quantity": ["Stock", "stock", "QTY IN STOCK", "Qty In Stock", "Quantity", "quantity"],
+    "buying_price": ["Buying Price", "BUYING PRICE", "buying_price", "Cost Price"],
+    "selling_price": ["Selling Price", "SELLING PRICE", "selling_price", "Price", "price"],
+    "unit": ["Unit", "unit"],
+}
 
+IMPORT_IGNORED_COLUMNS = {
+    alias for aliases in IMPORT_COLUMN_ALIASES.values() for alias in aliases
+}
 
-def get_excel_value(row, possible_columns, default=""):
-    for col in possible_columns:
-        if col in row and pd.notna(row[col]):
-            return row[col]
-    return default
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
 
 
-@app.route("/products/import-excel", methods=["POST"])
-def import_products_excel():
-    business_id = get_business_id()
+def missing_import_columns(df):
+    """Required column groups that have none of their aliases in the sheet"""
+    required = [
+        ("product_name", "Product Name / Book Title"),
+        ("selling_price", "Selling Price"),
+        ("quantity", "Stock / Qty In Stock"),
+    ]
 
-    if not business_id:
-        return jsonify({"error": "Business ID not found"}), 401
+    return [
+        label for field, label in required
+        if not any(col in df.columns for col in IMPORT_COLUMN_ALIASES[field])
+    ]
 
-    file = request.files.get("file")
-    update_stock = request.form.get("update_stock", "no").lower() == "yes"
-    default_category = request.form.get("category_name", "Imported Products")
 
-    if not file:
-        return jsonify({"error": "Excel file is required"}), 400
+def coalesce_import_column(df, field, default):
+    """First non-empty value among the field's alias columns, per row"""
+    present = [col for col in IMPORT_COLUMN_ALIASES[field] if col in df.columns]
+    if not present:
+        return pd.Series(default, index=df.index, dtype=object)
 
-    try:
-        df = pd.read_excel(file)
-        df.columns = [str(col).strip() for col in df.columns]
+    values = df[present[0]]
+    for col in present[1:]:
+        values = values.where(values.notna(), df[col])
 
-        def has_any_column(df, possible_columns):
-            return any(col in df.columns for col in possible_columns)
+    return values.where(values.notna(), default)
 
-        missing = []
 
-        if not has_any_column(
-            df,
-            ["Product Name", "product_name", "Book Title", "BOOK TITLE", "Title", "TITLE", "Item Name"],
-        ):
-            missing.append("Product Name / Book Title")
+def to_amount(values):
+    """Numbers from a column of prices or quantities, 'Ksh' and ',' stripped, 0 when blank"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0).astype(float)
+
+    cleaned = (
+        values.astype(str)
+        .str.replace("Ksh", "", regex=False)
+        .str.replace(",", "", regex=False)
+        .str.strip()
+    )
+    return pd.to_numeric(cleaned, errors="coerce").fillna(0).astype(float)
+
+
+def append_description(description, label, values):
+    """Add 'label: value' lines to the descriptions of rows that have a value"""
+    has_value = values.notna() & (values.astype(str) != "")
+    line = label + ": " + values.astype(str)
+    joined = description.where(description == "", description + "\n") + line
+    return description.where(~has_value, joined)
+
+
+def parse_product_import(df, default_category):
+    """
+    Normalize an import sheet in whole-column operations. Returns one row
+    per usable sheet row with product_name, normalized_name, category_name,
+    quantity, buying_price, selling_price, unit, summary (author and
+    publisher lines), product_description (summary plus every other
+    column) and the 1-based sheet row number.
+    """
+    names = coalesce_import_column(df, "product_name", "")
+    names = names.astype(str).str.strip()
+    usable = (names != "") & (names.str.lower() != "nan")
+
+    sheet = df[usable]
+    parsed = pd.DataFrame(index=sheet.index)
+    parsed["row_number"] = sheet.index + 2
+    parsed["product_name"] = names[usable]
+    parsed["normalized_name"] = (
+        parsed["product_name"].str.lower().str.split().str.join(" ")
+    )
+    parsed["category_name"] = (
+        coalesce_import_column(sheet, "category_name", default_category).astype(str).str.strip()
+    )
+    parsed["quantity"] = to_amount(coalesce_import_column(sheet, "quantity", 0))
+    parsed["buying_price"] = to_amount(coalesce_import_column(sheet, "buying_price", 0))
+    parsed["selling_price"] = to_amount(coalesce_import_column(sheet, "selling_price", 0))
+
+    units = coalesce_import_column(sheet, "unit", "pcs").astype(str).str.strip()
+    parsed["unit"] = units.where(units != "", "pcs")
+
+    summary = pd.Series("", index=sheet.index, dtype=object)
+    summary = append_description(summary, "Author", coalesce_import_column(sheet, "author", None))
+    summary = append_description(summary, "Publisher", coalesce_import_column(sheet, "publisher", None))
+    parsed["summary"] = summary
+
+    description = summary
+    for col in sheet.columns:
+        if col not in IMPORT_IGNORED_COLUMNS:
+            description = append_description(description, str(col), sheet[col])
+    parsed["product_description"] = description
+
+    return parsed, int((~usable).sum())
+
+
+IMPORT_SPOOL_DIR = os.getenv(
+    "IMPORT_SPOOL_DIR",
+    os.path.join(tempfile.gettempdir(), "peakers_import_spool")
+)
+IMPORT_SPOOL_TTL_SECONDS = int(os.getenv("IMPORT_SPOOL_TTL_SECONDS", 30 * 60))
+
+
+class ImportSpool:
+    """
+    Parsed import sheets kept on disk between preview and commit, keyed by
+    an upload token. Files live in a shared directory so any worker process
+    can pick up a preview made by another, and expire after ttl_seconds.
+    Sheets are stored as JSON, never pickled, in a directory only the app's
+    user can write to.
+    """
+
+    def __init__(self, directory, ttl_seconds):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+
+    def path(self, business_id, token):
+        return os.path.join(self.directory, f"{int(business_id)}_{token}.json")
+
+    def ensure_directory(self):
+        """Create the spool directory private to this user, refusing one others can write to"""
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+        info = os.stat(self.directory)
+        if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & 0o022):
+            raise RuntimeError(
+                f"Import spool directory {self.directory} must be owned by this user "
+                "and not writable by others"
+            )
+
+    def put(self, business_id, parsed, skipped, default_category):
+        self.ensure_directory()
+        self.purge_expired()
+
+        token = uuid.uuid4().hex
+        path = self.path(business_id, token)
+        partial = path + ".part"
+
+        with open(partial, "w", encoding="utf-8") as spool_file:
+            json.dump(
+                {
+                    "parsed": parsed.to_json(orient="table"),
+                    "skipped": skipped,
+                    "default_category": default_category
+                },
+                spool_file
+            )
+        os.replace(partial, path)
+
+        return token
+
+    def get(self, business_id, token):
+        """The spooled entry, or None when the token is unknown or expired"""
+        try:
+            # Tokens are uuid4 hex, anything else never names a spool file
+            uuid.UUID(hex=str(token))
+        except ValueError:
+            return None
+
+        path = self.path(business_id, token)
+
+        try:
+            self.ensure_directory()
+
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                self.discard(business_id, token)
+                return None
+
+            with open(path, encoding="utf-8") as spool_file:
+                entry = json.load(spool_file)
+
+            entry["parsed"] = pd.read_json(StringIO(entry["parsed"]), orient="table")
+            return entry
+        except (OSError, RuntimeError, ValueError, KeyError):
+            return None
+
+    def discard(self, business_id, token):
+        try:
+            os.remove(self.path(business_id, token))
+        except OSError:
+            pass
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+import_spool = ImportSpool(IMPORT_SPOOL_DIR, IMPORT_SPOOL_TTL_SECONDS)
+
+
+def import_category_ids(db, business_id, category_names, category_map=None):
+    """
+    Category id per normalized name, creating the categories that are
+    missing. A category_map from an earlier call is extended in place
+    instead of being read again.
+    """
+    if category_map is None:
+        existing = db.execute(
+            text("""
+                SELECT category_id, category_name
+                FROM categories
+                WHERE business_id = :business_id
+            """),
+            {"business_id": business_id},
+        ).mappings().fetchall()
+
+        category_map = {
+            normalize_product_name(cat["category_name"]): cat["category_id"]
+            for cat in existing
+        }
+
+    missing = {}
+    for name in category_names:
+        normalized = normalize_product_name(name)
+        if normalized not in category_map:
+            missing.setdefault(normalized, name)
+
+    for name in missing.values():
+        result = db.execute(
+            text("""
+                INSERT INTO categories (business_id, category_name)
+                VALUES (:business_id, :category_name)
+            """),
+            {"business_id": business_id, "category_name": name},
+        )
+        category_map[normalize_product_name(name)] = result.lastrowid
+
+    return category_map
+
+
+def insert_imported_products(db, business_id, rows):
+    """Insert new products with one multi-row statement"""
+    db.execute(
+        text("""
+            INSERT INTO products
+            (
+                business_id, product_number, product_name, product_price,
+                buying_price, product_stock, product_description,
+                category_id_fk, unit
+            )
+            VALUES
+            (
+                :business_id, :product_number, :product_name, :product_price,
+                :buying_price, :product_stock, :product_description,
+                :category_id_fk, :unit
+            )
+        """),
+        [
+            {
+                "business_id": business_id,
+                "product_number": "1000",
+                "product_name": row["product_name"],
+                "product_price": row["selling_price"],
+                "buying_price": row["buying_price"],
+                "product_stock": row["quantity"],
+                "product_description": row["product_description"],
+                "category_id_fk": row["category_id"],
+                "unit": row["unit"],
+            }
+            for row in rows
+        ]
+    )
+
+
+def update_imported_products(db, business_id, rows, update_stock):
+    """Update existing products with one CASE statement per chunk"""
+    params = {"business_id": business_id}
+    cases = {
+        "product_price": [],
+        "buying_price": [],
+        "product_description": [],
+        "category_id_fk": [],
+        "unit": [],
+    }
+    if update_stock:
+        cases["product_stock"] = []
+
+    fields = {
+        "product_price": "selling_price",
+        "buying_price": "buying_price",
+        "product_description": "product_description",
+        "category_id_fk": "category_id",
+        "unit": "unit",
+        "product_stock": "quantity",
+    }
+
+    for i, row in enumerate(rows):
+        params[f"product_id{i}"] = row["product_id"]
+        for column in cases:
+            params[f"{column}{i}"] = row[fields[column]]
+            cases[column].append(f"WHEN :product_id{i} THEN :{column}{i}")
+
+    assignments = [
+        f"{column} = CASE product_id {' '.join(whens)} END"
+        for column, whens in cases.items()
+        if column != "product_stock"
+    ]
+    if update_stock:
+        assignments.append(
+            f"product_stock = product_stock + CASE product_id {' '.join(cases['product_stock'])} ELSE 0 END"
+        )
+
+    placeholders = ",".join([f":product_id{i}" for i in range(len(rows))])
+
+    db.execute(
+        text(f"""
+            UPDATE products
+            SET {", ".join(assignments)}
+            WHERE business_id = :business_id
+            AND product_id IN ({placeholders})
+        """),
+        params
+    )
 
-        if not has_any_column(
-            df,
-            ["Selling Price", "SELLING PRICE", "selling_price", "Price", "price"],
-        ):
-            missing.append("Selling Price")
 
-        if not has_any_column(
-            df,
-            ["Stock", "stock", "QTY IN STOCK", "Qty In Stock", "Quantity", "quantity"],
-        ):
-            missing.append("Stock / Qty In Stock")
+def load_import_product_map(db, business_id):
+    """Product id per normalized name for the business's live products"""
+    existing_products = db.execute(
+        text("""
+            SELECT product_id, product_name
+            FROM products
+            WHERE business_id = :business_id
+            AND deleted_at IS NULL
+        """),
+        {"business_id": business_id},
+    ).mappings().fetchall()
 
-        if missing:
-            return jsonify({
-                "error": "Excel file columns do not match the expected format.",
-                "missing_columns": missing,
-                "expected_columns": [
-                    "Book Title or Product Name",
-                    "Author",
-                    "Publisher",
-                    "Qty In Stock or Stock",
-                    "Buying Price",
-                    "Selling Price",
-                    "Category",
-                    "Unit",
-                ],
-            }), 400
+    return {
+        normalize_product_name(product["product_name"]): product["product_id"]
+        for product in existing_products
+    }
 
-        imported = 0
-        updated = 0
-        skipped = 0
-        duplicates_found = 0
-        errors = []
 
-        with get_db() as db:
-            existing_categories = db.execute(
-                text("""
-                    SELECT category_id, category_name
-                    FROM categories
-                    WHERE business_id = :business_id
-                """),
-                {"business_id": business_id},
-            ).mappings().fetchall()
+def write_import_chunks(db, rows, chunk_size, write, errors):
+    """
+    Write rows chunk_size at a time, committing each chunk. A chunk that
+    fails is retried row by row, so a bad row only fails itself and is
+    reported in errors. Returns the rows written.
+    """
+    written = []
 
-            category_map = {
-                normalize_product_name(cat["category_name"]): cat["category_id"]
-                for cat in existing_categories
-            }
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            write(chunk)
+            db.commit()
+            written.extend(chunk)
+            continue
+        except Exception:
+            db.rollback()
 
-            def get_or_create_category(category_name):
-                normalized_category = normalize_product_name(category_name)
+        for row in chunk:
+            try:
+                write([row])
+                db.commit()
+                written.append(row)
+            except Exception as row_error:
+                db.rollback()
+                errors.append({"row": int(row["row_number"]), "error": str(row_error)})
 
-                if normalized_category in category_map:
-                    return category_map[normalized_category]
+    return written
 
-                result = db.execute(
-                    text("""
-                        INSERT INTO categories (business_id, category_name)
-                        VALUES (:business_id, :category_name)
-                    """),
-                    {
-                        "business_id": business_id,
-                        "category_name": category_name,
-                    },
-                )
 
-                category_id = result.lastrowid
-                category_map[normalized_category] = category_id
-                return category_id
+def imported_product_ids(db, business_id, rows):
+    """product_id and product_name of the live products named like the given rows"""
+    names = list({row["product_name"] for row in rows})
+    if not names:
+        return []
 
-            existing_products = db.execute(
-                text("""
-                    SELECT product_id, product_name, product_stock
-                    FROM products
-                    WHERE business_id = :business_id
-                    AND deleted_at IS NULL
-                """),
-                {"business_id": business_id},
-            ).mappings().fetchall()
+    placeholders = ",".join([f":name{i}" for i in range(len(names))])
+    params = {f"name{i}": name for i, name in enumerate(names)}
+    params["business_id"] = business_id
 
-            product_map = {
-                normalize_product_name(product["product_name"]): product
-                for product in existing_products
-            }
+    return db.execute(
+        text(f"""
+            SELECT product_id, product_name
+            FROM products
+            WHERE business_id = :business_id
+            AND deleted_at IS NULL
+            AND product_name IN ({placeholders})
+            ORDER BY product_id
+        """),
+        params
+    ).mappings().fetchall()
 
-            for index, row in df.iterrows():
-                try:
-                    row_data = row.to_dict()
 
-                    product_name = get_excel_value(
-                        row_data,
-                        ["Product Name", "product_name", "Book Title", "BOOK TITLE", "Title", "TITLE", "Item Name"],
-                    )
+def write_product_import(db, business_id, parsed, update_stock, chunk_size=IMPORT_CHUNK_SIZE,
+                         product_map=None, category_map=None):
+    """
+    Write a parse_product_import() frame. The first row of every name that
+    is not in the catalogue is inserted; every other row updates the product
+    with that name (stock added when update_stock, other fields from the
+    last row). Writes go out as multi-row statements of chunk_size rows,
+    each chunk commits on its own and a failed chunk is retried row by row.
+    Streaming imports pass the same product_map and category_map for every
+    frame; they are kept up to date with the rows written.
+    """
+    stats = {
+        "imported": 0,
+        "updated": 0,
+        "duplicates_found": 0,
+        "errors": [],
+        "changed_product_ids": set(),
+    }
 
-                    if not product_name or str(product_name).lower() == "nan":
-                        skipped += 1
-                        continue
+    if parsed.empty:
+        return stats
 
-                    product_name = str(product_name).strip()
-                    normalized_name = normalize_product_name(product_name)
+    category_map = import_category_ids(
+        db, business_id, parsed["category_name"].unique(), category_map
+    )
+    parsed = parsed.assign(
+        category_id=parsed["category_name"].map(normalize_product_name).map(category_map)
+    )
 
-                    author = get_excel_value(row_data, ["Author", "AUTHOR"], "")
-                    publisher = get_excel_value(row_data, ["Publisher", "PUBLISHER"], "")
+    if product_map is None:
+        product_map = load_import_product_map(db, business_id)
 
-                    category_name = get_excel_value(
-                        row_data,
-                        ["Category", "CATEGORY", "category_name"],
-                        default_category,
-                    )
+    is_new = ~parsed["normalized_name"].isin(product_map.keys())
+    inserts = parsed[is_new & ~parsed["normalized_name"].duplicated()]
+    updates = parsed.drop(inserts.index)
 
-                    quantity = safe_float(
-                        get_excel_value(
-                            row_data,
-                            ["Stock", "stock", "QTY IN STOCK", "Qty In Stock", "Quantity", "quantity"],
-                            0,
-                        )
-                    )
+    inserted_rows = write_import_chunks(
+        db,
+        inserts.to_dict("records"),
+        chunk_size,
+        lambda chunk: insert_imported_products(db, business_id, chunk),
+        stats["errors"]
+    )
+    stats["imported"] += len(inserted_rows)
+
+    # Ids of the new products by their names, so other writers' inserts are never picked up
+    for start in range(0, len(inserted_rows), chunk_size):
+        for product in imported_product_ids(db, business_id, inserted_rows[start:start + chunk_size]):
+            product_map.setdefault(normalize_product_name(product["product_name"]), product["product_id"])
+            stats["changed_product_ids"].add(product["product_id"])
+
+    if not updates.empty:
+        updates = updates.assign(product_id=updates["normalized_name"].map(product_map))
+        unmatched = updates[updates["product_id"].isna()]
+        for row_number in unmatched["row_number"]:
+            stats["errors"].append({"row": int(row_number), "error": "Product was not created"})
+
+        updates = updates.dropna(subset=["product_id"])
+        stats["duplicates_found"] = len(updates)
+
+        # Repeated rows for one product add their stock, other fields come from the last one
+        merged = updates.groupby("product_id", sort=False).agg(
+            row_number=("row_number", "first"),
+            rows=("row_number", "size"),
+            quantity=("quantity", "sum"),
+            selling_price=("selling_price", "last"),
+            buying_price=("buying_price", "last"),
+            product_description=("product_description", "last"),
+            category_id=("category_id", "last"),
+            unit=("unit", "last"),
+        ).reset_index()
+        merged["product_id"] = merged["product_id"].astype(int)
+
+        updated_rows = write_import_chunks(
+            db,
+            merged.to_dict("records"),
+            chunk_size,
+            lambda chunk: update_imported_products(db, business_id, chunk, update_stock),
+            stats["errors"]
+        )
+        stats["updated"] += sum(row["rows"] for row in updated_rows)
+        stats["changed_product_ids"].update(row["product_id"] for row in updated_rows)
 
-                    buying_price = safe_float(
-                        get_excel_value(
-                            row_data,
-                            ["Buying Price", "BUYING PRICE", "buying_price", "Cost Price"],
-                            0,
-                        )
-                    )
+    return stats
 
-                    selling_price = safe_float(
-                        get_excel_value(
-                            row_data,
-                            ["Selling Price", "SELLING PRICE", "selling_price", "Price", "price"],
-                            0,
-                        )
-                    )
 
-                    unit = str(
-                        get_excel_value(row_data, ["Unit", "unit"], "pcs")
-                    ).strip() or "pcs"
+@app.route("/products/import-excel", methods=["POST"])
+def import_products_excel():
+    business_id = get_business_id()
 
-                    description_parts = []
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
 
-                    if author:
-                        description_parts.append(f"Author: {author}")
+    file = request.files.get("file")
+    update_stock = request.form.get("update_stock", "no").lower() == "yes"
+    default_category = request.form.get("category_name", "Imported Products")
+    import_token = request.form.get("import_token")
 
-                    if publisher:
-                        description_parts.append(f"Publisher: {publisher}")
+    # Reuse the sheet parsed by the preview when it is still spooled and
+    # was parsed with the same default category
+    spooled = import_spool.get(business_id, import_token) if import_token else None
+    if spooled and spooled["default_category"] != default_category:
+        spooled = None
 
-                    ignored_columns = [
-                        "Product Name", "product_name", "Book Title", "BOOK TITLE",
-                        "Title", "TITLE", "Item Name", "Author", "AUTHOR",
-                        "Publisher", "PUBLISHER", "Stock", "stock",
-                        "QTY IN STOCK", "Qty In Stock", "Quantity", "quantity",
-                        "Buying Price", "BUYING PRICE", "buying_price", "Cost Price",
-                        "Selling Price", "SELLING PRICE", "selling_price",
-                        "Price", "price", "Category", "CATEGORY",
-                        "category_name", "Unit", "unit",
-                    ]
+    if not spooled and not file:
+        if import_token:
+            return jsonify({"error": "Import preview expired, upload the file again"}), 410
+        return jsonify({"error": "Excel file is required"}), 400
 
-                    for key, value in row_data.items():
-                        if pd.notna(value) and key not in ignored_columns:
-                            description_parts.append(f"{key}: {value}")
+    try:
+        if spooled:
+            parsed, skipped = spooled["parsed"], spooled["skipped"]
+        else:
+            df = pd.read_excel(file)
+            df.columns = [str(col).strip() for col in df.columns]
 
-                    product_description = "\n".join(description_parts)
-                    category_id = get_or_create_category(str(category_name).strip())
+            missing = missing_import_columns(df)
 
-                    if normalized_name in product_map:
-                        duplicates_found += 1
-                        existing_product = product_map[normalized_name]
+            if missing:
+                return jsonify({
+                    "error": "Excel file columns do not match the expected format.",
+                    "missing_columns": missing,
+                    "expected_columns": [
+                        "Book Title or Product Name",
+                        "Author",
+                        "Publisher",
+                        "Qty In Stock or Stock",
+                        "Buying Price",
+                        "Selling Price",
+                        "Category",
+                        "Unit",
+                    ],
+                }), 400
 
-                        if update_stock:
-                            db.execute(
-                                text("""
-                                    UPDATE products
-                                    SET
-                                        product_stock = product_stock + :quantity,
-                                        product_price = :selling_price,
-                                        buying_price = :buying_price,
-                                        product_description = :product_description,
-                                        category_id_fk = :category_id_fk,
-                                        unit = :unit
-                                    WHERE product_id = :product_id
-                                    AND business_id = :business_id
-                                """),
-                                {
-                                    "quantity": quantity,
-                                    "selling_price": selling_price,
-                                    "buying_price": buying_price,
-                                    "product_description": product_description,
-                                    "category_id_fk": category_id,
-                                    "unit": unit,
-                                    "product_id": existing_product["product_id"],
-                                    "business_id": business_id,
-                                },
-                            )
-                        else:
-                            db.execute(
-                                text("""
-                                    UPDATE products
-                                    SET
-                                        product_price = :selling_price,
-                                        buying_price = :buying_price,
-                                        product_description = :product_description,
-                                        category_id_fk = :category_id_fk,
-                                        unit = :unit
-                                    WHERE product_id = :product_id
-                                    AND business_id = :business_id
-                                """),
-                                {
-                                    "selling_price": selling_price,
-                                    "buying_price": buying_price,
-                                    "product_description": product_description,
-                                    "category_id_fk": category_id,
-                                    "unit": unit,
-                                    "product_id": existing_product["product_id"],
-                                    "business_id": business_id,
-                                },
-                            )
+            parsed, skipped = parse_product_import(df, default_category)
 
-                        updated += 1
+        with get_db() as db:
+            stats = write_product_import(db, business_id, parsed, update_stock)
 
-                    else:
-                        db.execute(
-                            text("""
-                                INSERT INTO products
-                                (
-                                    business_id,
-                                    product_number,
-                                    product_name,
-                                    product_price,
-                                    buying_price,
-                                    product_stock,
-                                    product_description,
-                                    category_id_fk,
-                                    unit
-                                )
-                                VALUES
-                                (
-                                    :business_id,
-                                    :product_number,
-                                    :product_name,
-                                    :product_price,
-                                    :buying_price,
-                                    :product_stock,
-                                    :product_description,
-                                    :category_id_fk,
-                                    :unit
-                                )
-                            """),
-                            {
-                                "business_id": business_id,
-                                "product_number": "1000",
-                                "product_name": product_name,
-                                "product_price": selling_price,
-                                "buying_price": buying_price,
-                                "product_stock": quantity,
-                                "product_description": product_description,
-                                "category_id_fk": category_id,
-                                "unit": unit,
-                            },
-                        )
+            if stats["changed_product_ids"]:
+                record_catalogue_changes(db, business_id, product_ids=stats["changed_product_ids"])
 
-                        imported += 1
-                        product_map[normalized_name] = {
-                            "product_id": None,
-                            "product_name": product_name,
-                            "product_stock": quantity,
-                        }
+        barcode_index.invalidate(business_id, stats["changed_product_ids"])
 
-                except Exception as row_error:
-                    errors.append({
-                        "row": int(index) + 2,
-                        "error": str(row_error),
-                    })
+        if import_token:
+            import_spool.discard(business_id, import_token)
 
         return jsonify({
             "message": "Excel import completed",
-            "imported": imported,
-            "updated": updated,
+            "imported": stats["imported"],
+            "updated": stats["updated"],
             "skipped": skipped,
-            "duplicates_found": duplicates_found,
-            "errors": errors,
+            "duplicates_found": stats["duplicates_found"],
+            "errors": stats["errors"],
             "update_stock": update_stock,
         }), 200
 
@@ -11953,53 +13414,7 @@ def preview_products_excel():
         df = pd.read_excel(file)
         df.columns = [str(col).strip() for col in df.columns]
 
-        # Validate Excel columns
-        def has_any_column(df, possible_columns):
-            return any(
-                col in df.columns
-                for col in possible_columns
-            )
-
-        missing = []
-
-        if not has_any_column(
-            df,
-            [
-                "Product Name",
-                "product_name",
-                "Book Title",
-                "BOOK TITLE",
-                "Title",
-                "TITLE",
-                "Item Name"
-            ]
-        ):
-            missing.append("Product Name / Book Title")
-
-        if not has_any_column(
-            df,
-            [
-                "Selling Price",
-                "SELLING PRICE",
-                "selling_price",
-                "Price",
-                "price"
-            ]
-        ):
-            missing.append("Selling Price")
-
-        if not has_any_column(
-            df,
-            [
-                "Stock",
-                "stock",
-                "QTY IN STOCK",
-                "Qty In Stock",
-                "Quantity",
-                "quantity"
-            ]
-        ):
-            missing.append("Stock / Qty In Stock")
+        missing = missing_import_columns(df)
 
         if missing:
             return jsonify({
@@ -12017,6 +13432,9 @@ def preview_products_excel():
                 ]
             }), 400
 
+        parsed, skipped = parse_product_import(df, default_category)
+        import_token = import_spool.put(business_id, parsed, skipped, default_category)
+
         with get_db() as db:
             existing_products = db.execute(
                 text("""
@@ -12033,140 +13451,273 @@ def preview_products_excel():
                 for product in existing_products
             }
 
-        preview_products = []
-
-        for _, row in df.iterrows():
-            row_data = row.to_dict()
-
-            product_name = get_excel_value(
-                row_data,
-                [
-                    "Product Name",
-                    "product_name",
-                    "Book Title",
-                    "BOOK TITLE",
-                    "Title",
-                    "TITLE",
-                    "Item Name",
-                ],
-            )
+        exists = parsed["normalized_name"].isin(existing_names)
 
-            if not product_name or str(product_name).lower() == "nan":
-                continue
+        preview_products = [
+            {
+                "product_name": row["product_name"],
+                "category_name": row["category_name"],
+                "quantity": row["quantity"],
+                "buying_price": row["buying_price"],
+                "selling_price": row["selling_price"],
+                "product_description": row["summary"],
+                "exists": row["exists"],
+            }
+            for row in parsed.assign(exists=exists).to_dict("records")
+        ]
 
-            product_name = str(product_name).strip()
-            normalized_name = normalize_product_name(product_name)
+        existing_count = int(exists.sum())
 
-            author = get_excel_value(
-                row_data,
-                ["Author", "AUTHOR"],
-                ""
-            )
+        return jsonify({
+            "products": preview_products,
+            "import_token": import_token,
+            "total": len(preview_products),
+            "existing": existing_count,
+            "new": len(preview_products) - existing_count,
+        }), 200
 
-            publisher = get_excel_value(
-                row_data,
-                ["Publisher", "PUBLISHER"],
-                ""
-            )
+    except Exception as e:
+        print(
+            "❌ ERROR previewing products Excel:",
+            str(e)
+        )
+        traceback.print_exc()
 
-            category_name = get_excel_value(
-                row_data,
-                [
-                    "Category",
-                    "CATEGORY",
-                    "category_name",
-                ],
-                default_category,
-            )
+        return jsonify({
+            "error": str(e)
+        }), 500
 
-            quantity = safe_float(
-                get_excel_value(
-                    row_data,
-                    [
-                        "Stock",
-                        "stock",
-                        "QTY IN STOCK",
-                        "Qty In Stock",
-                        "Quantity",
-                        "quantity",
-                    ],
-                    0,
-                )
-            )
 
-            buying_price = safe_float(
-                get_excel_value(
-                    row_data,
-                    [
-                        "Buying Price",
-                        "BUYING PRICE",
-                        "buying_price",
-                        "Cost Price",
-                    ],
-                    0,
-                )
-            )
 
-            selling_price = safe_float(
-                get_excel_value(
-                    row_data,
-                    [
-                        "Selling Price",
-                        "SELLING PRICE",
-                        "selling_price",
-                        "Price",
-                        "price",
-                    ],
-                    0,
-                )
+# ==================== STREAMING IMPORT JOBS ====================
+
+IMPORT_JOB_FILE_TYPES = {"xlsx", "xls", "csv"}
+
+
+def unique_import_columns(header):
+    """Stripped header names, blank ones named and repeats suffixed like pandas does"""
+    columns = []
+    seen = {}
+
+    for index, col in enumerate(header):
+        name = str(col).strip() if col is not None else f"Unnamed: {index}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+
+    return columns
+
+
+def iter_import_chunks(path, file_type, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Yield a sheet as DataFrames of at most chunk_size rows, indexed by
+    their position in the sheet so parse_product_import() numbers rows
+    correctly. xlsx is streamed with openpyxl's read-only mode and CSV with
+    pandas' chunked reader, so memory stays flat whatever the file size;
+    legacy xls (at most 65k rows) is read whole and then sliced.
+    """
+    if file_type == "csv":
+        for chunk in pd.read_csv(path, chunksize=chunk_size, encoding_errors="replace"):
+            chunk.columns = unique_import_columns(chunk.columns)
+            yield chunk
+        return
+
+    if file_type == "xls":
+        df = pd.read_excel(path)
+        df.columns = unique_import_columns(df.columns)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        columns = unique_import_columns(header)
+        width = len(columns)
+        start = 0
+        batch = []
+
+        for row in rows:
+            batch.append(tuple(row[:width]) + (None,) * (width - len(row)))
+
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+                start += len(batch)
+                batch = []
+
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+
+    finally:
+        workbook.close()
+
+
+def import_sheet_head(path, file_type):
+    """First data row of a sheet (None when it has none), for header checks"""
+    chunks = iter_import_chunks(path, file_type, chunk_size=1)
+    try:
+        return next(chunks, None)
+    finally:
+        chunks.close()
+
+
+def import_sheet_rows(path, file_type):
+    """Data rows in an xlsx sheet according to its stored dimensions, None when unknown"""
+    if file_type != "xlsx":
+        return None
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        max_row = workbook.active.max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
+
+
+def run_import_job(job, path, report):
+    """Stream one queued import, writing and reporting progress chunk by chunk"""
+    business_id = job["business_id"]
+    update_stock = bool(job["update_stock"])
+    default_category = job["default_category"] or "Imported Products"
+
+    progress = {
+        "total_rows": import_sheet_rows(path, job["file_type"]),
+        "rows_processed": 0,
+        "imported": 0,
+        "updated": 0,
+        "skipped": 0,
+        "duplicates_found": 0,
+        "error_count": 0,
+        "errors": [],
+    }
+
+    with get_db() as db:
+        product_map = load_import_product_map(db, business_id)
+        category_map = import_category_ids(db, business_id, [])
+
+        for chunk in iter_import_chunks(path, job["file_type"]):
+            parsed, skipped = parse_product_import(chunk, default_category)
+            stats = write_product_import(
+                db, business_id, parsed, update_stock,
+                product_map=product_map, category_map=category_map
             )
 
-            description_parts = []
+            if stats["changed_product_ids"]:
+                record_catalogue_changes(db, business_id, product_ids=stats["changed_product_ids"])
+                db.commit()
+                barcode_index.invalidate(business_id, stats["changed_product_ids"])
 
-            if author:
-                description_parts.append(
-                    f"Author: {author}"
-                )
+            progress["rows_processed"] += len(chunk)
+            progress["imported"] += stats["imported"]
+            progress["updated"] += stats["updated"]
+            progress["skipped"] += skipped
+            progress["duplicates_found"] += stats["duplicates_found"]
+            progress["error_count"] += len(stats["errors"])
+            room = IMPORT_JOB_MAX_ERRORS - len(progress["errors"])
+            progress["errors"].extend(stats["errors"][:max(room, 0)])
 
-            if publisher:
-                description_parts.append(
-                    f"Publisher: {publisher}"
-                )
+            report(progress)
 
-            preview_products.append({
-                "product_name": product_name,
-                "category_name": str(category_name).strip(),
-                "quantity": quantity,
-                "buying_price": buying_price,
-                "selling_price": selling_price,
-                "product_description": "\n".join(description_parts),
-                "exists": normalized_name in existing_names,
-            })
+
+# Background spreadsheet imports (IMPORT_JOB_WORKERS=0 disables them)
+start_import_job_workers(run_import_job)
+
+
+@app.route("/products/import-jobs", methods=["POST"])
+def start_products_import_job():
+    business_id = get_business_id()
+
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
+
+    file = request.files.get("file")
+    update_stock = request.form.get("update_stock", "no").lower() == "yes"
+    default_category = request.form.get("category_name", "Imported Products")
+
+    if not file:
+        return jsonify({"error": "Excel or CSV file is required"}), 400
+
+    file_type = os.path.splitext(file.filename or "")[1].lower().lstrip(".")
+    if file_type not in IMPORT_JOB_FILE_TYPES:
+        return jsonify({"error": "Upload an .xlsx, .xls or .csv file"}), 400
+
+    job_id = new_import_job_id()
+    path = import_job_path(job_id, file_type)
+
+    try:
+        os.makedirs(IMPORT_JOB_DIR, exist_ok=True)
+        # Werkzeug streams the upload to disk, the sheet is never held in memory
+        file.save(path)
+
+        head = import_sheet_head(path, file_type)
+        if head is None:
+            os.remove(path)
+            return jsonify({"error": "The file has no product rows"}), 400
+
+        missing = missing_import_columns(head)
+        if missing:
+            os.remove(path)
+            return jsonify({
+                "error": "Excel file columns do not match the expected format.",
+                "missing_columns": missing,
+            }), 400
+
+        create_import_job(
+            job_id, business_id, secure_filename(file.filename),
+            file_type, update_stock, default_category
+        )
 
         return jsonify({
-            "products": preview_products,
-            "total": len(preview_products),
-            "existing": sum(
-                1 for p in preview_products
-                if p["exists"]
-            ),
-            "new": sum(
-                1 for p in preview_products
-                if not p["exists"]
-            ),
-        }), 200
+            "message": "Import queued",
+            "job_id": job_id,
+            "status": "queued",
+        }), 202
 
     except Exception as e:
-        print(
-            "❌ ERROR previewing products Excel:",
-            str(e)
-        )
+        print("❌ ERROR queueing products import:", str(e))
         traceback.print_exc()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return jsonify({"error": str(e)}), 500
 
-        return jsonify({
-            "error": str(e)
-        }), 500
 
+@app.route("/products/import-jobs/<job_id>", methods=["GET"])
+def get_products_import_job(job_id):
+    business_id = get_business_id()
+
+    if not business_id:
+        return jsonify({"error": "Business ID not found"}), 401
+
+    try:
+        job = get_import_job(business_id, job_id)
+
+        if not job:
+            return jsonify({"error": "Import job not found"}), 404
+
+        for key in ("created_at", "started_at", "finished_at"):
+            if job[key]:
+                job[key] = job[key].isoformat()
+
+        return jsonify(job), 200
+
+    except Exception as e:
+        print("❌ ERROR loading import job:", str(e))
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
 
 @app.route("/update-sales-target", methods=["PUT"])
@@ -12187,7 +13738,8 @@ def update_sales_target():
             conn.execute(
                 text("""
                     UPDATE businesses
-                    SET monthly_target = :monthly_target
+                    SET monthly_target = :monthly_target,
+                        updated_at = NOW()
                     WHERE id = :business_id
                 """),
                 {
@@ -12197,6 +13749,8 @@ def update_sales_target():
             )
             conn.commit()
 
+        business_cache.invalidate(business_id)
+
         return jsonify({"success": True})
 
     except Exception as e:
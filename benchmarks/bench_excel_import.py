@@ -0,0 +1,78 @@
+# benchmarks/bench_excel_import.py
+"""
+Throughput of the Excel product import: parsing a sheet with
+parse_product_import() and writing it with write_product_import().
+
+Writes go to an in-memory SQLite catalogue (see bench_support.py), so it
+needs no MySQL (but does need pandas):
+
+    python benchmarks/bench_excel_import.py
+"""
+import time
+
+import pandas as pd
+
+from bench_support import CountingSession
+
+from app import parse_product_import, write_product_import
+
+SCHEMA = [
+    """CREATE TABLE categories (
+        category_id INTEGER PRIMARY KEY AUTOINCREMENT, business_id INTEGER, category_name TEXT
+    )""",
+    """CREATE TABLE products (
+        product_id INTEGER PRIMARY KEY AUTOINCREMENT, business_id INTEGER,
+        product_number TEXT, product_name TEXT, product_price NUMERIC,
+        buying_price NUMERIC, product_stock NUMERIC, product_description TEXT,
+        category_id_fk INTEGER, unit TEXT, deleted_at TEXT
+    )""",
+]
+
+
+def catalogue_session(existing_products):
+    session = CountingSession(SCHEMA)
+    session.seed("products", [
+        {"business_id": 1, "product_name": f"Product {product_id}", "product_stock": 0}
+        for product_id in range(1, existing_products + 1)
+    ])
+    return session
+
+
+def build_sheet(row_count):
+    """Half the rows update existing products, the rest are new"""
+    return pd.DataFrame({
+        "Product Name": [f"Product {i}" for i in range(1, row_count + 1)],
+        "Category": [f"Category {i % 25}" for i in range(row_count)],
+        "Stock": [i % 50 for i in range(row_count)],
+        "Buying Price": [f"{100 + i % 900}" for i in range(row_count)],
+        "Selling Price": [150.0 + i % 900 for i in range(row_count)],
+        "Unit": ["pcs"] * row_count,
+        "Author": [f"Author {i % 300}" for i in range(row_count)],
+    })
+
+
+def main():
+    print(f"{'rows':>8} {'parse rows/s':>14} {'write rows/s':>14} {'queries':>8}")
+
+    for row_count in (1000, 5000, 20000, 50000):
+        df = build_sheet(row_count)
+
+        started = time.perf_counter()
+        parsed, skipped = parse_product_import(df, "Imported")
+        parse_seconds = time.perf_counter() - started
+
+        session = catalogue_session(existing_products=row_count // 2)
+        started = time.perf_counter()
+        stats = write_product_import(session, 1, parsed, update_stock=True)
+        write_seconds = time.perf_counter() - started
+
+        assert not skipped
+        assert stats["imported"] + stats["updated"] == row_count
+        print(
+            f"{row_count:>8} {row_count / parse_seconds:>14,.0f} "
+            f"{row_count / write_seconds:>14,.0f} {session.query_count:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
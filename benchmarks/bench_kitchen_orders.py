@@ -0,0 +1,110 @@
+# benchmarks/bench_kitchen_orders.py
+"""
+Query count and build time of load_kitchen_orders() as open orders grow.
+
+Runs the real queries against an in-memory SQLite database seeded with
+today's orders (see bench_support.py), so it needs no MySQL:
+
+    python benchmarks/bench_kitchen_orders.py
+"""
+import time
+from datetime import datetime
+
+from bench_support import CountingSession
+
+from app import load_kitchen_orders
+
+ITEMS_PER_ORDER = 4
+ADDONS_PER_ITEM = 2
+
+SCHEMA = [
+    """CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT)""",
+    """CREATE TABLE restaurant_orders (
+        restaurant_order_id INTEGER PRIMARY KEY, business_id INTEGER, order_number TEXT,
+        order_type TEXT, table_name TEXT, waiter_name TEXT, kitchen_user_id INTEGER,
+        total_price NUMERIC, order_status TEXT, kitchen_status TEXT, created_at TEXT
+    )""",
+    """CREATE TABLE restaurant_order_items (
+        restaurant_order_item_id INTEGER PRIMARY KEY, restaurant_order_id INTEGER,
+        business_id INTEGER, product_id INTEGER, product_name TEXT, quantity NUMERIC,
+        unit_price NUMERIC, subtotal NUMERIC, item_status TEXT
+    )""",
+    """CREATE TABLE restaurant_order_item_addons (
+        order_item_addon_id INTEGER PRIMARY KEY, restaurant_order_item_id INTEGER,
+        restaurant_order_id INTEGER, business_id INTEGER, addon_id INTEGER,
+        addon_name TEXT, addon_price NUMERIC, quantity NUMERIC, subtotal NUMERIC
+    )""",
+]
+
+
+def kitchen_session(order_count):
+    session = CountingSession(SCHEMA)
+    order_ids = range(1, order_count + 1)
+    created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    session.seed("restaurant_orders", [
+        {
+            "restaurant_order_id": order_id,
+            "business_id": 1,
+            "order_number": f"ORS{order_id:06d}",
+            "order_type": "dine_in",
+            "table_name": f"T{order_id % 12}",
+            "waiter_name": "Waiter",
+            "total_price": 1400,
+            "order_status": "pending",
+            "kitchen_status": "pending",
+            "created_at": created_at,
+        }
+        for order_id in order_ids
+    ])
+    session.seed("restaurant_order_items", [
+        {
+            "restaurant_order_item_id": order_id * 100 + item,
+            "restaurant_order_id": order_id,
+            "business_id": 1,
+            "product_id": item,
+            "product_name": f"Dish {item}",
+            "quantity": 1,
+            "unit_price": 350,
+            "subtotal": 350,
+            "item_status": "pending",
+        }
+        for order_id in order_ids
+        for item in range(ITEMS_PER_ORDER)
+    ])
+    session.seed("restaurant_order_item_addons", [
+        {
+            "order_item_addon_id": (order_id * 100 + item) * 10 + addon,
+            "restaurant_order_item_id": order_id * 100 + item,
+            "restaurant_order_id": order_id,
+            "business_id": 1,
+            "addon_id": addon,
+            "addon_name": f"Addon {addon}",
+            "addon_price": 20,
+            "quantity": 1,
+            "subtotal": 20,
+        }
+        for order_id in order_ids
+        for item in range(ITEMS_PER_ORDER)
+        for addon in range(ADDONS_PER_ITEM)
+    ])
+
+    return session
+
+
+def main():
+    print(f"{'orders':>8} {'queries':>8} {'build ms':>10}")
+
+    for order_count in (1, 10, 60, 250, 1000):
+        session = kitchen_session(order_count)
+        started = time.perf_counter()
+        orders = load_kitchen_orders(session, business_id=1)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        assert len(orders) == order_count
+        assert all(len(order["items"]) == ITEMS_PER_ORDER for order in orders)
+        print(f"{order_count:>8} {session.query_count:>8} {elapsed_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
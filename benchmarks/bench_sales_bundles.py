@@ -0,0 +1,76 @@
+# benchmarks/bench_sales_bundles.py
+"""
+Query count and build time of load_sales_bundles() as bundles grow.
+
+Runs the real query against an in-memory SQLite database seeded with
+bundles of CHILDREN_PER_BUNDLE products each (see bench_support.py), so
+it needs no MySQL:
+
+    python benchmarks/bench_sales_bundles.py
+"""
+import time
+
+from bench_support import CountingSession
+
+from app import load_sales_bundles
+
+CHILDREN_PER_BUNDLE = 3
+
+SCHEMA = [
+    """CREATE TABLE products (
+        product_id INTEGER PRIMARY KEY, business_id INTEGER, product_name TEXT,
+        product_stock NUMERIC, unit TEXT, deleted_at TEXT
+    )""",
+    """CREATE TABLE product_bundles (
+        bundle_id INTEGER, business_id INTEGER, parent_product_id INTEGER,
+        child_product_id INTEGER, quantity NUMERIC, selling_price NUMERIC, deleted_at TEXT
+    )""",
+]
+
+
+def bundles_session(bundle_count):
+    session = CountingSession(SCHEMA)
+    product_count = bundle_count * CHILDREN_PER_BUNDLE
+
+    session.seed("products", [
+        {
+            "product_id": product_id,
+            "business_id": 1,
+            "product_name": f"Product {product_id}",
+            "product_stock": product_id % 240,
+            "unit": "pcs",
+        }
+        for product_id in range(1, product_count + 1)
+    ])
+    session.seed("product_bundles", [
+        {
+            "bundle_id": bundle_id,
+            "business_id": 1,
+            "parent_product_id": 0,
+            "child_product_id": (bundle_id - 1) * CHILDREN_PER_BUNDLE + child,
+            "quantity": 6,
+            "selling_price": 1200,
+        }
+        for bundle_id in range(1, bundle_count + 1)
+        for child in range(1, CHILDREN_PER_BUNDLE + 1)
+    ])
+
+    return session
+
+
+def main():
+    print(f"{'bundles':>8} {'queries':>8} {'build ms':>10}")
+
+    for bundle_count in (1, 10, 100, 800, 5000):
+        session = bundles_session(bundle_count)
+        started = time.perf_counter()
+        bundles = load_sales_bundles(session, business_id=1)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        assert len(bundles) == bundle_count
+        assert bundles[0]["product_name"] == "Product 1"
+        print(f"{bundle_count:>8} {session.query_count:>8} {elapsed_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
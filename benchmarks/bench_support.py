@@ -0,0 +1,66 @@
+# benchmarks/bench_support.py
+"""
+Shared setup of the benchmarks. Importing it makes app importable without
+starting its background workers, and CountingSession gives a benchmark a
+real SQLAlchemy session on an in-memory SQLite database that counts every
+statement the code under test sends. The MySQL functions the app's queries
+use are registered on the SQLite connection.
+"""
+import math
+import os
+import sys
+from datetime import date, datetime
+
+os.environ.setdefault("OUTBOX_WORKERS", "0")
+os.environ.setdefault("IMPORT_JOB_WORKERS", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+MYSQL_FUNCTIONS = {
+    "CURDATE": (0, lambda: date.today().isoformat()),
+    "NOW": (0, lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+    "FLOOR": (1, lambda value: None if value is None else math.floor(value)),
+}
+
+
+def register_mysql_functions(dbapi_connection, connection_record):
+    for name, (arity, function) in MYSQL_FUNCTIONS.items():
+        dbapi_connection.create_function(name, arity, function)
+
+
+class CountingSession(Session):
+    """Session on a fresh SQLite database built from schema, counting statements in query_count"""
+
+    def __init__(self, schema):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        event.listen(engine, "connect", register_mysql_functions)
+        event.listen(engine, "before_cursor_execute", self.count_statement)
+        super().__init__(engine)
+        self.query_count = 0
+
+        for statement in schema:
+            self.execute(text(statement))
+        self.commit()
+        self.query_count = 0
+
+    def count_statement(self, *args):
+        self.query_count += 1
+
+    def seed(self, table, rows):
+        """Insert rows (dicts sharing their keys) without counting the statement"""
+        if not rows:
+            return
+
+        columns = list(rows[0])
+        self.execute(
+            text(f"""
+                INSERT INTO {table} ({", ".join(columns)})
+                VALUES ({", ".join(f":{column}" for column in columns)})
+            """),
+            rows
+        )
+        self.commit()
+        self.query_count = 0
@@ -0,0 +1,263 @@
+# benchmarks/check_query_plans.py
+"""
+EXPLAIN the statements the hot endpoints actually run and fail if any of
+them reads one of its tables with a full scan.
+
+Each endpoint in HOT_ENDPOINTS is called through the Flask test client as a
+user of the business. Every SELECT it sends to the database is captured
+from the engine and EXPLAINed with its real parameters, so the plans
+checked are those of the app's own SQL rather than copies of it.
+
+Run it against a local MySQL/MariaDB after `python migrate.py`. The
+optimizer scans tiny tables whatever the indexes, so give it a few
+thousand rows per table; --seed writes them through the app's own write
+paths first (products, sales, a customer with invoices, and kitchen
+orders when the business has restaurant products):
+
+    python benchmarks/check_query_plans.py [--seed ROWS] [business_id]
+
+Exits 1 when a plan regresses, so it can gate deploys and CI jobs.
+"""
+import os
+import sys
+from datetime import date
+
+os.environ.setdefault("OUTBOX_WORKERS", "0")
+os.environ.setdefault("IMPORT_JOB_WORKERS", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+import pymysql  # noqa: E402
+from sqlalchemy import event, text  # noqa: E402
+
+import db as peakers_db  # noqa: E402
+from app import app, parse_product_import, read_kitchen_events, write_product_import  # noqa: E402
+
+# Tables small enough that a scan is the cheaper plan
+SCAN_ALLOWED = {"businesses", "users", "sales_archive_state"}
+
+# Read endpoints on the till, dashboard, invoice and kitchen hot paths.
+# {barcode} and {invoice_id} are filled in from the business's own rows.
+HOT_ENDPOINTS = {
+    "sales-data": "/sales-data",
+    "get-orders": "/get-orders",
+    "get-sales-products": "/get-sales-products",
+    "get-bundles": "/get-bundles",
+    "product-by-barcode": "/product-by-barcode/{barcode}",
+    "catalogue-changes": "/catalogue-changes?since=0",
+    "get-invoices": "/get-invoices",
+    "invoice-pdf": "/invoice-pdf/{invoice_id}",
+    "expenses": "/expenses",
+    "kitchen-orders": "/restaurant/kitchen-orders",
+    "restaurant-orders": "/restaurant/orders",
+    "restaurant-dashboard": "/restaurant-dashboard-data",
+}
+
+
+class StatementRecorder:
+    """Collects the distinct SELECTs run through the app's engines"""
+
+    def __init__(self):
+        self.statements = {}
+        self.engines = [e for e in (peakers_db.engine, peakers_db.replica_engine) if e is not None]
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith("SELECT"):
+            self.statements.setdefault(statement, parameters)
+
+    def __enter__(self):
+        self.statements = {}
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self.record)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self.record)
+
+
+def full_scans(cursor, statement, parameters):
+    """Tables that the plan reads with type=ALL"""
+    cursor.execute("EXPLAIN " + statement, parameters)
+
+    return [
+        row["table"]
+        for row in cursor.fetchall()
+        if row["type"] == "ALL"
+        and row["table"]
+        and not row["table"].startswith("<")
+        and row["table"] not in SCAN_ALLOWED
+    ]
+
+
+def signed_in_client(business_id, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["business_id"] = business_id
+        session["user_id"] = user_id
+        session["role"] = "admin"
+    return client
+
+
+def expect_created(response, what):
+    if response.status_code >= 300:
+        raise SystemExit(f"❌ Seeding {what} failed ({response.status_code}): {response.get_data(as_text=True)}")
+    return response.get_json()
+
+
+def seed(client, business_id, user_id, rows):
+    """Write rows products, and sales, invoices and kitchen orders in proportion"""
+    names = [f"Plan check product {i}" for i in range(rows)]
+    parsed, _ = parse_product_import(pd.DataFrame({
+        "Product Name": names,
+        "Category": [f"Plan check {i % 20}" for i in range(rows)],
+        "Stock": [1_000_000] * rows,
+        "Buying Price": [100] * rows,
+        "Selling Price": [150] * rows,
+        "Unit": ["pcs"] * rows,
+    }), "Plan check")
+
+    with peakers_db.get_db() as db:
+        write_product_import(db, business_id, parsed, update_stock=True)
+        product_ids = db.execute(
+            text("""
+                SELECT product_id
+                FROM products
+                WHERE business_id = :business_id
+                AND product_name LIKE 'Plan check product %'
+                AND deleted_at IS NULL
+            """),
+            {"business_id": business_id}
+        ).scalars().all()
+        restaurant_product_ids = db.execute(
+            text("""
+                SELECT restaurant_product_id
+                FROM restaurant_products
+                WHERE business_id = :business_id
+                LIMIT 20
+            """),
+            {"business_id": business_id}
+        ).scalars().all()
+
+    for i in range(rows // 10):
+        expect_created(client.post("/process-sale", json={
+            "payment_type": "Cash",
+            "user_id": user_id,
+            "cart_items": [{"product_id": product_ids[i % len(product_ids)], "quantity": 1, "subtotal": 150}],
+        }), "sales")
+
+    customer = expect_created(
+        client.post("/add-sales-customer", json={"customer_name": "Plan check customer"}), "a customer"
+    )["customer"]
+
+    for i in range(rows // 50):
+        expect_created(client.post("/add-invoice", json={
+            "customer_id": customer["customer_id"],
+            "issue_date": str(date.today()),
+            "user_id": user_id,
+            "items": [{
+                "product_id": product_ids[i % len(product_ids)],
+                "item_name": names[0],
+                "quantity": 1,
+                "unit_price": 150,
+            }],
+        }), "invoices")
+
+    for i in range(rows // 20 if restaurant_product_ids else 0):
+        expect_created(client.post("/restaurant/send-to-kitchen", json={
+            "order_type": "Takeaway",
+            "user_id": user_id,
+            "cart_items": [{
+                "product_id": restaurant_product_ids[i % len(restaurant_product_ids)],
+                "quantity": 1,
+                "subtotal": 150,
+            }],
+        }), "kitchen orders")
+
+    print(f"🌱 Seeded {rows} products, {rows // 10} sales and {rows // 50} invoices")
+
+
+def endpoint_urls(business_id):
+    """HOT_ENDPOINTS with their placeholders filled in; endpoints without data are skipped"""
+    with peakers_db.get_db() as db:
+        barcode = db.execute(
+            text("SELECT product_number FROM products WHERE business_id = :business_id LIMIT 1"),
+            {"business_id": business_id}
+        ).scalar()
+        invoice_id = db.execute(
+            text("SELECT invoice_id FROM invoices WHERE business_id = :business_id LIMIT 1"),
+            {"business_id": business_id}
+        ).scalar()
+
+    urls = {}
+    for name, url in HOT_ENDPOINTS.items():
+        if ("{barcode}" in url and barcode is None) or ("{invoice_id}" in url and invoice_id is None):
+            print(f"⚪ {name:<28} skipped, no rows to request")
+            continue
+        urls[name] = url.format(barcode=barcode, invoice_id=invoice_id)
+
+    return urls
+
+
+def main(argv):
+    seed_rows = 0
+    if argv[:1] == ["--seed"]:
+        seed_rows = int(argv[1])
+        argv = argv[2:]
+
+    business_id = int(argv[0]) if argv else 1
+
+    with peakers_db.get_db() as db:
+        user_id = db.execute(
+            text("SELECT user_id FROM users WHERE business_id = :business_id LIMIT 1"),
+            {"business_id": business_id}
+        ).scalar() or 1
+
+    client = signed_in_client(business_id, user_id)
+    if seed_rows:
+        seed(client, business_id, user_id, seed_rows)
+
+    recorder = StatementRecorder()
+    captured = {}
+
+    for name, url in endpoint_urls(business_id).items():
+        with recorder:
+            response = client.get(url)
+            response.get_data()
+
+        if response.status_code != 200:
+            print(f"⚠️  {name:<28} returned {response.status_code}, plans of the statements it ran are still checked")
+        captured[name] = recorder.statements
+
+    # The kitchen stream never ends, so its resume read is called directly
+    with recorder:
+        with peakers_db.get_db() as db:
+            read_kitchen_events(db, business_id, 0)
+    captured["kitchen-stream resume"] = recorder.statements
+
+    failures = 0
+    connection = peakers_db.engine.raw_connection()
+
+    try:
+        cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+        for name, statements in captured.items():
+            scans = sorted({
+                table
+                for statement, parameters in statements.items()
+                for table in full_scans(cursor, statement, parameters)
+            })
+
+            if scans:
+                failures += 1
+                print(f"❌ {name:<28} full scan on {', '.join(scans)}")
+            else:
+                print(f"✅ {name:<28} {len(statements)} statements indexed")
+    finally:
+        connection.close()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,114 @@
+# benchmarks/mock_stk_gateway.py
+"""
+Local stand-in for the Credit Bank STK push gateway, for exercising
+stk_payments.py without real money:
+
+    python benchmarks/mock_stk_gateway.py [port] [latency_seconds] [callback_delay_seconds]
+
+then start the app with
+
+    STK_GATEWAY_URL=http://127.0.0.1:8099/safaricom-stkpush
+    STK_CALLBACK_BASE_URL=http://127.0.0.1:5000
+
+Every push is accepted after latency_seconds (default 0.2) and settled
+callback_delay_seconds later (default 3) with a Daraja-style callback to
+the push's callBackUrl. Phone numbers ending in 0 are reported as
+cancelled by the customer, so both outcomes can be tested.
+"""
+import json
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def send_callback(push, delay):
+    time.sleep(delay)
+
+    failed = str(push.get("phoneNumber", "")).endswith("0")
+    body = {
+        "Body": {
+            "stkCallback": {
+                "MerchantRequestID": uuid.uuid4().hex[:10],
+                "CheckoutRequestID": push.get("reference"),
+                "ResultCode": 1032 if failed else 0,
+                "ResultDesc": "Request cancelled by user" if failed
+                else "The service request is processed successfully.",
+            }
+        }
+    }
+
+    if not failed:
+        body["Body"]["stkCallback"]["CallbackMetadata"] = {
+            "Item": [
+                {"Name": "Amount", "Value": push.get("amount")},
+                {"Name": "MpesaReceiptNumber", "Value": "MOCK" + uuid.uuid4().hex[:6].upper()},
+                {"Name": "PhoneNumber", "Value": push.get("phoneNumber")},
+            ]
+        }
+
+    request = urllib.request.Request(
+        push["callBackUrl"],
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            print(f"callback {push.get('reference')} -> {response.status}")
+    except Exception as e:
+        print(f"callback {push.get('reference')} failed: {e}")
+
+
+def make_handler(latency, callback_delay):
+    class MockGatewayHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            push = json.loads(self.rfile.read(length) or b"{}")
+
+            time.sleep(latency)
+
+            if not self.headers.get("x-app-id") or not self.headers.get("x-api-key"):
+                self.reply(401, {"errorMessage": "Missing credentials"})
+                return
+
+            self.reply(200, {
+                "ResponseCode": "0",
+                "ResponseDescription": "Success. Request accepted for processing",
+                "CustomerMessage": "Success. Request accepted for processing",
+                "reference": push.get("reference"),
+            })
+
+            if push.get("callBackUrl"):
+                threading.Thread(
+                    target=send_callback, args=(push, callback_delay), daemon=True
+                ).start()
+
+        def reply(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return MockGatewayHandler
+
+
+def main(argv):
+    port = int(argv[0]) if len(argv) > 0 else 8099
+    latency = float(argv[1]) if len(argv) > 1 else 0.2
+    callback_delay = float(argv[2]) if len(argv) > 2 else 3
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, callback_delay))
+    print(f"Mock STK gateway on http://127.0.0.1:{port}/safaricom-stkpush")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,116 @@
+# catalogue_sync.py
+from sqlalchemy import text
+
+from db import get_db
+
+CATALOGUE_PRODUCT = "product"
+CATALOGUE_BUNDLE = "bundle"
+
+
+def bump_catalogue_version(db, business_id):
+    """
+    Increment and return the business's catalogue version.
+    The version row stays locked until the caller commits, so versions of one
+    business become visible in order. Call it as late in the transaction as
+    possible to keep that lock short.
+    """
+    db.execute(
+        text("""
+            INSERT INTO catalogue_versions (business_id, version)
+            VALUES (:business_id, LAST_INSERT_ID(1))
+            ON DUPLICATE KEY UPDATE version = LAST_INSERT_ID(version + 1)
+        """),
+        {"business_id": business_id}
+    )
+
+    return int(db.execute(text("SELECT LAST_INSERT_ID()")).scalar())
+
+
+def current_catalogue_version(db, business_id):
+    version = db.execute(
+        text("""
+            SELECT version
+            FROM catalogue_versions
+            WHERE business_id = :business_id
+        """),
+        {"business_id": business_id}
+    ).scalar()
+
+    return int(version or 0)
+
+
+def record_catalogue_changes(db, business_id, product_ids=(), bundle_ids=(), deleted=False):
+    """
+    Log changed products and bundles on the caller's session under a new
+    catalogue version. The log keeps one row per item, so a tombstone
+    (deleted=True) simply replaces the item's last change.
+    """
+    entries = (
+        [(CATALOGUE_PRODUCT, int(pid)) for pid in sorted(set(product_ids or ()))] +
+        [(CATALOGUE_BUNDLE, int(bid)) for bid in sorted(set(bundle_ids or ()))]
+    )
+
+    if not entries:
+        return None
+
+    version = bump_catalogue_version(db, business_id)
+
+    db.execute(
+        text("""
+            INSERT INTO catalogue_changes (
+                business_id, entity_type, entity_id, version, change_type
+            )
+            VALUES (
+                :business_id, :entity_type, :entity_id, :version, :change_type
+            )
+            ON DUPLICATE KEY UPDATE
+                version = VALUES(version),
+                change_type = VALUES(change_type)
+        """),
+        [
+            {
+                "business_id": business_id,
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "version": version,
+                "change_type": "delete" if deleted else "upsert"
+            }
+            for entity_type, entity_id in entries
+        ]
+    )
+
+    return version
+
+
+def note_catalogue_changes(business_id, product_ids=(), bundle_ids=(), deleted=False):
+    """
+    record_catalogue_changes() in its own transaction, for autocommit
+    endpoints and for sales, which note their stock changes after they
+    commit so checkouts of one business never wait on its version row.
+    """
+    with get_db() as db:
+        return record_catalogue_changes(
+            db, business_id, product_ids, bundle_ids, deleted
+        )
+
+
+def read_catalogue_changes(db, business_id, since_version):
+    """Items changed after the given version, split by type"""
+    rows = db.execute(
+        text("""
+            SELECT entity_type, entity_id, change_type
+            FROM catalogue_changes
+            WHERE business_id = :business_id
+            AND version > :since_version
+        """),
+        {
+            "business_id": business_id,
+            "since_version": since_version
+        }
+    ).mappings().fetchall()
+
+    changes = {CATALOGUE_PRODUCT: set(), CATALOGUE_BUNDLE: set()}
+    for row in rows:
+        changes.setdefault(row["entity_type"], set()).add(int(row["entity_id"]))
+
+    return changes
@@ -1,12 +1,18 @@
 # db.py
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
 from contextlib import contextmanager
 import logging
+import os
+import threading
+import time
+import pymysql
 from typing import Optional, Dict, Any, Generator
 import urllib.parse  # ADDED: For URL-encoding the password
 
+from query_profiler import TimedQueuePool, instrument_engine
+
 logger = logging.getLogger(__name__)
 
 # Database configuration
@@ -17,6 +23,9 @@ DB_CONFIG = {
     'database': 'peakers_pos'
 }
 
+DB_POOL_SIZE = 20
+DB_MAX_OVERFLOW = 30
+
 # URL-encode the password to handle special characters (@, !, etc.)
 encoded_password = urllib.parse.quote_plus(DB_CONFIG['password'])
 
@@ -24,9 +33,9 @@ encoded_password = urllib.parse.quote_plus(DB_CONFIG['password'])
 # Using encoded password in the connection string
 engine = create_engine(
     f"mysql+pymysql://{DB_CONFIG['user']}:{encoded_password}@{DB_CONFIG['host']}/{DB_CONFIG['database']}",
-    poolclass=QueuePool,
-    pool_size=20,              # Base connections
-    max_overflow=30,            # Additional connections when pool is exhausted
+    poolclass=TimedQueuePool,   # QueuePool that also times waits for a connection
+    pool_size=DB_POOL_SIZE,             # Base connections
+    max_overflow=DB_MAX_OVERFLOW,       # Additional connections when pool is exhausted
     pool_pre_ping=True,         # Verify connections before using
     pool_recycle=3600,          # Recycle connections after 1 hour
     pool_timeout=30,            # Timeout for getting connection from pool
@@ -36,6 +45,9 @@ engine = create_engine(
     }
 )
 
+# Per-request query counts and timings for /metrics (QUERY_PROFILER=0 disables it)
+instrument_engine(engine)
+
 # Create session factory (not a global scoped session)
 SessionFactory = sessionmaker(
     bind=engine,
@@ -44,6 +56,120 @@ SessionFactory = sessionmaker(
     expire_on_commit=False
 )
 
+# Optional read replica for reporting endpoints (REPLICA_DB_HOST unset = primary only).
+# It gets its own, smaller pool so reports never hold the connections checkout needs.
+REPLICA_DB_CONFIG = {
+    'host': os.getenv("REPLICA_DB_HOST"),
+    'port': int(os.getenv("REPLICA_DB_PORT", 3306)),
+    'user': os.getenv("REPLICA_DB_USER", DB_CONFIG['user']),
+    'password': os.getenv("REPLICA_DB_PASSWORD", DB_CONFIG['password']),
+    'database': os.getenv("REPLICA_DB_NAME", DB_CONFIG['database'])
+}
+REPLICA_POOL_SIZE = int(os.getenv("REPLICA_POOL_SIZE", 10))
+REPLICA_MAX_OVERFLOW = int(os.getenv("REPLICA_MAX_OVERFLOW", 20))
+# Reads go back to the primary while the replica is further behind than this
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 10))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", 5))
+
+replica_engine = None
+ReadSessionFactory = None
+
+if REPLICA_DB_CONFIG['host']:
+    replica_engine = create_engine(
+        f"mysql+pymysql://{REPLICA_DB_CONFIG['user']}:"
+        f"{urllib.parse.quote_plus(REPLICA_DB_CONFIG['password'])}@"
+        f"{REPLICA_DB_CONFIG['host']}:{REPLICA_DB_CONFIG['port']}/{REPLICA_DB_CONFIG['database']}",
+        poolclass=TimedQueuePool,
+        pool_size=REPLICA_POOL_SIZE,
+        max_overflow=REPLICA_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_timeout=10,
+        echo=False,
+        connect_args={
+            'connect_timeout': 5
+        }
+    )
+    instrument_engine(replica_engine)
+
+    ReadSessionFactory = sessionmaker(
+        bind=replica_engine,
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+
+class ReplicaHealth:
+    """
+    Whether reads may go to the replica, re-checked at most every
+    REPLICA_LAG_CHECK_SECONDS from Seconds_Behind_Master. A replica that is
+    unreachable, not replicating or lagging is skipped until the next check.
+    """
+
+    def __init__(self, engine, max_lag_seconds, check_interval):
+        self.engine = engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.usable = False
+        self.lag_seconds = None
+        self.checked_at = None
+
+    def measure_lag(self):
+        """Seconds behind the primary, None when replication is not running"""
+        with self.engine.connect() as conn:
+            status = conn.execute(text("SHOW SLAVE STATUS")).mappings().fetchone()
+
+        if not status:
+            return None
+        return status["Seconds_Behind_Master"]
+
+    def check(self):
+        try:
+            lag = self.measure_lag()
+        except Exception as e:
+            logger.warning(f"Read replica unavailable, reading from primary: {e}")
+            lag = None
+
+        usable = lag is not None and lag <= self.max_lag_seconds
+        if self.usable and not usable:
+            logger.warning(f"Read replica lag {lag}s, reading from primary")
+
+        self.lag_seconds = lag
+        self.usable = usable
+        self.checked_at = time.monotonic()
+
+    def available(self):
+        if self.engine is None:
+            return False
+
+        checked_at = self.checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.check_interval:
+            return self.usable
+
+        # One request re-checks, the others keep the last known state meanwhile
+        # (the primary until the first check has finished)
+        if not self.lock.acquire(blocking=False):
+            return self.usable
+
+        try:
+            if self.checked_at is None or time.monotonic() - self.checked_at >= self.check_interval:
+                self.check()
+        finally:
+            self.lock.release()
+
+        return self.usable
+
+    def mark_down(self):
+        """Skip the replica until the next check, after a connection failed mid-request"""
+        self.usable = False
+        self.checked_at = time.monotonic()
+
+
+replica_health = ReplicaHealth(replica_engine, REPLICA_MAX_LAG_SECONDS, REPLICA_LAG_CHECK_SECONDS)
+
+
 @contextmanager
 def get_db() -> Generator:
     """
@@ -62,12 +188,36 @@ def get_db() -> Generator:
         session.close()
         logger.debug("Database session closed, connection returned to pool")
 
-def execute_query(query: str, params: Optional[Dict[str, Any]] = None, fetch_all: bool = True):
+@contextmanager
+def get_read_db() -> Generator:
+    """
+    Session for read-only work that tolerates REPLICA_MAX_LAG_SECONDS of
+    staleness (reports, listings). Uses the replica when it is configured
+    and caught up, the primary otherwise. Nothing is committed.
+    """
+    if not replica_health.available():
+        with get_db() as db:
+            yield db
+        return
+
+    session = ReadSessionFactory()
+    try:
+        yield session
+    except DBAPIError as e:
+        if e.connection_invalidated or isinstance(e.orig, pymysql.OperationalError):
+            replica_health.mark_down()
+        raise
+    finally:
+        session.close()
+
+def execute_query(query: str, params: Optional[Dict[str, Any]] = None, fetch_all: bool = True,
+                  replica: bool = False):
     """
     Execute a query and return results
     Creates its own session (automatically closed)
+    replica=True reads through get_read_db()
     """
-    with get_db() as db:
+    with (get_read_db() if replica else get_db()) as db:
         result = db.execute(text(query), params or {})
         if fetch_all and result.returns_rows:
             return [dict(row._mapping) for row in result]
@@ -100,18 +250,61 @@ def get_db_connection():
     with get_db() as db:
         return db.connection()
 
-def get_pool_status():
-    """Get current connection pool status for monitoring"""
-    pool = engine.pool
+def get_ubuntu_db_connection():
+    """
+    Raw DB-API connection to the Ubuntu replica that sync.py pushes to,
+    configured through UBUNTU_DB_HOST/PORT/USER/PASSWORD/NAME.
+    Returns None when it is not configured or unreachable.
+    """
+    host = os.getenv("UBUNTU_DB_HOST")
+    if not host:
+        return None
+
+    try:
+        return pymysql.connect(
+            host=host,
+            port=int(os.getenv("UBUNTU_DB_PORT", 3306)),
+            user=os.getenv("UBUNTU_DB_USER"),
+            password=os.getenv("UBUNTU_DB_PASSWORD"),
+            database=os.getenv("UBUNTU_DB_NAME", DB_CONFIG['database']),
+            connect_timeout=10,
+            autocommit=False
+        )
+    except pymysql.MySQLError as e:
+        logger.error(f"Ubuntu DB connection failed: {e}")
+        return None
+
+def pool_counts(pool):
+    """Connection counts of a QueuePool; open connections are the idle plus the checked out ones"""
+    checked_in = pool.checkedin()
+    checked_out = pool.checkedout()
     return {
         'size': pool.size(),
-        'checked_in': pool.checkedin(),
-        'overflow': pool.overflow(),
-        'total': pool.total(),
-        'status': 'healthy' if pool.total() <= (pool.size() + pool.max_overflow()) else 'critical',
-        'connections_in_use': pool.total() - pool.checkedin()
+        'checked_in': checked_in,
+        'overflow': max(pool.overflow(), 0),
+        'total': checked_in + checked_out,
+        'connections_in_use': checked_out
     }
 
+def get_pool_status():
+    """Get current connection pool status for monitoring"""
+    status = pool_counts(engine.pool)
+    # Every connection the pool may open is in use: the next request waits pool_timeout
+    status['status'] = (
+        'critical' if status['connections_in_use'] >= DB_POOL_SIZE + DB_MAX_OVERFLOW else 'healthy'
+    )
+    return status
+
+def get_replica_status():
+    """Read replica pool and lag for monitoring, None when no replica is configured"""
+    if replica_engine is None:
+        return None
+
+    status = pool_counts(replica_engine.pool)
+    status['usable'] = replica_health.usable
+    status['lag_seconds'] = replica_health.lag_seconds
+    return status
+
 def init_app(app):
     """Initialize the database for Flask app (optional)"""
     @app.teardown_appcontext
@@ -0,0 +1,277 @@
+# import_jobs.py
+import json
+import os
+import socket
+import tempfile
+import threading
+import traceback
+import uuid
+
+from sqlalchemy import text
+
+from db import get_db
+
+IMPORT_JOB_WORKERS = int(os.getenv("IMPORT_JOB_WORKERS", 1))
+IMPORT_JOB_POLL_INTERVAL = float(os.getenv("IMPORT_JOB_POLL_INTERVAL", 2))
+IMPORT_JOB_LOCK_TIMEOUT = int(os.getenv("IMPORT_JOB_LOCK_TIMEOUT", 600))
+IMPORT_JOB_MAX_ERRORS = int(os.getenv("IMPORT_JOB_MAX_ERRORS", 100))
+# Uploaded files wait here for a worker. Set IMPORT_JOB_DIR to a directory every
+# app server sees; without it files stay in the local temp dir and each job is
+# only claimed by a worker on the host that received the upload.
+IMPORT_JOB_DIR_SHARED = bool(os.getenv("IMPORT_JOB_DIR"))
+IMPORT_JOB_DIR = os.getenv("IMPORT_JOB_DIR") or os.path.join(
+    tempfile.gettempdir(), "peakers_import_jobs"
+)
+
+
+def import_job_path(job_id, file_type):
+    """Where the uploaded file of a job is kept until the job finishes"""
+    return os.path.join(IMPORT_JOB_DIR, f"{job_id}.{file_type}")
+
+
+def new_import_job_id():
+    return uuid.uuid4().hex
+
+
+def import_job_file_host():
+    """Host a job's file is only readable on, None when IMPORT_JOB_DIR is shared"""
+    return None if IMPORT_JOB_DIR_SHARED else socket.gethostname()
+
+
+def create_import_job(job_id, business_id, filename, file_type, update_stock, default_category):
+    """Queue a job for a file already saved at import_job_path()"""
+    with get_db() as db:
+        db.execute(
+            text("""
+                INSERT INTO import_jobs (
+                    job_id, business_id, filename, file_type,
+                    update_stock, default_category, file_host, status
+                )
+                VALUES (
+                    :job_id, :business_id, :filename, :file_type,
+                    :update_stock, :default_category, :file_host, 'queued'
+                )
+            """),
+            {
+                "job_id": job_id,
+                "business_id": business_id,
+                "filename": str(filename or "")[:255],
+                "file_type": file_type,
+                "update_stock": 1 if update_stock else 0,
+                "default_category": default_category,
+                "file_host": import_job_file_host()
+            }
+        )
+
+
+def get_import_job(business_id, job_id):
+    with get_db() as db:
+        row = db.execute(
+            text("""
+                SELECT job_id, filename, status, update_stock, total_rows,
+                       rows_processed, imported, updated, skipped,
+                       duplicates_found, error_count, errors, last_error,
+                       created_at, started_at, finished_at
+                FROM import_jobs
+                WHERE job_id = :job_id
+                AND business_id = :business_id
+            """),
+            {"job_id": job_id, "business_id": business_id}
+        ).mappings().fetchone()
+
+    if not row:
+        return None
+
+    job = dict(row)
+    job["update_stock"] = bool(job["update_stock"])
+    job["errors"] = json.loads(job["errors"]) if job["errors"] else []
+    return job
+
+
+def fail_abandoned_jobs():
+    """
+    Jobs whose worker stopped reporting progress (process restarted) are
+    failed rather than rerun, since rerunning would add stock twice for the
+    rows that were already written.
+    """
+    with get_db() as db:
+        db.execute(
+            text("""
+                UPDATE import_jobs
+                SET status = 'failed',
+                    locked_by = NULL,
+                    last_error = 'Import interrupted, rows after rows_processed were not imported',
+                    finished_at = NOW()
+                WHERE status = 'running'
+                AND locked_at < NOW() - INTERVAL :lock_timeout SECOND
+            """),
+            {"lock_timeout": IMPORT_JOB_LOCK_TIMEOUT}
+        )
+
+
+def claim_job(worker_id):
+    """
+    Claim the oldest queued job for this worker whose file it can read:
+    jobs in the shared IMPORT_JOB_DIR, or uploaded to this host.
+    """
+    with get_db() as db:
+        db.execute(
+            text("""
+                UPDATE import_jobs
+                SET status = 'running',
+                    locked_by = :worker_id,
+                    locked_at = NOW(),
+                    started_at = NOW()
+                WHERE status = 'queued'
+                AND (file_host IS NULL OR file_host = :host)
+                ORDER BY created_at
+                LIMIT 1
+            """),
+            {"worker_id": worker_id, "host": socket.gethostname()}
+        )
+
+        row = db.execute(
+            text("""
+                SELECT job_id, business_id, filename, file_type,
+                       update_stock, default_category
+                FROM import_jobs
+                WHERE status = 'running'
+                AND locked_by = :worker_id
+                LIMIT 1
+            """),
+            {"worker_id": worker_id}
+        ).mappings().fetchone()
+
+    return dict(row) if row else None
+
+
+def report_progress(job_id, progress):
+    """Store the running totals of a job; also serves as the worker's heartbeat"""
+    with get_db() as db:
+        db.execute(
+            text("""
+                UPDATE import_jobs
+                SET total_rows = :total_rows,
+                    rows_processed = :rows_processed,
+                    imported = :imported,
+                    updated = :updated,
+                    skipped = :skipped,
+                    duplicates_found = :duplicates_found,
+                    error_count = :error_count,
+                    errors = :errors,
+                    locked_at = NOW()
+                WHERE job_id = :job_id
+            """),
+            {
+                "job_id": job_id,
+                "total_rows": progress.get("total_rows"),
+                "rows_processed": progress["rows_processed"],
+                "imported": progress["imported"],
+                "updated": progress["updated"],
+                "skipped": progress["skipped"],
+                "duplicates_found": progress["duplicates_found"],
+                "error_count": progress["error_count"],
+                "errors": json.dumps(progress["errors"][:IMPORT_JOB_MAX_ERRORS])
+            }
+        )
+
+
+def finish_job(job_id, status, last_error=None):
+    with get_db() as db:
+        db.execute(
+            text("""
+                UPDATE import_jobs
+                SET status = :status,
+                    locked_by = NULL,
+                    last_error = :last_error,
+                    finished_at = NOW()
+                WHERE job_id = :job_id
+            """),
+            {
+                "job_id": job_id,
+                "status": status,
+                "last_error": last_error[:1000] if last_error else None
+            }
+        )
+
+
+class ImportJobWorker(threading.Thread):
+    """
+    Background thread that runs queued spreadsheet imports.
+    process(job, path, report) imports the file at path and calls
+    report(progress) after every chunk with the running totals.
+    """
+
+    def __init__(self, index, process, poll_interval=IMPORT_JOB_POLL_INTERVAL):
+        super().__init__(name=f"import-job-worker-{index}", daemon=True)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+        self.process = process
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+
+    def run_once(self):
+        """Claim and run one job, returns whether there was one"""
+        fail_abandoned_jobs()
+
+        job = claim_job(self.worker_id)
+        if not job:
+            return False
+
+        path = import_job_path(job["job_id"], job["file_type"])
+
+        try:
+            self.process(job, path, lambda progress: report_progress(job["job_id"], progress))
+            finish_job(job["job_id"], "completed")
+
+        except Exception as e:
+            print(f"❌ Import job {job['job_id']} failed:", e)
+            traceback.print_exc()
+            finish_job(job["job_id"], "failed", str(e))
+
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        return True
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                handled = self.run_once()
+            except Exception as e:
+                print("❌ Import job worker error:", e)
+                traceback.print_exc()
+                handled = False
+
+            if not handled:
+                self.stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+import_job_workers = []
+import_job_workers_lock = threading.Lock()
+
+
+def start_import_job_workers(process, count=IMPORT_JOB_WORKERS):
+    """Start the worker pool once per process, count=0 disables it"""
+    with import_job_workers_lock:
+        if import_job_workers or count <= 0:
+            return import_job_workers
+
+        for index in range(count):
+            worker = ImportJobWorker(index, process)
+            worker.start()
+            import_job_workers.append(worker)
+
+    return import_job_workers
+
+
+def stop_import_job_workers():
+    with import_job_workers_lock:
+        for worker in import_job_workers:
+            worker.stop()
+        import_job_workers.clear()
@@ -0,0 +1,183 @@
+# kitchen_feed.py
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+
+from sqlalchemy import text
+
+from db import get_db
+
+KITCHEN_FEED_POLL_INTERVAL = float(os.getenv("KITCHEN_FEED_POLL_INTERVAL", 1))
+KITCHEN_FEED_HEARTBEAT = float(os.getenv("KITCHEN_FEED_HEARTBEAT", 15))
+KITCHEN_FEED_RETENTION_HOURS = int(os.getenv("KITCHEN_FEED_RETENTION_HOURS", 48))
+# Reconnecting streams missing more events than this get a fresh snapshot
+KITCHEN_FEED_RESUME_LIMIT = int(os.getenv("KITCHEN_FEED_RESUME_LIMIT", 1000))
+
+# Event ids can commit out of order, so the poller re-reads this many ids
+# behind the newest one it has seen and skips the ones already dispatched
+KITCHEN_FEED_REORDER_WINDOW = 200
+
+PRUNE_INTERVAL_SECONDS = 3600
+
+
+def record_kitchen_event(db, business_id, restaurant_order_id, event_type):
+    """
+    Append a kitchen event on the caller's session.
+    event_type is one of 'created', 'status', 'cancelled' or 'reopened'.
+    """
+    db.execute(
+        text("""
+            INSERT INTO kitchen_events (business_id, restaurant_order_id, event_type)
+            VALUES (:business_id, :restaurant_order_id, :event_type)
+        """),
+        {
+            "business_id": business_id,
+            "restaurant_order_id": restaurant_order_id,
+            "event_type": event_type
+        }
+    )
+    kitchen_hub.wake()
+
+
+def read_kitchen_events(db, business_id, after_event_id, limit=KITCHEN_FEED_RESUME_LIMIT):
+    """Events for one business after the given cursor, oldest first"""
+    rows = db.execute(
+        text("""
+            SELECT event_id, business_id, restaurant_order_id, event_type
+            FROM kitchen_events
+            WHERE business_id = :business_id
+            AND event_id > :after_event_id
+            ORDER BY event_id ASC
+            LIMIT :limit
+        """),
+        {
+            "business_id": business_id,
+            "after_event_id": after_event_id,
+            "limit": limit
+        }
+    ).mappings().fetchall()
+
+    return [dict(row) for row in rows]
+
+
+def oldest_kitchen_event_id(db):
+    return db.execute(text("SELECT MIN(event_id) FROM kitchen_events")).scalar()
+
+
+def latest_kitchen_event_id(db):
+    return int(db.execute(text("SELECT COALESCE(MAX(event_id), 0) FROM kitchen_events")).scalar())
+
+
+class KitchenEventHub:
+    """
+    Fans kitchen events out to the open streams of this process.
+    One poller thread reads new events for every business while at least
+    one stream is connected, so idle screens cost no queries of their own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.wake_event = threading.Event()
+        self.thread = None
+        self.last_event_id = None
+        self.recent_ids = deque(maxlen=KITCHEN_FEED_REORDER_WINDOW)
+        self.recent_id_set = set()
+        self.last_prune = 0
+
+    def subscribe(self, business_id):
+        subscriber = queue.Queue()
+
+        with self.lock:
+            self.subscribers.setdefault(str(business_id), set()).add(subscriber)
+
+            if not self.thread or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run,
+                    name="kitchen-feed-poller",
+                    daemon=True
+                )
+                self.thread.start()
+
+        return subscriber
+
+    def unsubscribe(self, business_id, subscriber):
+        with self.lock:
+            business_subscribers = self.subscribers.get(str(business_id))
+            if business_subscribers:
+                business_subscribers.discard(subscriber)
+                if not business_subscribers:
+                    del self.subscribers[str(business_id)]
+
+    def wake(self):
+        self.wake_event.set()
+
+    def remember(self, event_id):
+        if len(self.recent_ids) == self.recent_ids.maxlen:
+            self.recent_id_set.discard(self.recent_ids[0])
+        self.recent_ids.append(event_id)
+        self.recent_id_set.add(event_id)
+
+    def poll_once(self):
+        with get_db() as db:
+            if self.last_event_id is None:
+                # Streams drop anything at or below the cursor they already sent
+                self.last_event_id = latest_kitchen_event_id(db)
+
+            rows = db.execute(
+                text("""
+                    SELECT event_id, business_id, restaurant_order_id, event_type
+                    FROM kitchen_events
+                    WHERE event_id > :floor
+                    ORDER BY event_id ASC
+                    LIMIT 1000
+                """),
+                {"floor": max(self.last_event_id - KITCHEN_FEED_REORDER_WINDOW, 0)}
+            ).mappings().fetchall()
+
+            if time.time() - self.last_prune > PRUNE_INTERVAL_SECONDS:
+                db.execute(
+                    text("""
+                        DELETE FROM kitchen_events
+                        WHERE created_at < NOW() - INTERVAL :hours HOUR
+                    """),
+                    {"hours": KITCHEN_FEED_RETENTION_HOURS}
+                )
+                self.last_prune = time.time()
+
+        for row in rows:
+            event_id = row["event_id"]
+            if event_id in self.recent_id_set:
+                continue
+
+            self.remember(event_id)
+            self.last_event_id = max(self.last_event_id, event_id)
+
+            with self.lock:
+                business_subscribers = list(self.subscribers.get(str(row["business_id"]), ()))
+
+            for subscriber in business_subscribers:
+                subscriber.put(dict(row))
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    self.last_event_id = None
+                    return
+
+            try:
+                self.poll_once()
+            except Exception as e:
+                print("❌ Kitchen feed poll error:", e)
+                traceback.print_exc()
+
+            self.wake_event.wait(KITCHEN_FEED_POLL_INTERVAL)
+            self.wake_event.clear()
+
+
+kitchen_hub = KitchenEventHub()
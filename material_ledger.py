@@ -0,0 +1,336 @@
+# material_ledger.py
+"""
+Raw material movements and the running balance of every material.
+
+Every change to a material's stock is one material_movements row whose
+quantity is its effect on the stock on hand (negative when stock leaves):
+
+    supply       a supply lot delivered
+    production   supply lots drawn for, or returned from, product stock
+    consumption  recipe quantities of products sold (reversed on delete/edit)
+    wastage      spoiled or lost stock
+    adjustment   stock count corrections
+
+The same call upserts material_balances, so the inventory report reads one
+row per material instead of recomputing usage from every sale. All helpers
+run on the caller's session and commit with it.
+"""
+from decimal import Decimal
+
+from sqlalchemy import text
+
+MOVEMENT_TYPES = ("supply", "production", "consumption", "wastage", "adjustment")
+# Movements that change the supply lots, and with them the supplied totals
+LOT_MOVEMENT_TYPES = ("supply", "production")
+
+ZERO = Decimal("0")
+
+
+def to_decimal(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value or 0))
+
+
+def balance_deltas(movement):
+    """How one movement changes the columns of its material_balances row"""
+    quantity = to_decimal(movement["quantity"])
+    movement_type = movement["movement_type"]
+    deltas = {
+        "supplied_quantity": ZERO,
+        "supplied_cost": ZERO,
+        "used_quantity": ZERO,
+        "wasted_quantity": ZERO,
+        "balance": quantity
+    }
+
+    if movement_type in LOT_MOVEMENT_TYPES:
+        deltas["supplied_quantity"] = quantity
+        deltas["supplied_cost"] = quantity * to_decimal(movement.get("unit_cost"))
+    elif movement_type == "consumption":
+        deltas["used_quantity"] = -quantity
+    elif movement_type == "wastage":
+        deltas["wasted_quantity"] = -quantity
+
+    return deltas
+
+
+def record_material_movements(db, business_id, movements):
+    """
+    Append movements to the ledger and apply them to the balances.
+    Each movement is a dict with material_id, movement_type and quantity,
+    and optionally unit_cost, reference_type, reference_id and note.
+    """
+    rows = []
+    totals = {}
+
+    for movement in movements:
+        if movement["movement_type"] not in MOVEMENT_TYPES:
+            raise ValueError(f"Unknown material movement type {movement['movement_type']}")
+
+        if to_decimal(movement["quantity"]) == 0:
+            continue
+
+        rows.append({
+            "business_id": business_id,
+            "material_id": movement["material_id"],
+            "movement_type": movement["movement_type"],
+            "quantity": to_decimal(movement["quantity"]),
+            "unit_cost": movement.get("unit_cost"),
+            "reference_type": movement.get("reference_type"),
+            "reference_id": movement.get("reference_id"),
+            "note": movement.get("note")
+        })
+
+        material_totals = totals.setdefault(movement["material_id"], {})
+        for column, delta in balance_deltas(movement).items():
+            material_totals[column] = material_totals.get(column, ZERO) + delta
+
+    if not rows:
+        return
+
+    db.execute(
+        text("""
+            INSERT INTO material_movements (
+                business_id, material_id, movement_type, quantity,
+                unit_cost, reference_type, reference_id, note
+            )
+            VALUES (
+                :business_id, :material_id, :movement_type, :quantity,
+                :unit_cost, :reference_type, :reference_id, :note
+            )
+        """),
+        rows
+    )
+
+    # Materials in id order, so concurrent sales lock balance rows in the same order
+    values = []
+    params = {"business_id": business_id}
+
+    for i, material_id in enumerate(sorted(totals)):
+        values.append(
+            f"(:business_id, :material_id{i}, :supplied_quantity{i}, :supplied_cost{i}, "
+            f":used_quantity{i}, :wasted_quantity{i}, :balance{i})"
+        )
+        params[f"material_id{i}"] = material_id
+        for column, delta in totals[material_id].items():
+            params[f"{column}{i}"] = delta
+
+    db.execute(
+        text(f"""
+            INSERT INTO material_balances (
+                business_id, material_id, supplied_quantity, supplied_cost,
+                used_quantity, wasted_quantity, balance
+            )
+            VALUES {", ".join(values)}
+            ON DUPLICATE KEY UPDATE
+                supplied_quantity = supplied_quantity + VALUES(supplied_quantity),
+                supplied_cost = supplied_cost + VALUES(supplied_cost),
+                used_quantity = used_quantity + VALUES(used_quantity),
+                wasted_quantity = wasted_quantity + VALUES(wasted_quantity),
+                balance = balance + VALUES(balance)
+        """),
+        params
+    )
+
+
+def sale_id_params(sale_ids):
+    sale_ids = [sale_id for sale_id in sale_ids if sale_id]
+    placeholders = ",".join([f":sale_id{i}" for i in range(len(sale_ids))])
+    params = {f"sale_id{i}": sale_id for i, sale_id in enumerate(sale_ids)}
+    return placeholders, params
+
+
+def record_sale_consumption(db, business_id, sale_ids):
+    """Consume the recipe materials of the items of the given sales"""
+    placeholders, params = sale_id_params(sale_ids)
+    if not params:
+        return
+
+    params["business_id"] = business_id
+
+    rows = db.execute(
+        text(f"""
+            SELECT si.sale_id, pr.material_id, SUM(pr.quantity * si.quantity) AS used
+            FROM sales_items si
+            JOIN product_recipes pr ON pr.product_id = si.product_id
+            WHERE si.sale_id IN ({placeholders})
+            AND si.business_id = :business_id
+            GROUP BY si.sale_id, pr.material_id
+        """),
+        params
+    ).mappings().fetchall()
+
+    record_material_movements(db, business_id, [
+        {
+            "material_id": row["material_id"],
+            "movement_type": "consumption",
+            "quantity": -to_decimal(row["used"]),
+            "reference_type": "sale",
+            "reference_id": row["sale_id"]
+        }
+        for row in rows
+    ])
+
+
+def reverse_sale_consumption(db, business_id, sale_ids):
+    """
+    Give back what the given sales consumed, as recorded in the ledger, so
+    a recipe changed since the sale does not skew the balance.
+    """
+    placeholders, params = sale_id_params(sale_ids)
+    if not params:
+        return
+
+    params["business_id"] = business_id
+
+    rows = db.execute(
+        text(f"""
+            SELECT reference_id AS sale_id, material_id, SUM(quantity) AS consumed
+            FROM material_movements
+            WHERE business_id = :business_id
+            AND reference_type = 'sale'
+            AND reference_id IN ({placeholders})
+            AND movement_type = 'consumption'
+            GROUP BY reference_id, material_id
+        """),
+        params
+    ).mappings().fetchall()
+
+    record_material_movements(db, business_id, [
+        {
+            "material_id": row["material_id"],
+            "movement_type": "consumption",
+            "quantity": -to_decimal(row["consumed"]),
+            "reference_type": "sale",
+            "reference_id": row["sale_id"],
+            "note": "reversed"
+        }
+        for row in rows
+    ])
+
+
+def record_material_supply(db, business_id, supply_id, material_id, quantity, unit_price):
+    """Ledger entry for a newly delivered supply lot"""
+    record_material_movements(db, business_id, [{
+        "material_id": material_id,
+        "movement_type": "supply",
+        "quantity": quantity,
+        "unit_cost": unit_price,
+        "reference_type": "material_supply",
+        "reference_id": supply_id
+    }])
+
+
+def draw_material_supplies(db, business_id, material_id, quantity, reference_type=None, reference_id=None):
+    """
+    Take quantity from the material's supply lots, oldest first, and record
+    the draws. Returns the part that the lots could not cover.
+    """
+    remaining = to_decimal(quantity)
+
+    supplies = db.execute(
+        text("""
+            SELECT supply_id, quantity, unit_price
+            FROM material_supplies
+            WHERE material_id = :material_id
+            AND quantity > 0
+            AND business_id = :business_id
+            ORDER BY supply_date ASC
+            FOR UPDATE
+        """),
+        {
+            "material_id": material_id,
+            "business_id": business_id
+        }
+    ).fetchall()
+
+    movements = []
+
+    for supply_id, available_qty, unit_price in supplies:
+        if remaining <= 0:
+            break
+
+        deduct = min(to_decimal(available_qty), remaining)
+
+        db.execute(
+            text("""
+                UPDATE material_supplies
+                SET quantity = quantity - :deduct
+                WHERE supply_id = :supply_id
+            """),
+            {
+                "deduct": deduct,
+                "supply_id": supply_id
+            }
+        )
+
+        movements.append({
+            "material_id": material_id,
+            "movement_type": "production",
+            "quantity": -deduct,
+            "unit_cost": unit_price,
+            "reference_type": reference_type,
+            "reference_id": reference_id
+        })
+        remaining -= deduct
+
+    record_material_movements(db, business_id, movements)
+    return remaining
+
+
+def return_material_supplies(db, business_id, material_id, quantity, reference_type=None, reference_id=None):
+    """Put quantity back on the material's latest supply lot, or on a new lot when there is none"""
+    quantity = to_decimal(quantity)
+    if quantity <= 0:
+        return
+
+    recent_supply = db.execute(
+        text("""
+            SELECT supply_id, unit_price
+            FROM material_supplies
+            WHERE material_id = :material_id
+            AND business_id = :business_id
+            ORDER BY supply_date DESC
+            LIMIT 1
+        """),
+        {
+            "material_id": material_id,
+            "business_id": business_id
+        }
+    ).fetchone()
+
+    if recent_supply:
+        db.execute(
+            text("""
+                UPDATE material_supplies
+                SET quantity = quantity + :adjustment
+                WHERE supply_id = :supply_id
+            """),
+            {
+                "adjustment": quantity,
+                "supply_id": recent_supply[0]
+            }
+        )
+        unit_cost = recent_supply[1]
+    else:
+        db.execute(
+            text("""
+                INSERT INTO material_supplies
+                (material_id, quantity, supply_date, business_id)
+                VALUES (:material_id, :quantity, CURDATE(), :business_id)
+            """),
+            {
+                "material_id": material_id,
+                "quantity": quantity,
+                "business_id": business_id
+            }
+        )
+        unit_cost = None
+
+    record_material_movements(db, business_id, [{
+        "material_id": material_id,
+        "movement_type": "production",
+        "quantity": quantity,
+        "unit_cost": unit_cost,
+        "reference_type": reference_type,
+        "reference_id": reference_id
+    }])
@@ -0,0 +1,177 @@
+# migrate.py
+"""
+Apply the SQL files in migrations/ in order and record each one in
+schema_migrations.
+
+    python migrate.py                  apply pending migrations
+    python migrate.py status           list applied and pending migrations
+    python migrate.py baseline 007     mark migrations up to 007 as applied
+                                       without running them (databases that
+                                       were migrated by hand)
+"""
+import hashlib
+import os
+import re
+import sys
+
+from sqlalchemy import text
+
+from db import engine
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_[\w-]+\.sql$")
+
+
+def ensure_migrations_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(32) NOT NULL PRIMARY KEY,
+            filename VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def available_migrations():
+    """(version, filename, path) for every migration file, oldest first"""
+    migrations = []
+
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((match.group(1), filename, os.path.join(MIGRATIONS_DIR, filename)))
+
+    return migrations
+
+
+def applied_migrations(conn):
+    rows = conn.execute(text("SELECT version, checksum FROM schema_migrations")).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def file_checksum(path):
+    with open(path, "rb") as handle:
+        return hashlib.sha256(handle.read()).hexdigest()
+
+
+def split_statements(sql):
+    """Split a migration file into statements, dropping '--' comment lines"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = []
+    current = []
+
+    for line in lines:
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statement = "\n".join(current).strip().rstrip(";").strip()
+            if statement:
+                statements.append(statement)
+            current = []
+
+    remainder = "\n".join(current).strip()
+    if remainder:
+        statements.append(remainder)
+
+    return statements
+
+
+def record_migration(conn, version, filename, checksum):
+    conn.execute(
+        text("""
+            INSERT INTO schema_migrations (version, filename, checksum)
+            VALUES (:version, :filename, :checksum)
+        """),
+        {"version": version, "filename": filename, "checksum": checksum}
+    )
+
+
+def migrate():
+    with engine.connect() as conn:
+        ensure_migrations_table(conn)
+        conn.commit()
+        applied = applied_migrations(conn)
+
+        pending = [m for m in available_migrations() if m[0] not in applied]
+        if not pending:
+            print("✅ Database is up to date")
+            return 0
+
+        for version, filename, path in pending:
+            with open(path, encoding="utf-8") as handle:
+                statements = split_statements(handle.read())
+
+            print(f"📦 Applying {filename} ({len(statements)} statements)")
+
+            try:
+                # DB-API cursor without parameters, so '%' and ':' in the SQL are left alone
+                cursor = conn.connection.cursor()
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.close()
+
+                record_migration(conn, version, filename, file_checksum(path))
+                conn.commit()
+
+            except Exception as e:
+                # MySQL commits DDL implicitly, so a failed file may be half applied
+                conn.rollback()
+                print(f"❌ Migration {filename} failed:", e)
+                return 1
+
+        print(f"✅ Applied {len(pending)} migration(s)")
+        return 0
+
+
+def status():
+    with engine.connect() as conn:
+        ensure_migrations_table(conn)
+        conn.commit()
+        applied = applied_migrations(conn)
+
+    for version, filename, path in available_migrations():
+        if version not in applied:
+            state = "pending"
+        elif applied[version] != file_checksum(path):
+            state = "applied (file changed since)"
+        else:
+            state = "applied"
+
+        print(f"{filename:<45} {state}")
+
+    return 0
+
+
+def baseline(up_to_version):
+    with engine.connect() as conn:
+        ensure_migrations_table(conn)
+        applied = applied_migrations(conn)
+
+        for version, filename, path in available_migrations():
+            if int(version) > int(up_to_version):
+                break
+            if version not in applied:
+                record_migration(conn, version, filename, file_checksum(path))
+                print(f"📌 Marked {filename} as applied")
+
+        conn.commit()
+
+    return 0
+
+
+def main(argv):
+    if not argv:
+        return migrate()
+
+    if argv[0] == "status":
+        return status()
+
+    if argv[0] == "baseline" and len(argv) == 2:
+        return baseline(argv[1])
+
+    print(__doc__)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
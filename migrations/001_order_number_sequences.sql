@@ -0,0 +1,19 @@
+--
+-- Per-business order number sequence used by the order number allocator.
+-- Workers reserve blocks from next_value and hand numbers out from memory.
+--
+
+CREATE TABLE IF NOT EXISTS `order_number_sequences` (
+  `business_id` int(11) NOT NULL,
+  `next_value` bigint(20) NOT NULL DEFAULT 1,
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`business_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+--
+-- Order numbers are now unique per business rather than globally
+--
+
+ALTER TABLE `sales`
+  DROP INDEX IF EXISTS `order_number`,
+  ADD UNIQUE KEY IF NOT EXISTS `business_order_number` (`business_id`, `order_number`);
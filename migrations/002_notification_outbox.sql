@@ -0,0 +1,23 @@
+--
+-- Persistent outbox for emails delivered by the background workers in outbox.py
+--
+
+CREATE TABLE IF NOT EXISTS `notification_outbox` (
+  `outbox_id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `business_id` int(11) DEFAULT NULL,
+  `kind` varchar(50) NOT NULL,
+  `to_email` varchar(255) NOT NULL,
+  `subject` varchar(255) DEFAULT NULL,
+  `message` longblob NOT NULL,
+  `status` enum('queued','sending','sent','failed') NOT NULL DEFAULT 'queued',
+  `attempts` int(11) NOT NULL DEFAULT 0,
+  `next_attempt_at` datetime NOT NULL DEFAULT current_timestamp(),
+  `locked_by` varchar(100) DEFAULT NULL,
+  `locked_at` datetime DEFAULT NULL,
+  `last_error` text DEFAULT NULL,
+  `sent_at` datetime DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`outbox_id`),
+  KEY `status_next_attempt` (`status`, `next_attempt_at`),
+  KEY `locked_by` (`locked_by`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,15 @@
+--
+-- Append-only kitchen event log behind the /restaurant/kitchen-stream feed.
+-- event_id doubles as the resumable cursor sent to kitchen screens.
+--
+
+CREATE TABLE IF NOT EXISTS `kitchen_events` (
+  `event_id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `business_id` int(11) NOT NULL,
+  `restaurant_order_id` int(11) NOT NULL,
+  `event_type` enum('created','status','cancelled','reopened') NOT NULL,
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`event_id`),
+  KEY `business_event` (`business_id`, `event_id`),
+  KEY `created_at` (`created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
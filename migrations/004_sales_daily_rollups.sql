@@ -0,0 +1,38 @@
+--
+-- Per-business daily totals of completed sales behind /sales-data.
+-- Kept current by apply_sale_rollup() in the transaction that writes a sale.
+--
+
+CREATE TABLE IF NOT EXISTS `sales_daily_rollups` (
+  `business_id` int(11) NOT NULL,
+  `sale_day` date NOT NULL,
+  `total_sales` decimal(14,2) NOT NULL DEFAULT 0.00,
+  `order_count` int(11) NOT NULL DEFAULT 0,
+  `profit` decimal(14,2) NOT NULL DEFAULT 0.00,
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`business_id`, `sale_day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+--
+-- Backfill from existing history
+--
+
+INSERT INTO `sales_daily_rollups` (`business_id`, `sale_day`, `total_sales`, `order_count`, `profit`)
+SELECT
+  s.business_id,
+  DATE(s.sale_date),
+  SUM(s.total_price),
+  COUNT(*),
+  COALESCE(SUM(sp.profit), 0)
+FROM `sales` s
+LEFT JOIN (
+  SELECT sale_id, SUM(profit) AS profit
+  FROM `sales_items`
+  GROUP BY sale_id
+) sp ON sp.sale_id = s.sale_id
+WHERE s.status = 'completed'
+GROUP BY s.business_id, DATE(s.sale_date)
+ON DUPLICATE KEY UPDATE
+  total_sales = VALUES(total_sales),
+  order_count = VALUES(order_count),
+  profit = VALUES(profit);
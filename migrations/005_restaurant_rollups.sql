@@ -0,0 +1,74 @@
+--
+-- Per-business restaurant aggregates behind /restaurant/dashboard-data.
+-- Kept current by apply_restaurant_order_rollup() whenever an order enters
+-- or leaves the completed state.
+--
+
+CREATE TABLE IF NOT EXISTS `restaurant_daily_rollups` (
+  `business_id` int(11) NOT NULL,
+  `sale_day` date NOT NULL,
+  `total_sales` decimal(14,2) NOT NULL DEFAULT 0.00,
+  `order_count` int(11) NOT NULL DEFAULT 0,
+  `profit` decimal(14,2) NOT NULL DEFAULT 0.00,
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`business_id`, `sale_day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE IF NOT EXISTS `restaurant_product_rollups` (
+  `business_id` int(11) NOT NULL,
+  `product_id` int(11) NOT NULL,
+  `product_name` varchar(255) DEFAULT NULL,
+  `quantity_sold` decimal(14,2) NOT NULL DEFAULT 0.00,
+  `total_sales` decimal(14,2) NOT NULL DEFAULT 0.00,
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`business_id`, `product_id`),
+  KEY `idx_restaurant_product_rollups_qty` (`business_id`, `quantity_sold`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+--
+-- Backfill from existing completed orders
+--
+
+INSERT INTO `restaurant_daily_rollups` (`business_id`, `sale_day`, `total_sales`, `order_count`, `profit`)
+SELECT
+  ro.business_id,
+  DATE(ro.created_at),
+  SUM(COALESCE(ro.total_price, 0)),
+  COUNT(*),
+  SUM(CASE
+    WHEN ro.payment_type IS NOT NULL AND ro.payment_type != ''
+    THEN COALESCE(rp.profit, 0)
+    ELSE 0
+  END)
+FROM `restaurant_orders` ro
+LEFT JOIN (
+  SELECT restaurant_order_id, business_id, SUM(profit) AS profit
+  FROM `restaurant_order_items`
+  GROUP BY restaurant_order_id, business_id
+) rp ON rp.restaurant_order_id = ro.restaurant_order_id
+    AND rp.business_id = ro.business_id
+WHERE ro.order_status = 'completed'
+GROUP BY ro.business_id, DATE(ro.created_at)
+ON DUPLICATE KEY UPDATE
+  total_sales = VALUES(total_sales),
+  order_count = VALUES(order_count),
+  profit = VALUES(profit);
+
+INSERT INTO `restaurant_product_rollups` (`business_id`, `product_id`, `product_name`, `quantity_sold`, `total_sales`)
+SELECT
+  roi.business_id,
+  roi.product_id,
+  MAX(roi.product_name),
+  SUM(roi.quantity),
+  SUM(roi.subtotal)
+FROM `restaurant_order_items` roi
+JOIN `restaurant_orders` ro
+  ON ro.restaurant_order_id = roi.restaurant_order_id
+  AND ro.business_id = roi.business_id
+WHERE ro.order_status = 'completed'
+AND roi.product_id IS NOT NULL
+GROUP BY roi.business_id, roi.product_id
+ON DUPLICATE KEY UPDATE
+  product_name = VALUES(product_name),
+  quantity_sold = VALUES(quantity_sold),
+  total_sales = VALUES(total_sales);
@@ -0,0 +1,22 @@
+--
+-- Per-business catalogue version and change log behind /catalogue-changes.
+-- Written by record_catalogue_changes() whenever a product, bundle or
+-- product stock changes. One row per item, deletes are kept as tombstones.
+--
+
+CREATE TABLE IF NOT EXISTS `catalogue_versions` (
+  `business_id` int(11) NOT NULL,
+  `version` bigint(20) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`business_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE IF NOT EXISTS `catalogue_changes` (
+  `business_id` int(11) NOT NULL,
+  `entity_type` enum('product','bundle') NOT NULL,
+  `entity_id` int(11) NOT NULL,
+  `version` bigint(20) NOT NULL,
+  `change_type` enum('upsert','delete') NOT NULL DEFAULT 'upsert',
+  `changed_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`business_id`, `entity_type`, `entity_id`),
+  KEY `idx_catalogue_changes_version` (`business_id`, `version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,7 @@
+--
+-- Index behind /product-by-barcode misses: scans look products up by
+-- business and product_number.
+--
+
+ALTER TABLE `products`
+  ADD KEY IF NOT EXISTS `idx_products_business_barcode` (`business_id`, `product_number`(100));
@@ -0,0 +1,47 @@
+--
+-- Composite indexes for the hot tenant-scoped queries. Almost every query
+-- filters on business_id plus a date, status or parent id.
+-- benchmarks/check_query_plans.py runs EXPLAIN on those queries and fails
+-- when one of them falls back to a full scan.
+--
+
+ALTER TABLE `sales`
+  ADD KEY IF NOT EXISTS `idx_sales_business_status_date` (`business_id`, `status`, `sale_date`),
+  ADD KEY IF NOT EXISTS `idx_sales_business_date` (`business_id`, `sale_date`),
+  ADD KEY IF NOT EXISTS `idx_sales_invoice` (`invoice_id`);
+
+ALTER TABLE `sales_items`
+  ADD KEY IF NOT EXISTS `idx_sales_items_sale_business` (`sale_id`, `business_id`),
+  ADD KEY IF NOT EXISTS `idx_sales_items_business_product` (`business_id`, `product_id`);
+
+ALTER TABLE `products`
+  ADD KEY IF NOT EXISTS `idx_products_business_deleted_created` (`business_id`, `deleted_at`, `created_at`);
+
+ALTER TABLE `product_bundles`
+  ADD KEY IF NOT EXISTS `idx_product_bundles_business_bundle` (`business_id`, `deleted_at`, `bundle_id`),
+  ADD KEY IF NOT EXISTS `idx_product_bundles_business_child` (`business_id`, `child_product_id`);
+
+ALTER TABLE `customers`
+  ADD KEY IF NOT EXISTS `idx_customers_business` (`business_id`);
+
+ALTER TABLE `supplier_products`
+  ADD KEY IF NOT EXISTS `idx_supplier_products_business_supplier` (`business_id`, `supplier_id`);
+
+ALTER TABLE `expenses`
+  ADD KEY IF NOT EXISTS `idx_expenses_business_date` (`business_id`, `expense_date`);
+
+ALTER TABLE `invoices`
+  ADD KEY IF NOT EXISTS `idx_invoices_business_created` (`business_id`, `created_at`, `invoice_id`);
+
+ALTER TABLE `invoice_items`
+  ADD KEY IF NOT EXISTS `idx_invoice_items_invoice_business` (`invoice_id`, `business_id`);
+
+ALTER TABLE `restaurant_orders`
+  ADD KEY IF NOT EXISTS `idx_restaurant_orders_business_kitchen_created` (`business_id`, `kitchen_status`, `created_at`),
+  ADD KEY IF NOT EXISTS `idx_restaurant_orders_business_created` (`business_id`, `created_at`);
+
+ALTER TABLE `restaurant_order_items`
+  ADD KEY IF NOT EXISTS `idx_restaurant_order_items_order_business` (`restaurant_order_id`, `business_id`);
+
+ALTER TABLE `restaurant_order_item_addons`
+  ADD KEY IF NOT EXISTS `idx_restaurant_order_item_addons_item` (`restaurant_order_item_id`);
@@ -0,0 +1,44 @@
+--
+-- Change tracking for sync.py: every replicated table carries updated_at,
+-- with an index matching the (updated_at, key) order rows are shipped in.
+--
+
+ALTER TABLE `users`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_users_sync` (`updated_at`, `user_id`);
+
+ALTER TABLE `customers`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_customers_sync` (`updated_at`, `customer_id`);
+
+ALTER TABLE `categories`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_categories_sync` (`updated_at`, `category_id`);
+
+ALTER TABLE `products`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_products_sync` (`updated_at`, `product_id`);
+
+ALTER TABLE `product_bundles`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_product_bundles_sync` (`updated_at`, `bundle_id`, `child_product_id`);
+
+ALTER TABLE `raw_materials`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_raw_materials_sync` (`updated_at`, `material_id`);
+
+ALTER TABLE `product_recipes`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_product_recipes_sync` (`updated_at`, `recipe_id`);
+
+ALTER TABLE `material_supplies`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_material_supplies_sync` (`updated_at`, `supply_id`);
+
+ALTER TABLE `suppliers`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_suppliers_sync` (`updated_at`, `supplier_id`);
+
+ALTER TABLE `supplier_products`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_supplier_products_sync` (`updated_at`, `supplier_product_id`);
@@ -0,0 +1,33 @@
+--
+-- Spreadsheet imports run in the background by the workers in import_jobs.py.
+-- The upload waits in IMPORT_JOB_DIR until a worker streams it in chunks;
+-- progress columns are updated after every chunk.
+--
+
+CREATE TABLE IF NOT EXISTS `import_jobs` (
+  `job_id` char(32) NOT NULL,
+  `business_id` int(11) NOT NULL,
+  `filename` varchar(255) DEFAULT NULL,
+  `file_type` varchar(10) NOT NULL,
+  `update_stock` tinyint(1) NOT NULL DEFAULT 0,
+  `default_category` varchar(255) DEFAULT NULL,
+  `status` enum('queued','running','completed','failed') NOT NULL DEFAULT 'queued',
+  `total_rows` int(11) DEFAULT NULL,
+  `rows_processed` int(11) NOT NULL DEFAULT 0,
+  `imported` int(11) NOT NULL DEFAULT 0,
+  `updated` int(11) NOT NULL DEFAULT 0,
+  `skipped` int(11) NOT NULL DEFAULT 0,
+  `duplicates_found` int(11) NOT NULL DEFAULT 0,
+  `error_count` int(11) NOT NULL DEFAULT 0,
+  `errors` mediumtext DEFAULT NULL,
+  `last_error` text DEFAULT NULL,
+  `locked_by` varchar(100) DEFAULT NULL,
+  `locked_at` datetime DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  `started_at` datetime DEFAULT NULL,
+  `finished_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`job_id`),
+  KEY `idx_import_jobs_business` (`business_id`, `created_at`),
+  KEY `idx_import_jobs_status` (`status`, `created_at`),
+  KEY `locked_by` (`locked_by`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,8 @@
+--
+-- The business profile cache in app.py polls businesses.updated_at to drop
+-- profiles changed by other workers; every UPDATE of businesses sets it.
+--
+
+ALTER TABLE `businesses`
+  ADD COLUMN IF NOT EXISTS `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  ADD KEY IF NOT EXISTS `idx_businesses_updated_at` (`updated_at`);
@@ -0,0 +1,28 @@
+--
+-- STK push payments sent by stk_payments.py. A row is queued when the till
+-- asks for a push, 'sent' once the gateway accepts it and settles as
+-- 'completed' or 'failed' from the gateway's callback.
+--
+
+CREATE TABLE IF NOT EXISTS `stk_payments` (
+  `payment_id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `business_id` int(11) NOT NULL,
+  `reference` varchar(32) NOT NULL,
+  `callback_token` varchar(64) NOT NULL,
+  `phone` varchar(20) NOT NULL,
+  `amount` decimal(12,2) NOT NULL,
+  `status` enum('queued','sent','completed','failed') NOT NULL DEFAULT 'queued',
+  `gateway_status_code` int(11) DEFAULT NULL,
+  `gateway_response` text DEFAULT NULL,
+  `result_code` varchar(20) DEFAULT NULL,
+  `result_desc` varchar(255) DEFAULT NULL,
+  `mpesa_receipt` varchar(64) DEFAULT NULL,
+  `callback_payload` text DEFAULT NULL,
+  `last_error` text DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  `completed_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`payment_id`),
+  UNIQUE KEY `uniq_stk_payments_reference` (`reference`),
+  KEY `idx_stk_payments_business` (`business_id`, `created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
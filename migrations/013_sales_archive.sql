@@ -0,0 +1,34 @@
+--
+-- Archive tier for sales and sales_items, filled by sales_archive.py.
+-- The archive tables are created LIKE the hot ones and are read together
+-- with them through UNION ALL, so any later change to sales or sales_items
+-- has to be applied to its archive table in the same migration. Archived
+-- sales are read-only.
+--
+
+CREATE TABLE IF NOT EXISTS `sales_archive` LIKE `sales`;
+
+CREATE TABLE IF NOT EXISTS `sales_items_archive` LIKE `sales_items`;
+
+-- Single row: sales before archived_before may be archived,
+-- hot tables hold nothing before hot_since
+CREATE TABLE IF NOT EXISTS `sales_archive_state` (
+  `id` tinyint(4) NOT NULL,
+  `archived_before` datetime DEFAULT NULL,
+  `hot_since` datetime DEFAULT NULL,
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- All-time quantities of archived sale items per product, so stock and
+-- material usage reports do not have to scan the archive
+CREATE TABLE IF NOT EXISTS `sales_items_archive_totals` (
+  `business_id` int(11) NOT NULL,
+  `product_id` int(11) NOT NULL,
+  `quantity` decimal(14,2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`business_id`, `product_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- The archiver walks sales by date across all businesses
+ALTER TABLE `sales`
+  ADD KEY IF NOT EXISTS `idx_sales_sale_date` (`sale_date`, `sale_id`);
@@ -0,0 +1,113 @@
+--
+-- Raw material ledger behind /api/v1/material-inventory.
+-- material_movements records every stock change of a material and
+-- material_balances keeps its running totals, both written by
+-- material_ledger.py in the same transaction as the change itself.
+--
+
+CREATE TABLE IF NOT EXISTS `material_movements` (
+  `movement_id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `business_id` int(11) NOT NULL,
+  `material_id` int(11) NOT NULL,
+  `movement_type` enum('supply','production','consumption','wastage','adjustment') NOT NULL,
+  `quantity` decimal(14,4) NOT NULL,
+  `unit_cost` decimal(10,2) DEFAULT NULL,
+  `reference_type` varchar(32) DEFAULT NULL,
+  `reference_id` int(11) DEFAULT NULL,
+  `note` varchar(255) DEFAULT NULL,
+  `created_at` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`movement_id`),
+  KEY `idx_material_movements_material` (`business_id`, `material_id`, `created_at`),
+  KEY `idx_material_movements_reference` (`business_id`, `reference_type`, `reference_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE IF NOT EXISTS `material_balances` (
+  `business_id` int(11) NOT NULL,
+  `material_id` int(11) NOT NULL,
+  `supplied_quantity` decimal(14,4) NOT NULL DEFAULT 0,
+  `supplied_cost` decimal(16,4) NOT NULL DEFAULT 0,
+  `used_quantity` decimal(14,4) NOT NULL DEFAULT 0,
+  `wasted_quantity` decimal(14,4) NOT NULL DEFAULT 0,
+  `balance` decimal(14,4) NOT NULL DEFAULT 0,
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`business_id`, `material_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+--
+-- Opening ledger from existing history: what is left of every supply lot,
+-- the recipe materials of every sale, and the archived sales' totals
+--
+
+INSERT INTO `material_movements` (
+  `business_id`, `material_id`, `movement_type`, `quantity`, `unit_cost`,
+  `reference_type`, `reference_id`, `note`, `created_at`
+)
+SELECT
+  ms.business_id,
+  ms.material_id,
+  'supply',
+  ms.quantity,
+  ms.unit_price,
+  'material_supply',
+  ms.supply_id,
+  'opening balance',
+  COALESCE(ms.supply_date, NOW())
+FROM `material_supplies` ms
+WHERE ms.quantity != 0;
+
+INSERT INTO `material_movements` (
+  `business_id`, `material_id`, `movement_type`, `quantity`,
+  `reference_type`, `reference_id`, `note`, `created_at`
+)
+SELECT
+  si.business_id,
+  pr.material_id,
+  'consumption',
+  -SUM(pr.quantity * si.quantity),
+  'sale',
+  si.sale_id,
+  'opening balance',
+  MAX(s.sale_date)
+FROM `sales_items` si
+JOIN `product_recipes` pr ON pr.product_id = si.product_id
+JOIN `sales` s ON s.sale_id = si.sale_id
+GROUP BY si.business_id, si.sale_id, pr.material_id
+HAVING SUM(pr.quantity * si.quantity) != 0;
+
+INSERT INTO `material_movements` (
+  `business_id`, `material_id`, `movement_type`, `quantity`,
+  `reference_type`, `reference_id`, `note`
+)
+SELECT
+  sat.business_id,
+  pr.material_id,
+  'consumption',
+  -SUM(pr.quantity * sat.quantity),
+  'sales_archive',
+  NULL,
+  'opening balance'
+FROM `sales_items_archive_totals` sat
+JOIN `product_recipes` pr ON pr.product_id = sat.product_id
+GROUP BY sat.business_id, pr.material_id
+HAVING SUM(pr.quantity * sat.quantity) != 0;
+
+INSERT INTO `material_balances` (
+  `business_id`, `material_id`, `supplied_quantity`, `supplied_cost`,
+  `used_quantity`, `wasted_quantity`, `balance`
+)
+SELECT
+  mm.business_id,
+  mm.material_id,
+  SUM(CASE WHEN mm.movement_type IN ('supply', 'production') THEN mm.quantity ELSE 0 END),
+  SUM(CASE WHEN mm.movement_type IN ('supply', 'production') THEN mm.quantity * COALESCE(mm.unit_cost, 0) ELSE 0 END),
+  SUM(CASE WHEN mm.movement_type = 'consumption' THEN -mm.quantity ELSE 0 END),
+  SUM(CASE WHEN mm.movement_type = 'wastage' THEN -mm.quantity ELSE 0 END),
+  SUM(mm.quantity)
+FROM `material_movements` mm
+GROUP BY mm.business_id, mm.material_id
+ON DUPLICATE KEY UPDATE
+  supplied_quantity = VALUES(supplied_quantity),
+  supplied_cost = VALUES(supplied_cost),
+  used_quantity = VALUES(used_quantity),
+  wasted_quantity = VALUES(wasted_quantity),
+  balance = VALUES(balance);
@@ -0,0 +1,8 @@
+--
+-- Sequence order numbers move to their own ORS prefix. The sequences were
+-- seeded past the random legacy ORD numbers and would soon run over six
+-- digits, so they are cleared and reseeded from existing ORS numbers on
+-- the next reservation.
+--
+
+DELETE FROM `order_number_sequences`;
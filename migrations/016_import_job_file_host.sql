@@ -0,0 +1,9 @@
+--
+-- Uploads kept in a per-host temp directory can only be imported on the
+-- host that received them. file_host records that host so claim_job() in
+-- import_jobs.py leaves the job to it; NULL means IMPORT_JOB_DIR is shared
+-- and any worker may claim the job.
+--
+
+ALTER TABLE `import_jobs`
+  ADD COLUMN IF NOT EXISTS `file_host` varchar(255) DEFAULT NULL AFTER `default_category`;
@@ -0,0 +1,289 @@
+# outbox.py
+import os
+import socket
+import smtplib
+import ssl
+import threading
+import traceback
+from email import message_from_bytes
+
+from sqlalchemy import text
+
+from db import get_db
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", 2))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 20))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 2))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 6))
+OUTBOX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_BACKOFF_SECONDS", 30))
+OUTBOX_MAX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", 3600))
+OUTBOX_LOCK_TIMEOUT = int(os.getenv("OUTBOX_LOCK_TIMEOUT", 300))
+
+
+def enqueue_email(db, to_email, msg, kind, business_id=None):
+    """
+    Store a ready-to-send message in the outbox.
+    Runs on the caller's session so the message is only queued if the
+    surrounding transaction commits.
+    """
+    db.execute(
+        text("""
+            INSERT INTO notification_outbox (
+                business_id, kind, to_email, subject, message,
+                status, attempts, next_attempt_at
+            )
+            VALUES (
+                :business_id, :kind, :to_email, :subject, :message,
+                'queued', 0, NOW()
+            )
+        """),
+        {
+            "business_id": business_id,
+            "kind": kind,
+            "to_email": to_email,
+            "subject": str(msg["Subject"] or "")[:255],
+            "message": msg.as_bytes()
+        }
+    )
+
+
+def smtp_settings():
+    """SMTP settings read from the environment on every batch"""
+    return {
+        "host": os.getenv("EMAIL_HOST"),
+        "port": int(os.getenv("EMAIL_PORT", 465)),
+        "user": os.getenv("EMAIL_USER"),
+        "password": os.getenv("EMAIL_PASSWORD"),
+        "use_ssl": os.getenv("EMAIL_USE_SSL", "1") != "0",
+        "use_starttls": os.getenv("EMAIL_USE_STARTTLS", "0") == "1",
+    }
+
+
+def open_smtp_connection(settings):
+    """Open and authenticate one SMTP connection for a whole batch"""
+    if not settings["host"]:
+        raise RuntimeError("Email settings missing: EMAIL_HOST")
+
+    if settings["use_ssl"]:
+        server = smtplib.SMTP_SSL(
+            settings["host"],
+            settings["port"],
+            context=ssl.create_default_context(),
+            timeout=30
+        )
+    else:
+        server = smtplib.SMTP(settings["host"], settings["port"], timeout=30)
+        if settings["use_starttls"]:
+            server.starttls(context=ssl.create_default_context())
+
+    if settings["user"] and settings["password"]:
+        server.login(settings["user"], settings["password"])
+
+    return server
+
+
+def backoff_delay(attempts):
+    """Exponential backoff in seconds after the given number of failed attempts"""
+    return min(
+        OUTBOX_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)),
+        OUTBOX_MAX_BACKOFF_SECONDS
+    )
+
+
+def claim_batch(worker_id, batch_size=OUTBOX_BATCH_SIZE):
+    """
+    Claim due messages for this worker.
+    Messages left in 'sending' by a crashed worker are reclaimed after
+    OUTBOX_LOCK_TIMEOUT seconds.
+    """
+    with get_db() as db:
+        db.execute(
+            text("""
+                UPDATE notification_outbox
+                SET status = 'sending',
+                    locked_by = :worker_id,
+                    locked_at = NOW()
+                WHERE (status = 'queued' AND next_attempt_at <= NOW())
+                OR (
+                    status = 'sending'
+                    AND locked_at < NOW() - INTERVAL :lock_timeout SECOND
+                )
+                ORDER BY outbox_id
+                LIMIT :batch_size
+            """),
+            {
+                "worker_id": worker_id,
+                "lock_timeout": OUTBOX_LOCK_TIMEOUT,
+                "batch_size": batch_size
+            }
+        )
+
+        rows = db.execute(
+            text("""
+                SELECT outbox_id, to_email, message, attempts
+                FROM notification_outbox
+                WHERE status = 'sending'
+                AND locked_by = :worker_id
+                ORDER BY outbox_id
+            """),
+            {"worker_id": worker_id}
+        ).mappings().fetchall()
+
+    return [dict(row) for row in rows]
+
+
+def deliver_batch(rows, settings, connect=open_smtp_connection):
+    """
+    Send a batch of outbox rows over a single SMTP connection.
+    Returns (sent_ids, failures) where failures is a list of (row, error).
+    """
+    try:
+        server = connect(settings)
+    except Exception as e:
+        return [], [(row, str(e)) for row in rows]
+
+    sent_ids = []
+    failures = []
+
+    try:
+        for index, row in enumerate(rows):
+            try:
+                msg = message_from_bytes(bytes(row["message"]))
+                server.send_message(msg, to_addrs=[row["to_email"]])
+                sent_ids.append(row["outbox_id"])
+
+            except smtplib.SMTPServerDisconnected as e:
+                # The connection is gone, the rest of the batch is retried later
+                failures.extend((pending, str(e)) for pending in rows[index:])
+                break
+
+            except Exception as e:
+                failures.append((row, str(e)))
+
+    finally:
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+    return sent_ids, failures
+
+
+def mark_sent(outbox_ids):
+    if not outbox_ids:
+        return
+
+    placeholders = ",".join([f":id{i}" for i in range(len(outbox_ids))])
+    params = {f"id{i}": outbox_id for i, outbox_id in enumerate(outbox_ids)}
+
+    with get_db() as db:
+        db.execute(
+            text(f"""
+                UPDATE notification_outbox
+                SET status = 'sent',
+                    sent_at = NOW(),
+                    locked_by = NULL,
+                    locked_at = NULL,
+                    last_error = NULL
+                WHERE outbox_id IN ({placeholders})
+            """),
+            params
+        )
+
+
+def mark_failed(failures):
+    """Schedule failed messages for retry, or give up after OUTBOX_MAX_ATTEMPTS"""
+    if not failures:
+        return
+
+    with get_db() as db:
+        for row, error in failures:
+            attempts = int(row["attempts"] or 0) + 1
+
+            db.execute(
+                text("""
+                    UPDATE notification_outbox
+                    SET status = :status,
+                        attempts = :attempts,
+                        next_attempt_at = NOW() + INTERVAL :delay SECOND,
+                        locked_by = NULL,
+                        locked_at = NULL,
+                        last_error = :last_error
+                    WHERE outbox_id = :outbox_id
+                """),
+                {
+                    "status": "failed" if attempts >= OUTBOX_MAX_ATTEMPTS else "queued",
+                    "attempts": attempts,
+                    "delay": backoff_delay(attempts),
+                    "last_error": error[:1000],
+                    "outbox_id": row["outbox_id"]
+                }
+            )
+
+
+class OutboxWorker(threading.Thread):
+    """Background thread that drains the notification outbox"""
+
+    def __init__(self, index, connect=open_smtp_connection,
+                 poll_interval=OUTBOX_POLL_INTERVAL, batch_size=OUTBOX_BATCH_SIZE):
+        super().__init__(name=f"outbox-worker-{index}", daemon=True)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+        self.connect = connect
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.stop_event = threading.Event()
+
+    def run_once(self):
+        """Claim and deliver one batch, returns the number of messages handled"""
+        rows = claim_batch(self.worker_id, self.batch_size)
+        if not rows:
+            return 0
+
+        sent_ids, failures = deliver_batch(rows, smtp_settings(), self.connect)
+        mark_sent(sent_ids)
+        mark_failed(failures)
+
+        if failures:
+            print(f"⚠ Outbox: {len(failures)} message(s) scheduled for retry")
+
+        return len(rows)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                handled = self.run_once()
+            except Exception as e:
+                print("❌ Outbox worker error:", e)
+                traceback.print_exc()
+                handled = 0
+
+            if not handled:
+                self.stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+outbox_workers = []
+outbox_workers_lock = threading.Lock()
+
+
+def start_outbox_workers(count=OUTBOX_WORKERS, connect=open_smtp_connection):
+    """Start the worker pool once per process, count=0 disables it"""
+    with outbox_workers_lock:
+        if outbox_workers or count <= 0:
+            return outbox_workers
+
+        for index in range(count):
+            worker = OutboxWorker(index, connect=connect)
+            worker.start()
+            outbox_workers.append(worker)
+
+    return outbox_workers
+
+
+def stop_outbox_workers():
+    with outbox_workers_lock:
+        for worker in outbox_workers:
+            worker.stop()
+        outbox_workers.clear()
@@ -1,11 +1,16 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import axios from "axios";
 import "./styles/InvoicesPage.css";
 import { ToastContainer, toast } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
 
+// Typing pauses this long before the search goes to the server
+const INVOICE_SEARCH_DELAY_MS = 300;
+
 const InvoicesPage = () => {
   const [invoices, setInvoices] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMoreInvoices, setLoadingMoreInvoices] = useState(false);
   const [customers, setCustomers] = useState([]);
   const [showModal, setShowModal] = useState(false);
   const [editingInvoice, setEditingInvoice] = useState(null);
@@ -47,16 +52,50 @@ const InvoicesPage = () => {
     }
   };
 
+  // Search runs on the server, so it also covers pages not loaded yet
+  const invoiceSearchParams = () => {
+    const search = invoiceSearch.trim();
+    return search ? { search } : {};
+  };
+
+  // Only the latest request may fill the list, older searches can answer late
+  const invoiceRequestRef = useRef(0);
+
   const fetchInvoices = async () => {
+    const request = ++invoiceRequestRef.current;
     try {
-      const res = await axios.get("/get-invoices");
+      const res = await axios.get("/get-invoices", {
+        params: invoiceSearchParams(),
+      });
+      if (request !== invoiceRequestRef.current) return;
       setInvoices(res.data.invoices || []);
+      setNextCursor(res.data.next_cursor || null);
       setCompanyDetails(res.data.company || {});
     } catch {
       toast.error("Error loading invoices.");
     }
   };
 
+  // Older pages are only fetched when asked for
+  const loadMoreInvoices = async () => {
+    if (!nextCursor || loadingMoreInvoices) return;
+
+    const request = invoiceRequestRef.current;
+    setLoadingMoreInvoices(true);
+    try {
+      const res = await axios.get("/get-invoices", {
+        params: { ...invoiceSearchParams(), cursor: nextCursor },
+      });
+      if (request !== invoiceRequestRef.current) return;
+      setInvoices((loaded) => [...loaded, ...(res.data.invoices || [])]);
+      setNextCursor(res.data.next_cursor || null);
+    } catch {
+      toast.error("Error loading more invoices.");
+    } finally {
+      setLoadingMoreInvoices(false);
+    }
+  };
+
   const fetchCustomers = async () => {
     try {
       const res = await axios.get(`/get-sales-customers?t=${Date.now()}`);
@@ -85,11 +124,18 @@ const InvoicesPage = () => {
   };
 
   useEffect(() => {
-    fetchInvoices();
     fetchCustomers();
     fetchSalesProducts();
   }, []);
 
+  useEffect(() => {
+    const timer = setTimeout(
+      fetchInvoices,
+      invoiceSearch ? INVOICE_SEARCH_DELAY_MS : 0,
+    );
+    return () => clearTimeout(timer);
+  }, [invoiceSearch]);
+
   const resetForm = () => {
     setFormData({
       customer_id: "",
@@ -302,18 +348,6 @@ const InvoicesPage = () => {
     }
   };
 
-  const filteredInvoices = invoices.filter((invoice) => {
-    const query = invoiceSearch.toLowerCase();
-
-    return (
-      invoice.invoice_number?.toLowerCase().includes(query) ||
-      invoice.customer_name?.toLowerCase().includes(query) ||
-      invoice.status?.toLowerCase().includes(query) ||
-      String(invoice.total_amount || "").includes(query) ||
-      String(invoice.balance_due || "").includes(query)
-    );
-  });
-
   const updateStatus = async (invoice_id, status) => {
     try {
       await axios.post("/update-invoice-status", {
@@ -869,7 +903,7 @@ th {
 
           <tbody>
             {invoices.length > 0 ? (
-              filteredInvoices.map((invoice) => (
+              invoices.map((invoice) => (
                 <tr key={invoice.invoice_id} onClick={() => openModal(invoice)}>
                   <td>{invoice.invoice_number}</td>
                   <td>{invoice.customer_name || "N/A"}</td>
@@ -939,6 +973,14 @@ th {
             )}
           </tbody>
         </table>
+
+        {nextCursor && (
+          <div className="invoice-load-more">
+            <button onClick={loadMoreInvoices} disabled={loadingMoreInvoices}>
+              {loadingMoreInvoices ? "Loading..." : "Load more invoices"}
+            </button>
+          </div>
+        )}
       </div>
 
       {showModal && (
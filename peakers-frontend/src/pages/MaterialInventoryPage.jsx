@@ -68,6 +68,7 @@ const MaterialInventoryPage = () => {
                   <th>Unit</th>
                   <th>Total Supplied</th>
                   <th>Total Used</th>
+                  <th>Wasted</th>
                   <th>Current Stock</th>
                   <th>Total Cost</th>
                   <th>Avg. Unit Cost</th>
@@ -81,6 +82,7 @@ const MaterialInventoryPage = () => {
                       <td>{material.unit}</td>
                       <td>{material.total_supplied.toLocaleString()}</td>
                       <td>{material.total_used.toLocaleString()}</td>
+                      <td>{(material.total_wasted || 0).toLocaleString()}</td>
                       <td
                         className={
                           material.current_stock < material.total_supplied * 0.2
@@ -96,7 +98,7 @@ const MaterialInventoryPage = () => {
                   ))
                 ) : (
                   <tr>
-                    <td colSpan="7" className="text-center">
+                    <td colSpan="8" className="text-center">
                       No material inventory data available
                     </td>
                   </tr>
@@ -31,50 +31,55 @@ const OrdersPage = () => {
   const [selectedOrder, setSelectedOrder] = useState(null);
   const [showOrderModal, setShowOrderModal] = useState(false);
   const [searchTerm, setSearchTerm] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [ordersWindow, setOrdersWindow] = useState({ startDate: "", endDate: "" });
+  const [loadingMoreOrders, setLoadingMoreOrders] = useState(false);
 
   // Calculate total price for currently filtered orders
   const calculateTotal = () => {
     return filteredOrders.reduce((sum, order) => sum + order.total_price, 0);
   };
 
-  // Fetch Orders
+  const processOrders = (rawOrders) =>
+    rawOrders.map((order) => ({
+      ...order,
+      total_price: Number(order.total_price),
+      vat: Number(order.vat),
+      discount: Number(order.discount),
+      items: order.items.map((item) => ({
+        ...item,
+        product_price: Number(item.product_price),
+        subtotal: Number(item.subtotal),
+      })),
+    }));
+
+  // Recount customer orders over every loaded page
+  useEffect(() => {
+    const counts = orders.reduce((acc, order) => {
+      const customer = order.customer_name || "Guest";
+      acc[customer] = (acc[customer] || 0) + 1;
+      return acc;
+    }, {});
+
+    // Convert to array and sort by order count (descending)
+    const sortedCounts = Object.entries(counts)
+      .map(([name, count]) => ({ name, count }))
+      .sort((a, b) => b.count - a.count);
+
+    setCustomerOrderCounts(sortedCounts);
+  }, [orders]);
+
+  // Fetch the first page of orders in the window
   const fetchOrders = async (startDate = "", endDate = "") => {
     try {
       setLoading(true);
       const response = await axios.get("/get-orders", {
-        params: {
-          start_date: startDate,
-          end_date: endDate,
-        },
+        params: { start_date: startDate, end_date: endDate },
       });
 
-      const processedOrders = response.data.orders.map((order) => ({
-        ...order,
-        total_price: Number(order.total_price),
-        vat: Number(order.vat),
-        discount: Number(order.discount),
-        items: order.items.map((item) => ({
-          ...item,
-          product_price: Number(item.product_price),
-          subtotal: Number(item.subtotal),
-        })),
-      }));
-
-      setOrders(processedOrders);
-
-      // Calculate customer order counts
-      const counts = processedOrders.reduce((acc, order) => {
-        const customer = order.customer_name || "Guest";
-        acc[customer] = (acc[customer] || 0) + 1;
-        return acc;
-      }, {});
-
-      // Convert to array and sort by order count (descending)
-      const sortedCounts = Object.entries(counts)
-        .map(([name, count]) => ({ name, count }))
-        .sort((a, b) => b.count - a.count);
-
-      setCustomerOrderCounts(sortedCounts);
+      setOrders(processOrders(response.data.orders || []));
+      setNextCursor(response.data.next_cursor || null);
+      setOrdersWindow({ startDate, endDate });
       setLoading(false);
     } catch (err) {
       setError("❌ Error loading orders.");
@@ -82,6 +87,31 @@ const OrdersPage = () => {
     }
   };
 
+  // Older pages of the same window are only fetched when asked for
+  const loadMoreOrders = async () => {
+    if (!nextCursor || loadingMoreOrders) return;
+
+    setLoadingMoreOrders(true);
+    try {
+      const response = await axios.get("/get-orders", {
+        params: {
+          start_date: ordersWindow.startDate,
+          end_date: ordersWindow.endDate,
+          cursor: nextCursor,
+        },
+      });
+      setOrders((loaded) => [
+        ...loaded,
+        ...processOrders(response.data.orders || []),
+      ]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (err) {
+      toast.error("Error loading more orders.");
+    } finally {
+      setLoadingMoreOrders(false);
+    }
+  };
+
   // Handle status change
   const handleStatusChange = async (saleId, newStatus) => {
     try {
@@ -118,7 +148,7 @@ const OrdersPage = () => {
         payment_type: paymentType,
       });
       toast.success(`Credit marked as paid via ${paymentType}`);
-      fetchOrders(); // refresh the list
+      fetchOrders(ordersWindow.startDate, ordersWindow.endDate); // refresh the list
       setShowOrderModal(false);
     } catch (err) {
       toast.error(err.response?.data?.error || "Failed to mark credit as paid");
@@ -795,6 +825,14 @@ const OrdersPage = () => {
               </table>
             </div>
 
+            {nextCursor && (
+              <div className={styles.loadMore}>
+                <button onClick={loadMoreOrders} disabled={loadingMoreOrders}>
+                  {loadingMoreOrders ? "Loading..." : "Load more orders"}
+                </button>
+              </div>
+            )}
+
             {rowsPerPage !== 100000 && filteredOrders.length > rowsPerPage && (
               <div className={styles.pagination}>
                 <button
@@ -9,6 +9,10 @@ import AddRecipeModal from "./AddRecipeModal";
 import { ToastContainer, toast } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
 
+// Files above this size are imported as background jobs instead of previewed
+const LARGE_IMPORT_BYTES = 5 * 1024 * 1024;
+const IMPORT_JOB_POLL_MS = 2000;
+
 const ProductCards = () => {
   const [products, setProducts] = useState([]);
   const [filteredProducts, setFilteredProducts] = useState([]);
@@ -21,6 +25,7 @@ const ProductCards = () => {
   const [recipeProduct, setRecipeProduct] = useState(null);
   const [searchTerm, setSearchTerm] = useState("");
   const [previewProducts, setPreviewProducts] = useState([]);
+  const [importToken, setImportToken] = useState(null);
   const [showPreviewModal, setShowPreviewModal] = useState(false);
   const [isImportingExcel, setIsImportingExcel] = useState(false);
   const [fileInputKey, setFileInputKey] = useState(Date.now());
@@ -285,6 +290,61 @@ const ProductCards = () => {
     }
   };
 
+  const resetImportForm = () => {
+    setShowPreviewModal(false);
+    setPreviewProducts([]);
+    setImportToken(null);
+    setImportFile(null);
+    setFileInputKey(Date.now());
+  };
+
+  // Large sheets skip the preview and are imported in the background
+  const runImportJob = async () => {
+    const formData = new FormData();
+    formData.append("file", importFile);
+    formData.append("update_stock", updateExistingStock);
+    formData.append("category_name", importCategory || "Imported Products");
+
+    const res = await axios.post("/products/import-jobs", formData, {
+      headers: {
+        "Content-Type": "multipart/form-data",
+      },
+    });
+
+    const jobId = res.data.job_id;
+    const progressToast = toast.info("Import queued...", {
+      containerId: "product-toast",
+      autoClose: false,
+    });
+
+    let job = res.data;
+    while (job.status === "queued" || job.status === "running") {
+      await new Promise((resolve) => setTimeout(resolve, IMPORT_JOB_POLL_MS));
+      job = (await axios.get(`/products/import-jobs/${jobId}`)).data;
+
+      const total = job.total_rows ? ` of ${job.total_rows}` : "";
+      toast.update(progressToast, {
+        render: `Importing... ${job.rows_processed}${total} rows`,
+      });
+    }
+
+    toast.dismiss(progressToast);
+
+    if (job.status === "failed") {
+      toast.error(job.last_error || "Import failed.", {
+        containerId: "product-toast",
+      });
+    } else {
+      toast.success(
+        `Import complete. New: ${job.imported}, Updated: ${job.updated}, Skipped: ${job.skipped}`,
+        { containerId: "product-toast" },
+      );
+    }
+
+    resetImportForm();
+    fetchAllProducts();
+  };
+
   const previewProductsExcel = async () => {
     if (!importFile) {
       toast.error("Please select an Excel file.", {
@@ -295,6 +355,19 @@ const ProductCards = () => {
 
     setIsPreviewingExcel(true);
 
+    if (importFile.size > LARGE_IMPORT_BYTES || importFile.name.toLowerCase().endsWith(".csv")) {
+      try {
+        await runImportJob();
+      } catch (error) {
+        toast.error(error.response?.data?.error || "Import failed.", {
+          containerId: "product-toast",
+        });
+      } finally {
+        setIsPreviewingExcel(false);
+      }
+      return;
+    }
+
     try {
       const formData = new FormData();
       formData.append("file", importFile);
@@ -307,6 +380,7 @@ const ProductCards = () => {
       });
 
       setPreviewProducts(res.data.products || []);
+      setImportToken(res.data.import_token || null);
       setShowPreviewModal(true);
     } catch (error) {
       toast.error(error.response?.data?.error || "Preview failed.", {
@@ -330,6 +404,9 @@ const ProductCards = () => {
       const formData = new FormData();
       formData.append("file", importFile);
       formData.append("update_stock", updateExistingStock);
+      if (importToken) {
+        formData.append("import_token", importToken);
+      }
       formData.append("category_name", importCategory || "Imported Products");
 
       const res = await axios.post("/products/import-excel", formData, {
@@ -343,10 +420,7 @@ const ProductCards = () => {
         { containerId: "product-toast" },
       );
 
-      setShowPreviewModal(false);
-      setPreviewProducts([]);
-      setImportFile(null);
-      setFileInputKey(Date.now());
+      resetImportForm();
       fetchAllProducts();
     } catch (error) {
       toast.error(error.response?.data?.error || "Import failed.", {
@@ -413,11 +487,12 @@ const ProductCards = () => {
             <input
               key={fileInputKey}
               type="file"
-              accept=".xlsx,.xls"
+              accept=".xlsx,.xls,.csv"
               onChange={(e) => {
                 const file = e.target.files[0];
                 setImportFile(file || null);
                 setPreviewProducts([]);
+                setImportToken(null);
                 setShowPreviewModal(false);
               }}
             />
@@ -642,6 +717,7 @@ const ProductCards = () => {
                 onClick={() => {
                   setShowPreviewModal(false);
                   setPreviewProducts([]);
+                  setImportToken(null);
                   setImportFile(null);
                   setFileInputKey(Date.now());
                 }}
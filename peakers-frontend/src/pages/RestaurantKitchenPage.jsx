@@ -4,20 +4,91 @@ import styles from "./styles/RestaurantKitchenPage.module.css";
 import { ToastContainer, toast } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
 
+// Same order as the server's snapshot: by kitchen status, then oldest first
+const KITCHEN_STATUS_RANK = { pending: 1, preparing: 2, ready: 3, served: 4 };
+const KITCHEN_EVENT_TYPES = ["created", "status", "cancelled", "reopened"];
+const KITCHEN_STREAM_RETRY_MS = 5000;
+
+const sortKitchenOrders = (orders) =>
+  [...orders].sort(
+    (a, b) =>
+      (KITCHEN_STATUS_RANK[a.kitchen_status] || 5) -
+        (KITCHEN_STATUS_RANK[b.kitchen_status] || 5) ||
+      new Date(a.created_at) - new Date(b.created_at),
+  );
+
 const RestaurantKitchenPage = () => {
   const [orders, setOrders] = useState([]);
   const [filter, setFilter] = useState("active");
+  const [live, setLive] = useState(false);
 
+  // Initial snapshot, then deltas from the kitchen stream
   useEffect(() => {
-    fetchKitchenOrders();
-  }, []);
+    let source = null;
+    let retryTimer = null;
+    let lastEventId = null;
+    let closed = false;
+
+    // An order the delta carries no longer in the kitchen (or none at all) leaves the list
+    const applyOrder = (orderId, order) =>
+      setOrders((current) => {
+        const rest = current.filter(
+          (existing) => existing.restaurant_order_id !== orderId,
+        );
+        if (!order || !KITCHEN_STATUS_RANK[order.kitchen_status]) return rest;
+        return sortKitchenOrders([...rest, order]);
+      });
+
+    const connect = () => {
+      // The browser resumes with Last-Event-ID by itself, the cursor covers new connections
+      const url =
+        lastEventId === null
+          ? "/restaurant/kitchen-stream"
+          : `/restaurant/kitchen-stream?cursor=${lastEventId}`;
+      source = new EventSource(url, { withCredentials: true });
+
+      source.onopen = () => setLive(true);
+
+      source.addEventListener("snapshot", (event) => {
+        const data = JSON.parse(event.data);
+        lastEventId = data.event_id;
+        setOrders(data.orders || []);
+      });
+
+      KITCHEN_EVENT_TYPES.forEach((type) =>
+        source.addEventListener(type, (event) => {
+          const data = JSON.parse(event.data);
+          lastEventId = data.event_id;
+          applyOrder(data.restaurant_order_id, data.order);
+        }),
+      );
+
+      source.onerror = () => {
+        setLive(false);
+        // Once the browser gives up, reconnect from the last event applied
+        if (source.readyState === EventSource.CLOSED && !closed) {
+          retryTimer = setTimeout(connect, KITCHEN_STREAM_RETRY_MS);
+        }
+      };
+    };
 
-  const fetchKitchenOrders = () => {
     axios
       .get("/restaurant/kitchen-orders", { withCredentials: true })
-      .then((res) => setOrders(res.data.orders || []))
-      .catch(() => toast.error("Error loading kitchen orders."));
-  };
+      .then((res) => {
+        setOrders(res.data.orders || []);
+        lastEventId = res.data.event_id ?? null;
+      })
+      .catch(() => toast.error("Error loading kitchen orders."))
+      .finally(() => {
+        if (!closed) connect();
+      });
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, []);
 
   const updateKitchenStatus = async (orderId, kitchenStatus) => {
     try {
@@ -28,7 +99,6 @@ const RestaurantKitchenPage = () => {
       );
 
       toast.success(`Order marked as ${kitchenStatus}`);
-      fetchKitchenOrders();
     } catch (error) {
       toast.error(error.response?.data?.error || "Error updating status.");
     }
@@ -50,7 +120,9 @@ const RestaurantKitchenPage = () => {
           <p>View active and served orders for today</p>
         </div>
 
-        <button onClick={fetchKitchenOrders}>Refresh</button>
+        <span className={live ? styles.liveBadge : styles.offlineBadge}>
+          {live ? "Live" : "Reconnecting..."}
+        </span>
       </div>
 
       <div className={styles.filterTabs}>
@@ -1,9 +1,14 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import axios from "axios";
 import styles from "./styles/SalesPage.module.css";
 import { ToastContainer, toast } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
 
+// How long the till keeps polling a push for the customer's answer,
+// waiting a little longer between each status check
+const STK_WATCH_MS = 3 * 60 * 1000;
+const STK_POLL_DELAYS_MS = [2000, 3000, 5000, 8000, 10000];
+
 const SalesPage = () => {
   const [products, setProducts] = useState([]);
   const [filteredProducts, setFilteredProducts] = useState([]);
@@ -42,6 +47,8 @@ const SalesPage = () => {
   const [stkCooldown, setStkCooldown] = useState(0);
   const [lastStkPhone, setLastStkPhone] = useState("");
   const [processingSale, setProcessingSale] = useState(false);
+  const catalogueVersion = useRef(null);
+  const catalogue = useRef([]);
 
   const allowsDecimal = (unit) => {
     return decimalUnits.includes(String(unit || "").toLowerCase());
@@ -58,12 +65,47 @@ const SalesPage = () => {
     }
   };
 
+  const showCatalogue = (items) => {
+    catalogue.current = items;
+    setProducts(items);
+    setFilteredProducts(items);
+  };
+
+  const fetchFullCatalogue = () =>
+    axios.get("/get-sales-products").then((response) => {
+      catalogueVersion.current = response.data.catalogue_version;
+      showCatalogue(response.data.products);
+    });
+
+  // After the first load only the changes since our version are fetched
   const fetchProducts = () => {
+    if (catalogueVersion.current === null) {
+      fetchFullCatalogue().catch(() => toast.error("❌ Error loading products."));
+      return;
+    }
+
     axios
-      .get("/get-sales-products")
+      .get("/catalogue-changes", { params: { since: catalogueVersion.current } })
       .then((response) => {
-        setProducts(response.data.products);
-        setFilteredProducts(response.data.products);
+        const { catalogue_version, full_sync_required, products, deleted } =
+          response.data;
+
+        if (full_sync_required) {
+          return fetchFullCatalogue();
+        }
+
+        if (catalogue_version === catalogueVersion.current) return;
+
+        const removed = new Set(deleted.map(String));
+        products.forEach((product) => removed.add(String(product.product_id)));
+
+        catalogueVersion.current = catalogue_version;
+        showCatalogue([
+          ...products,
+          ...catalogue.current.filter(
+            (product) => !removed.has(String(product.product_id)),
+          ),
+        ]);
       })
       .catch(() => toast.error("❌ Error loading products."));
   };
@@ -388,6 +430,48 @@ const SalesPage = () => {
     }
   };
 
+  const watchStkPayment = async (reference) => {
+    const deadline = Date.now() + STK_WATCH_MS;
+    let attempt = 0;
+
+    try {
+      while (Date.now() < deadline) {
+        const delay =
+          STK_POLL_DELAYS_MS[Math.min(attempt, STK_POLL_DELAYS_MS.length - 1)];
+        attempt += 1;
+        await new Promise((resolve) => setTimeout(resolve, delay));
+
+        const { data } = await axios.get(`/api/stk-push/${reference}`, {
+          withCredentials: true,
+        });
+
+        const status = data.status;
+
+        // The customer's answer goes to the business's own callback URL,
+        // so the gateway accepting the push is all this till will learn
+        if (status === "sent" && !data.tracks_callbacks) {
+          return;
+        }
+
+        if (status === "completed") {
+          toast.success(
+            `M-Pesa payment received${data.mpesa_receipt ? ` (${data.mpesa_receipt})` : ""}.`,
+          );
+          return;
+        }
+
+        if (status === "failed") {
+          toast.error(
+            data.result_desc || data.last_error || "STK Push payment failed.",
+          );
+          return;
+        }
+      }
+    } catch (error) {
+      console.log("STK STATUS ERROR:", error.response?.data);
+    }
+  };
+
   const handleStkPush = async () => {
     setStkSent(false);
 
@@ -428,12 +512,12 @@ const SalesPage = () => {
         { withCredentials: true },
       );
 
-      console.log(response.data);
-
       toast.success("STK Push sent successfully. Ask customer to enter PIN.");
       setLastStkPhone(stkPhone.trim());
       setStkCooldown(10);
       setStkSent(true);
+
+      watchStkPayment(response.data.reference);
     } catch (error) {
       console.log("STK ERROR:", error.response?.data);
       toast.error(
@@ -0,0 +1,312 @@
+# query_profiler.py
+"""
+Per-request database profiling built on SQLAlchemy engine events.
+
+Every statement run through the engine (execute_query & co. as well as raw
+get_db() sessions) is timed, as is the wait for a pooled connection. The
+numbers are summed per Flask request, aggregated per endpoint and rendered
+in Prometheus text format by render_metrics(). Statements slower than
+SLOW_QUERY_MS are logged with the endpoint that issued them.
+
+Counters live in process memory, so each worker process reports its own.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+QUERY_PROFILER_ENABLED = os.getenv("QUERY_PROFILER", "1") != "0"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+# Requests issuing more statements than this are logged, usually an N+1 loop
+REQUEST_QUERY_WARN_COUNT = int(os.getenv("REQUEST_QUERY_WARN_COUNT", 50))
+
+QUERIES_PER_REQUEST_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+DB_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# Requests that get no endpoint (404s) and work done outside any request
+UNMATCHED_ENDPOINT = "unmatched"
+BACKGROUND_ENDPOINT = "background"
+
+current_profile = contextvars.ContextVar("query_profile", default=None)
+
+
+def compact_statement(statement, limit=300):
+    return " ".join(str(statement).split())[:limit]
+
+
+class RequestProfile:
+    """Database work done while serving one request"""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint or UNMATCHED_ENDPOINT
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+    def add_query(self, statement, seconds):
+        self.query_count += 1
+        self.db_seconds += seconds
+
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+
+def bucket_counts(buckets, value):
+    return [1 if value <= bound else 0 for bound in buckets]
+
+
+class QueryMetrics:
+    """Per-endpoint totals, histograms and the duration of the slowest statement"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def endpoint_stats(self, endpoint):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = {
+                "requests": 0,
+                "queries": 0,
+                "db_seconds": 0.0,
+                "pool_wait_seconds": 0.0,
+                "queries_buckets": [0] * len(QUERIES_PER_REQUEST_BUCKETS),
+                "db_seconds_buckets": [0] * len(DB_SECONDS_BUCKETS),
+                "slowest_seconds": 0.0,
+            }
+        return stats
+
+    def record_request(self, endpoint, profile):
+        with self.lock:
+            stats = self.endpoint_stats(endpoint)
+            stats["requests"] += 1
+            stats["queries"] += profile.query_count
+            stats["db_seconds"] += profile.db_seconds
+            stats["pool_wait_seconds"] += profile.pool_wait_seconds
+
+            for index, hit in enumerate(bucket_counts(QUERIES_PER_REQUEST_BUCKETS, profile.query_count)):
+                stats["queries_buckets"][index] += hit
+            for index, hit in enumerate(bucket_counts(DB_SECONDS_BUCKETS, profile.db_seconds)):
+                stats["db_seconds_buckets"][index] += hit
+
+            stats["slowest_seconds"] = max(stats["slowest_seconds"], profile.slowest_seconds)
+
+    def record_background(self, statement, seconds, pool_wait_seconds=0.0):
+        with self.lock:
+            stats = self.endpoint_stats(BACKGROUND_ENDPOINT)
+            stats["queries"] += 1 if statement is not None else 0
+            stats["db_seconds"] += seconds
+            stats["pool_wait_seconds"] += pool_wait_seconds
+
+            stats["slowest_seconds"] = max(stats["slowest_seconds"], seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                endpoint: dict(
+                    stats,
+                    queries_buckets=list(stats["queries_buckets"]),
+                    db_seconds_buckets=list(stats["db_seconds_buckets"]),
+                )
+                for endpoint, stats in self.endpoints.items()
+            }
+
+
+query_metrics = QueryMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that charges the time spent waiting for a connection to the current request"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            profile = current_profile.get()
+
+            if profile is not None:
+                profile.pool_wait_seconds += waited
+            elif QUERY_PROFILER_ENABLED:
+                query_metrics.record_background(None, 0.0, waited)
+
+
+def instrument_engine(engine):
+    """Time every statement executed through the engine"""
+    if not QUERY_PROFILER_ENABLED:
+        return engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        record_query(statement, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def drop_query_timer(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            started = conn.info["query_started"].pop()
+            record_query(exception_context.statement, time.perf_counter() - started)
+
+    return engine
+
+
+def record_query(statement, seconds):
+    profile = current_profile.get()
+
+    if profile is not None:
+        profile.add_query(statement, seconds)
+        endpoint = profile.endpoint
+    else:
+        query_metrics.record_background(statement, seconds)
+        endpoint = BACKGROUND_ENDPOINT
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms) in %s: %s",
+            seconds * 1000, endpoint, compact_statement(statement)
+        )
+
+
+def init_app(app):
+    """Profile the database work of every request served by the app"""
+    if not QUERY_PROFILER_ENABLED:
+        return
+
+    from flask import g, request
+
+    @app.before_request
+    def start_query_profile():
+        g.query_profile_token = current_profile.set(RequestProfile(request.endpoint))
+
+    @app.after_request
+    def add_server_timing(response):
+        profile = current_profile.get()
+
+        if profile is not None:
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.query_count} queries"'
+            )
+        return response
+
+    @app.teardown_request
+    def finish_query_profile(exception=None):
+        token = g.pop("query_profile_token", None)
+        if token is None:
+            return
+
+        profile = current_profile.get()
+        try:
+            current_profile.reset(token)
+        except ValueError:
+            current_profile.set(None)
+
+        if profile is None:
+            return
+
+        query_metrics.record_request(profile.endpoint, profile)
+
+        if profile.query_count > REQUEST_QUERY_WARN_COUNT:
+            logger.warning(
+                "%s ran %d queries (%.1f ms), slowest %.1f ms: %s",
+                profile.endpoint, profile.query_count, profile.db_seconds * 1000,
+                profile.slowest_seconds * 1000, compact_statement(profile.slowest_statement)
+            )
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", " ").replace('"', '\\"')
+
+
+def render_histogram(lines, name, endpoint, buckets, counts, total, count):
+    label = f'endpoint="{escape_label(endpoint)}"'
+    for bound, hits in zip(buckets, counts):
+        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {hits}')
+    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {count}')
+    lines.append(f"{name}_sum{{{label}}} {total}")
+    lines.append(f"{name}_count{{{label}}} {count}")
+
+
+def render_metrics(pool_status=None, replica_status=None):
+    """All collected metrics in Prometheus text exposition format"""
+    snapshot = query_metrics.snapshot()
+    lines = []
+
+    counters = [
+        ("peakers_db_requests_total", "requests", "Requests served, per endpoint"),
+        ("peakers_db_queries_total", "queries", "SQL statements executed, per endpoint"),
+        ("peakers_db_query_seconds_total", "db_seconds", "Time spent executing SQL, per endpoint"),
+        ("peakers_db_pool_wait_seconds_total", "pool_wait_seconds",
+         "Time spent waiting for a pooled connection, per endpoint"),
+    ]
+
+    for name, key, help_text in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for endpoint, stats in sorted(snapshot.items()):
+            lines.append(f'{name}{{endpoint="{escape_label(endpoint)}"}} {stats[key]}')
+
+    histograms = [
+        ("peakers_db_queries_per_request", "queries_buckets", "queries",
+         QUERIES_PER_REQUEST_BUCKETS, "SQL statements per request"),
+        ("peakers_db_seconds_per_request", "db_seconds_buckets", "db_seconds",
+         DB_SECONDS_BUCKETS, "Time spent executing SQL per request"),
+    ]
+
+    for name, buckets_key, total_key, buckets, help_text in histograms:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for endpoint, stats in sorted(snapshot.items()):
+            if endpoint == BACKGROUND_ENDPOINT:
+                continue
+            render_histogram(
+                lines, name, endpoint, buckets,
+                stats[buckets_key], stats[total_key], stats["requests"]
+            )
+
+    # The statement itself is in the slow query log, a label per statement would never expire
+    lines.append("# HELP peakers_db_slowest_query_seconds Slowest statement seen, per endpoint")
+    lines.append("# TYPE peakers_db_slowest_query_seconds gauge")
+    for endpoint, stats in sorted(snapshot.items()):
+        if stats["slowest_seconds"]:
+            lines.append(
+                f'peakers_db_slowest_query_seconds{{endpoint="{escape_label(endpoint)}"}} '
+                f'{stats["slowest_seconds"]}'
+            )
+
+    if pool_status:
+        for key in ("size", "checked_in", "overflow", "total", "connections_in_use"):
+            name = f"peakers_db_pool_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {pool_status[key]}")
+
+    if replica_status:
+        for key in ("size", "checked_in", "overflow", "total", "connections_in_use"):
+            name = f"peakers_db_replica_pool_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {replica_status[key]}")
+
+        lines.append("# HELP peakers_db_replica_usable Whether reports are read from the replica")
+        lines.append("# TYPE peakers_db_replica_usable gauge")
+        lines.append(f"peakers_db_replica_usable {1 if replica_status['usable'] else 0}")
+
+        if replica_status["lag_seconds"] is not None:
+            lines.append("# TYPE peakers_db_replica_lag_seconds gauge")
+            lines.append(f"peakers_db_replica_lag_seconds {replica_status['lag_seconds']}")
+
+    return "\n".join(lines) + "\n"
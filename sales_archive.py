@@ -0,0 +1,272 @@
+# sales_archive.py
+"""
+Hot/cold split of sales and sales_items.
+
+Sales older than SALES_ARCHIVE_AFTER_DAYS (rounded down to the first of the
+month) move in batches to sales_archive and sales_items_archive, tables of
+the same shape, so the hot tables only hold the recent periods that the
+till and the day-to-day reports read. Run it from cron:
+
+    python sales_archive.py                 archive everything before the cutoff
+    python sales_archive.py 2025-01-01      archive sales before a given date
+
+Archived sales are read-only; writers check archived_sale_id() and refuse
+to change them. Readers call sales_sources() with the date range they filter on and get
+back the tiers to read: the hot tables, the archive, or both when the range
+straddles the boundary. tier_source() turns them into a FROM expression,
+repeating the query's filter in each branch when both tiers are read. The
+boundary is published before any row moves, and queries that straddle it
+read both tiers, so a sale is never missed while a run is in progress.
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from db import get_db
+
+SALES_ARCHIVE_AFTER_DAYS = int(os.getenv("SALES_ARCHIVE_AFTER_DAYS", 365))
+SALES_ARCHIVE_BATCH_SIZE = int(os.getenv("SALES_ARCHIVE_BATCH_SIZE", 1000))
+SALES_ARCHIVE_STATE_TTL = float(os.getenv("SALES_ARCHIVE_STATE_TTL", 30))
+
+HOT_TABLES = (("sales",), ("sales_items",))
+ARCHIVE_TABLES = (("sales_archive",), ("sales_items_archive",))
+BOTH_TIERS = (("sales", "sales_archive"), ("sales_items", "sales_items_archive"))
+
+archive_state_cache = {"state": None, "loaded_at": 0.0}
+
+
+def load_archive_state(db):
+    row = db.execute(
+        text("""
+            SELECT archived_before, hot_since
+            FROM sales_archive_state
+            WHERE id = 1
+        """)
+    ).mappings().fetchone()
+
+    return dict(row) if row else {"archived_before": None, "hot_since": None}
+
+
+def archive_state(db):
+    """
+    The tier boundaries, cached for SALES_ARCHIVE_STATE_TTL seconds.
+    archived_before: sales before it may be in the archive.
+    hot_since: the hot tables hold nothing older (set once a run completes).
+    """
+    if time.monotonic() - archive_state_cache["loaded_at"] >= SALES_ARCHIVE_STATE_TTL:
+        archive_state_cache["state"] = load_archive_state(db)
+        archive_state_cache["loaded_at"] = time.monotonic()
+
+    return archive_state_cache["state"]
+
+
+def sales_sources(db, start_date=None, end_date=None):
+    """
+    (sales, sales_items) tables covering sale_date between start_date and
+    end_date (None means unbounded on that side), one or two of each. Pass
+    them to tier_source() to select from.
+    """
+    state = archive_state(db)
+    archived_before = state["archived_before"]
+    hot_since = state["hot_since"]
+
+    if archived_before is None or (start_date is not None and start_date >= archived_before):
+        return HOT_TABLES
+
+    if hot_since is not None and end_date is not None and end_date < hot_since:
+        return ARCHIVE_TABLES
+
+    return BOTH_TIERS
+
+
+def tier_source(tables, columns, where):
+    """
+    FROM expression over the given tiers of one table. A single tier is the
+    table itself; two become a UNION ALL of the listed columns with the
+    where clause inside each branch, so neither tier is read in full.
+    """
+    if len(tables) == 1:
+        return tables[0]
+
+    select = ", ".join(columns)
+    branches = " UNION ALL ".join(
+        f"SELECT {select} FROM {table} WHERE {where}" for table in tables
+    )
+    return f"({branches})"
+
+
+def archived_sale_id(db, business_id, sale_id=None, invoice_id=None):
+    """
+    sale_id of the business's archived sale with the given sale_id or
+    invoice_id, None when it is not in the archive tier. Archived sales are
+    read-only: their rollups and stock were settled when they moved.
+    """
+    if archive_state(db)["archived_before"] is None:
+        return None
+
+    column, value = ("sale_id", sale_id) if sale_id is not None else ("invoice_id", invoice_id)
+
+    return db.execute(
+        text(f"""
+            SELECT sale_id
+            FROM sales_archive
+            WHERE {column} = :value
+            AND business_id = :business_id
+            LIMIT 1
+        """),
+        {"value": value, "business_id": business_id}
+    ).scalar()
+
+
+def archive_cutoff(now=None, after_days=SALES_ARCHIVE_AFTER_DAYS):
+    """First day of the month SALES_ARCHIVE_AFTER_DAYS ago, so whole months move together"""
+    day = ((now or datetime.now()) - timedelta(days=after_days)).date()
+    return datetime(day.year, day.month, 1)
+
+
+def copy_columns(db, table_name):
+    """Stored columns of a table, generated ones are recomputed by the target"""
+    rows = db.execute(
+        text("""
+            SELECT COLUMN_NAME
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = :table_name
+            AND EXTRA NOT LIKE '%GENERATED%'
+            ORDER BY ORDINAL_POSITION
+        """),
+        {"table_name": table_name}
+    ).fetchall()
+
+    return ", ".join(f"`{row[0]}`" for row in rows)
+
+
+def publish_boundary(cutoff):
+    """Tell readers that sales before cutoff may now be in the archive"""
+    with get_db() as db:
+        db.execute(
+            text("""
+                INSERT INTO sales_archive_state (id, archived_before, hot_since)
+                VALUES (1, :cutoff, NULL)
+                ON DUPLICATE KEY UPDATE
+                    archived_before = GREATEST(COALESCE(archived_before, :cutoff), :cutoff)
+            """),
+            {"cutoff": cutoff}
+        )
+
+
+def mark_hot_since(cutoff):
+    with get_db() as db:
+        db.execute(
+            text("""
+                UPDATE sales_archive_state
+                SET hot_since = GREATEST(COALESCE(hot_since, :cutoff), :cutoff)
+                WHERE id = 1
+            """),
+            {"cutoff": cutoff}
+        )
+
+
+def archive_batch(db, sale_columns, item_columns, cutoff, batch_size):
+    """Move one batch of sales older than cutoff with their items; returns the sales moved"""
+    sale_ids = [
+        row[0] for row in db.execute(
+            text("""
+                SELECT sale_id
+                FROM sales
+                WHERE sale_date < :cutoff
+                ORDER BY sale_date, sale_id
+                LIMIT :batch_size
+            """),
+            {"cutoff": cutoff, "batch_size": batch_size}
+        ).fetchall()
+    ]
+
+    if not sale_ids:
+        return 0
+
+    placeholders = ",".join([f":sale_id{i}" for i in range(len(sale_ids))])
+    params = {f"sale_id{i}": sale_id for i, sale_id in enumerate(sale_ids)}
+
+    db.execute(
+        text(f"""
+            INSERT INTO sales_archive ({sale_columns})
+            SELECT {sale_columns}
+            FROM sales
+            WHERE sale_id IN ({placeholders})
+        """),
+        params
+    )
+
+    db.execute(
+        text(f"""
+            INSERT INTO sales_items_archive ({item_columns})
+            SELECT {item_columns}
+            FROM sales_items
+            WHERE sale_id IN ({placeholders})
+        """),
+        params
+    )
+
+    # All-time per-product quantities, for reports that never need the rows
+    db.execute(
+        text(f"""
+            INSERT INTO sales_items_archive_totals (business_id, product_id, quantity)
+            SELECT business_id, product_id, SUM(quantity)
+            FROM sales_items
+            WHERE sale_id IN ({placeholders})
+            AND product_id IS NOT NULL
+            GROUP BY business_id, product_id
+            ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
+        """),
+        params
+    )
+
+    db.execute(text(f"DELETE FROM sales_items WHERE sale_id IN ({placeholders})"), params)
+    db.execute(text(f"DELETE FROM sales WHERE sale_id IN ({placeholders})"), params)
+
+    return len(sale_ids)
+
+
+def archive_sales(cutoff=None, batch_size=SALES_ARCHIVE_BATCH_SIZE):
+    """Move every sale before cutoff to the archive tier, one committed batch at a time"""
+    cutoff = cutoff or archive_cutoff()
+
+    publish_boundary(cutoff)
+    # Let every worker's cached boundary expire before the first row moves
+    time.sleep(SALES_ARCHIVE_STATE_TTL + 1)
+
+    with get_db() as db:
+        sale_columns = copy_columns(db, "sales")
+        item_columns = copy_columns(db, "sales_items")
+
+    moved = 0
+    started = time.perf_counter()
+
+    while True:
+        with get_db() as db:
+            count = archive_batch(db, sale_columns, item_columns, cutoff, batch_size)
+
+        if not count:
+            break
+
+        moved += count
+        print(f"📦 Archived {moved} sales before {cutoff:%Y-%m-%d}")
+
+    mark_hot_since(cutoff)
+
+    print(f"✅ Archived {moved} sales in {time.perf_counter() - started:.1f}s")
+    return moved
+
+
+def main(argv):
+    cutoff = datetime.fromisoformat(argv[0]) if argv else None
+    archive_sales(cutoff)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,290 @@
+# stk_payments.py
+import hashlib
+import json
+import os
+import secrets
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import text
+
+from db import get_db
+
+# Point this at a local mock gateway (benchmarks/mock_stk_gateway.py) for testing
+STK_GATEWAY_URL = os.getenv(
+    "STK_GATEWAY_URL",
+    "https://sandboxkonnectapi.creditbank.co.ke/safaricom-stkpush"
+)
+STK_CONNECT_TIMEOUT = float(os.getenv("STK_CONNECT_TIMEOUT", 5))
+STK_READ_TIMEOUT = float(os.getenv("STK_READ_TIMEOUT", 30))
+STK_PUSH_WORKERS = int(os.getenv("STK_PUSH_WORKERS", 8))
+STK_POOL_MAXSIZE = int(os.getenv("STK_POOL_MAXSIZE", 8))
+# Public base URL of this app; when set the gateway calls back into /api/stk-callback
+STK_CALLBACK_BASE_URL = os.getenv("STK_CALLBACK_BASE_URL")
+
+
+class StkSessionPool:
+    """
+    Keep-alive HTTP sessions to the gateway, one per business credential,
+    so consecutive pushes reuse open TLS connections.
+    """
+
+    def __init__(self, pool_maxsize):
+        self.pool_maxsize = pool_maxsize
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def session(self, app_id, api_key):
+        key = hashlib.sha256(f"{app_id}:{api_key}".encode()).hexdigest()
+
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.pool_maxsize,
+                    max_retries=0
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "Accept": "application/json",
+                    "Content-Type": "application/json",
+                    "x-app-id": app_id or "",
+                    "x-api-key": api_key or "",
+                })
+                self.sessions[key] = session
+
+        return session
+
+
+stk_sessions = StkSessionPool(STK_POOL_MAXSIZE)
+stk_executor = ThreadPoolExecutor(max_workers=STK_PUSH_WORKERS, thread_name_prefix="stk-push")
+
+
+def create_stk_payment(business_id, phone, amount):
+    """Record a queued payment and return its reference and callback token"""
+    reference = uuid.uuid4().hex[:12]
+    callback_token = secrets.token_urlsafe(24)
+
+    with get_db() as db:
+        db.execute(
+            text("""
+                INSERT INTO stk_payments (
+                    business_id, reference, callback_token, phone, amount, status
+                )
+                VALUES (
+                    :business_id, :reference, :callback_token, :phone, :amount, 'queued'
+                )
+            """),
+            {
+                "business_id": business_id,
+                "reference": reference,
+                "callback_token": callback_token,
+                "phone": phone,
+                "amount": amount
+            }
+        )
+
+    return reference, callback_token
+
+
+def stk_callback_urls(business, reference, callback_token):
+    """(callBackUrl, errorCallBackUrl) for a push"""
+    if STK_CALLBACK_BASE_URL:
+        url = f"{STK_CALLBACK_BASE_URL.rstrip('/')}/api/stk-callback/{reference}/{callback_token}"
+        return url, f"{url}?outcome=error"
+
+    return business["stk_callback_url"], business["stk_error_callback_url"]
+
+
+def update_stk_payment(reference, status, gateway_status_code=None, gateway_response=None, last_error=None):
+    with get_db() as db:
+        db.execute(
+            text("""
+                UPDATE stk_payments
+                SET status = :status,
+                    gateway_status_code = :gateway_status_code,
+                    gateway_response = :gateway_response,
+                    last_error = :last_error
+                WHERE reference = :reference
+                AND status IN ('queued', 'sent')
+            """),
+            {
+                "reference": reference,
+                "status": status,
+                "gateway_status_code": gateway_status_code,
+                "gateway_response": json.dumps(gateway_response)[:4000] if gateway_response is not None else None,
+                "last_error": last_error[:1000] if last_error else None
+            }
+        )
+
+
+def gateway_error_message(response_data):
+    if isinstance(response_data, dict):
+        for key in ("errorMessage", "error", "message", "ResponseDescription"):
+            if response_data.get(key):
+                return str(response_data[key])
+    return "Gateway rejected the STK push"
+
+
+def send_stk_push(reference, callback_token, phone, amount, business):
+    """Send one push on the credential's pooled session and record the gateway's answer"""
+    callback_url, error_callback_url = stk_callback_urls(business, reference, callback_token)
+
+    payload = {
+        "phoneNumber": phone,
+        "amount": str(amount),
+        "reference": reference,
+        "countryCode": "KE",
+        "telco": "SAFARICOM",
+        "narration": "POS Payment",
+        "callBackUrl": callback_url,
+        "errorCallBackUrl": error_callback_url,
+    }
+
+    try:
+        session = stk_sessions.session(business["stk_app_id"], business["stk_api_key"])
+        response = session.post(
+            STK_GATEWAY_URL,
+            json=payload,
+            timeout=(STK_CONNECT_TIMEOUT, STK_READ_TIMEOUT)
+        )
+
+        try:
+            response_data = response.json()
+        except ValueError:
+            response_data = {"raw_response": response.text[:1000]}
+
+        if response.status_code < 400:
+            update_stk_payment(reference, "sent", response.status_code, response_data)
+        else:
+            update_stk_payment(
+                reference, "failed", response.status_code, response_data,
+                gateway_error_message(response_data)
+            )
+
+    except Exception as e:
+        print(f"❌ STK push {reference} failed:", e)
+        traceback.print_exc()
+        update_stk_payment(reference, "failed", last_error=str(e))
+
+
+def submit_stk_push(reference, callback_token, phone, amount, business):
+    """Send the push on a background thread; the caller returns straight away"""
+    return stk_executor.submit(send_stk_push, reference, callback_token, phone, amount, business)
+
+
+def find_callback_value(source, *keys):
+    for key in keys:
+        if isinstance(source, dict) and source.get(key) not in (None, ""):
+            return source[key]
+    return None
+
+
+def parse_stk_callback(payload, errored=False):
+    """
+    (status, result_code, result_desc, receipt) from a gateway callback.
+    Understands the Daraja Body.stkCallback shape and flat JSON bodies.
+    """
+    payload = payload if isinstance(payload, dict) else {}
+    source = (payload.get("Body") or {}).get("stkCallback") or payload
+
+    result_code = find_callback_value(source, "ResultCode", "resultCode", "result_code", "responseCode")
+    result_desc = find_callback_value(
+        source, "ResultDesc", "resultDesc", "result_desc", "message", "description"
+    )
+    receipt = find_callback_value(
+        source, "MpesaReceiptNumber", "mpesaReceiptNumber", "receiptNumber", "transactionId"
+    )
+
+    for item in (source.get("CallbackMetadata") or {}).get("Item") or []:
+        if item.get("Name") == "MpesaReceiptNumber":
+            receipt = item.get("Value")
+
+    if errored:
+        status = "failed"
+    elif result_code is not None:
+        status = "completed" if str(result_code) == "0" else "failed"
+    else:
+        reported = str(source.get("status") or "").lower()
+        status = "completed" if reported in ("success", "successful", "completed", "paid") else "failed"
+
+    return (
+        status,
+        str(result_code) if result_code is not None else None,
+        str(result_desc)[:255] if result_desc else None,
+        str(receipt)[:64] if receipt else None
+    )
+
+
+def record_stk_callback(reference, callback_token, payload, errored=False):
+    """Store a gateway callback; False when the reference/token pair is unknown"""
+    status, result_code, result_desc, receipt = parse_stk_callback(payload, errored)
+
+    with get_db() as db:
+        payment = db.execute(
+            text("""
+                SELECT payment_id, callback_token
+                FROM stk_payments
+                WHERE reference = :reference
+            """),
+            {"reference": reference}
+        ).mappings().fetchone()
+
+        if not payment or not secrets.compare_digest(payment["callback_token"], str(callback_token)):
+            return False
+
+        # Gateways retry callbacks; only the first one settles the payment
+        db.execute(
+            text("""
+                UPDATE stk_payments
+                SET status = :status,
+                    result_code = :result_code,
+                    result_desc = :result_desc,
+                    mpesa_receipt = :mpesa_receipt,
+                    callback_payload = :callback_payload,
+                    completed_at = NOW()
+                WHERE payment_id = :payment_id
+                AND status IN ('queued', 'sent')
+            """),
+            {
+                "payment_id": payment["payment_id"],
+                "status": status,
+                "result_code": result_code,
+                "result_desc": result_desc,
+                "mpesa_receipt": receipt,
+                "callback_payload": json.dumps(payload)[:8000]
+            }
+        )
+
+    return True
+
+
+def get_stk_payment(business_id, reference):
+    with get_db() as db:
+        payment = db.execute(
+            text("""
+                SELECT reference, phone, amount, status, gateway_status_code,
+                       result_code, result_desc, mpesa_receipt, last_error,
+                       created_at, updated_at, completed_at
+                FROM stk_payments
+                WHERE reference = :reference
+                AND business_id = :business_id
+            """),
+            {"reference": reference, "business_id": business_id}
+        ).mappings().fetchone()
+
+    if not payment:
+        return None
+
+    payment = dict(payment)
+    # Without our own callback URL the gateway reports to the business's
+    # URL, so a push never moves past "sent" here
+    payment["tracks_callbacks"] = bool(STK_CALLBACK_BASE_URL)
+    return payment
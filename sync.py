@@ -1,208 +1,484 @@
 # sync.py
-from db import get_db_connection, get_ubuntu_db_connection
+"""
+Incremental replication of the catalogue tables to the Ubuntu server.
 
-def sync_table(table_name, columns, update_columns):
-    local_conn = get_db_connection()
-    if not local_conn:
-        print(f"❌ Local DB not available for {table_name}")
-        return
+Each table is shipped in (updated_at, key) order from a high-water mark
+kept on the target in sync_state, as multi-row upserts of SYNC_BATCH_SIZE
+rows. Each batch commits together with its new high-water mark, so an
+interrupted run resumes after the last committed batch.
 
-    ubuntu_conn = get_ubuntu_db_connection()
+sync_all_tables() runs tables whose dependencies have finished in parallel
+over a bounded pool of target connections, so a full pass takes about as
+long as its longest dependency chain.
+
+    python sync.py
+"""
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import pymysql
+
+from db import engine, get_ubuntu_db_connection
+
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", 500))
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", 4))
+
+# Rows are stamped when they are written but become visible when they
+# commit, so each run re-reads this far behind the start of the previous one
+SYNC_LOOKBACK_SECONDS = int(os.getenv("SYNC_LOOKBACK_SECONDS", 120))
+
+SYNC_TABLES = [
+    {
+        "table_name": "users",
+        "depends_on": [],
+        "key_columns": ["user_id"],
+        "columns": ["user_id", "username", "user_email", "user_password"],
+        "update_columns": ["user_password"]
+    },
+    {
+        "table_name": "customers",
+        "depends_on": [],
+        "key_columns": ["customer_id"],
+        "columns": ["customer_id", "customer_name", "phone", "email", "address"],
+        "update_columns": ["phone", "email", "address"]
+    },
+    {
+        "table_name": "categories",
+        "depends_on": [],
+        "key_columns": ["category_id"],
+        "columns": ["category_id", "category_name"],
+        "update_columns": ["category_name"]
+    },
+    {
+        "table_name": "products",
+        "depends_on": ["categories"],
+        "key_columns": ["product_id"],
+        "columns": [
+            "product_id",
+            "product_number",
+            "product_name",
+            "product_price",
+            "buying_price",
+            "product_stock",
+            "product_description",
+            "created_at",
+            "category_id_fk",
+            "unit",
+            "expiry_date",
+            "reorder_threshold"
+        ],
+        "update_columns": [
+            "product_name",
+            "product_price",
+            "buying_price",
+            "product_stock",
+            "product_description",
+            "category_id_fk",
+            "unit",
+            "expiry_date",
+            "reorder_threshold"
+        ]
+    },
+    {
+        "table_name": "product_bundles",
+        "depends_on": ["products"],
+        "key_columns": ["bundle_id", "child_product_id"],
+        "columns": [
+            "bundle_id",
+            "parent_product_id",
+            "child_product_id",
+            "quantity",
+            "selling_price"
+        ],
+        "update_columns": ["quantity", "selling_price"]
+    },
+    {
+        "table_name": "raw_materials",
+        "depends_on": [],
+        "key_columns": ["material_id"],
+        "columns": ["material_id", "material_name", "unit"],
+        "update_columns": ["material_name", "unit"]
+    },
+    {
+        "table_name": "product_recipes",
+        "depends_on": ["products", "raw_materials"],
+        "key_columns": ["recipe_id"],
+        "columns": ["recipe_id", "product_id", "material_id", "quantity"],
+        "update_columns": ["quantity"]
+    },
+    {
+        "table_name": "material_supplies",
+        "depends_on": ["raw_materials"],
+        "key_columns": ["supply_id"],
+        "columns": [
+            "supply_id",
+            "material_id",
+            "supplier_name",
+            "quantity",
+            "unit_price",
+            "total_cost"
+        ],
+        "update_columns": ["supplier_name", "unit_price", "total_cost"]
+    },
+    {
+        "table_name": "suppliers",
+        "depends_on": [],
+        "key_columns": ["supplier_id"],
+        "columns": [
+            "supplier_id",
+            "supplier_name",
+            "contact_person",
+            "phone_number",
+            "email",
+            "address"
+        ],
+        "update_columns": ["contact_person", "phone_number", "email", "address"]
+    },
+    {
+        "table_name": "supplier_products",
+        "depends_on": ["suppliers", "products"],
+        "key_columns": ["supplier_product_id"],
+        "columns": [
+            "supplier_product_id",
+            "supplier_id",
+            "product_id",
+            "stock_supplied",
+            "price",
+            "supply_date"
+        ],
+        "update_columns": ["price"]
+    },
+]
+
+
+def ensure_sync_state(ubuntu_conn):
+    with ubuntu_conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                table_name VARCHAR(64) NOT NULL PRIMARY KEY,
+                last_updated_at DATETIME NULL,
+                last_key VARCHAR(255) NULL,
+                caught_up TINYINT(1) NOT NULL DEFAULT 0,
+                run_started_at DATETIME NULL,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        """)
+    ubuntu_conn.commit()
+
+
+def load_sync_state(ubuntu_conn, table_name):
+    with ubuntu_conn.cursor(pymysql.cursors.DictCursor) as cursor:
+        cursor.execute(
+            """
+            SELECT last_updated_at, last_key, caught_up, run_started_at
+            FROM sync_state
+            WHERE table_name = %s
+            """,
+            (table_name,)
+        )
+        return cursor.fetchone()
+
+
+def save_sync_state(cursor, table_name, last_updated_at, last_key, caught_up, run_started_at):
+    cursor.execute(
+        """
+        INSERT INTO sync_state (
+            table_name, last_updated_at, last_key, caught_up, run_started_at
+        )
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            last_updated_at = VALUES(last_updated_at),
+            last_key = VALUES(last_key),
+            caught_up = VALUES(caught_up),
+            run_started_at = VALUES(run_started_at)
+        """,
+        (
+            table_name,
+            last_updated_at,
+            json.dumps(last_key, default=str) if last_key is not None else None,
+            1 if caught_up else 0,
+            run_started_at
+        )
+    )
+
+
+def starting_cursor(state):
+    """
+    (updated_at, key) to read after. key None means every row stamped at or
+    after updated_at. An interrupted run resumes exactly where its last
+    batch committed, a finished one re-reads the lookback window.
+    """
+    if not state or state["last_updated_at"] is None:
+        return None, None
+
+    last_key = json.loads(state["last_key"]) if state["last_key"] else None
+
+    if not state["caught_up"] or state["run_started_at"] is None:
+        return state["last_updated_at"], last_key
+
+    lookback_from = state["run_started_at"] - timedelta(seconds=SYNC_LOOKBACK_SECONDS)
+    if state["last_updated_at"] < lookback_from:
+        return state["last_updated_at"], last_key
+
+    return lookback_from, None
+
+
+def cursor_condition(key_columns, updated_at, last_key):
+    """WHERE clause and params for rows after (updated_at, *last_key)"""
+    if updated_at is None:
+        return "", []
+
+    if last_key is None:
+        return "WHERE updated_at >= %s", [updated_at]
+
+    sort_columns = ["updated_at"] + key_columns
+    sort_values = [updated_at] + list(last_key)
+    clauses = []
+    params = []
+
+    for index, column in enumerate(sort_columns):
+        equal_parts = [f"{col} = %s" for col in sort_columns[:index]]
+        clauses.append("(" + " AND ".join(equal_parts + [f"{column} > %s"]) + ")")
+        params.extend(sort_values[:index] + [sort_values[index]])
+
+    return "WHERE " + " OR ".join(clauses), params
+
+
+class UbuntuConnectionPool:
+    """Bounded pool of target connections shared by the sync workers"""
+
+    def __init__(self, size):
+        self.connections = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        self.slots.acquire()
+
+        try:
+            return self.connections.get_nowait()
+        except queue.Empty:
+            pass
+
+        conn = get_ubuntu_db_connection()
+        if not conn:
+            self.slots.release()
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        else:
+            self.connections.put(conn)
+
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.connections.get_nowait().close()
+            except queue.Empty:
+                return
+            except Exception:
+                pass
+
+
+def sync_table(table_name, key_columns, columns, update_columns,
+               batch_size=SYNC_BATCH_SIZE, ubuntu_conn=None, **_):
+    """
+    Ship one table and return its stats: rows shipped, seconds, rows per
+    second and lag, the age in seconds of the oldest new change when it
+    reached the target. Uses ubuntu_conn if given, otherwise opens its own.
+    """
+    stats = {
+        "table_name": table_name,
+        "ok": False,
+        "rows": 0,
+        "seconds": 0.0,
+        "rows_per_second": 0.0,
+        "lag_seconds": 0.0
+    }
+    started = time.monotonic()
+
+    owns_ubuntu_conn = ubuntu_conn is None
+    if owns_ubuntu_conn:
+        ubuntu_conn = get_ubuntu_db_connection()
     if not ubuntu_conn:
         print(f"❌ Ubuntu DB not available for {table_name}")
-        local_conn.close()
-        return
+        return stats
+
+    local_conn = engine.raw_connection()
 
     try:
-        local_cursor = local_conn.cursor(dictionary=True)
-        ubuntu_cursor = ubuntu_conn.cursor()
+        ensure_sync_state(ubuntu_conn)
+        state = load_sync_state(ubuntu_conn, table_name)
+        updated_at, last_key = starting_cursor(state)
+        previous_mark = state["last_updated_at"] if state else None
+
+        local_cursor = local_conn.cursor(pymysql.cursors.DictCursor)
+        local_cursor.execute("SELECT NOW() AS now")
+        run_started_at = local_cursor.fetchone()["now"]
+
+        select_columns = ", ".join(dict.fromkeys(columns + key_columns + ["updated_at"]))
+        order_by = ", ".join(["updated_at"] + key_columns)
 
         col_str = ", ".join(columns)
+        placeholders = ", ".join(["%s"] * len(columns))
         update_str = ", ".join(f"{col}=VALUES({col})" for col in update_columns)
+        upsert_query = f"""
+            INSERT INTO {table_name} ({col_str})
+            VALUES ({placeholders})
+            ON DUPLICATE KEY UPDATE {update_str}
+        """
 
-        local_cursor.execute(f"SELECT {col_str} FROM {table_name}")
-        rows = local_cursor.fetchall()
-        print(f"📦 Found {len(rows)} rows to sync in {table_name}")
-
-        for row in rows:
-            values = tuple(row[col] for col in columns)
-            placeholders = ", ".join(["%s"] * len(columns))
-            query = f"""
-                INSERT INTO {table_name} ({col_str})
-                VALUES ({placeholders})
-                ON DUPLICATE KEY UPDATE {update_str}
-            """
-            ubuntu_cursor.execute(query, values)
+        while True:
+            where, params = cursor_condition(key_columns, updated_at, last_key)
+
+            local_cursor.execute(
+                f"""
+                SELECT {select_columns}
+                FROM {table_name}
+                {where}
+                ORDER BY {order_by}
+                LIMIT %s
+                """,
+                params + [batch_size]
+            )
+            rows = local_cursor.fetchall()
+            local_conn.commit()
+
+            caught_up = len(rows) < batch_size
+
+            if rows:
+                last_row = rows[-1]
+                updated_at = last_row["updated_at"]
+                last_key = [last_row[col] for col in key_columns]
+
+            with ubuntu_conn.cursor() as ubuntu_cursor:
+                if rows:
+                    # executemany sends the batch as one multi-row INSERT
+                    ubuntu_cursor.executemany(
+                        upsert_query,
+                        [tuple(row[col] for col in columns) for row in rows]
+                    )
+
+                save_sync_state(
+                    ubuntu_cursor, table_name, updated_at, last_key,
+                    caught_up, run_started_at
+                )
+
+            ubuntu_conn.commit()
+            stats["rows"] += len(rows)
+
+            # Rows re-read from the lookback window are not new changes
+            new_stamps = [
+                row["updated_at"] for row in rows
+                if previous_mark is None or row["updated_at"] > previous_mark
+            ]
+            if new_stamps:
+                committed_at = run_started_at + timedelta(seconds=time.monotonic() - started)
+                stats["lag_seconds"] = max(
+                    stats["lag_seconds"],
+                    (committed_at - min(new_stamps)).total_seconds()
+                )
+
+            if caught_up:
+                break
 
-        ubuntu_conn.commit()
-        print(f"✅ {table_name} sync completed successfully")
+        stats["ok"] = True
 
     except Exception as e:
         ubuntu_conn.rollback()
-        print(f"❌ Sync failed for {table_name}:", e)
+        print(f"❌ Sync failed for {table_name} after {stats['rows']} row(s):", e)
 
     finally:
-        local_cursor.close()
-        ubuntu_cursor.close()
         local_conn.close()
-        ubuntu_conn.close()
+        if owns_ubuntu_conn:
+            ubuntu_conn.close()
 
+    stats["seconds"] = time.monotonic() - started
+    if stats["seconds"] > 0:
+        stats["rows_per_second"] = stats["rows"] / stats["seconds"]
 
-def sync_all_tables():
-    # --- USERS table ---
-    sync_table(
-        table_name="users",
-        columns=["username", "user_email", "user_password"],
-        update_columns=["user_password"]
-    )
+    return stats
+
+
+def sync_all_tables(tables=SYNC_TABLES, workers=SYNC_WORKERS):
+    """
+    Sync every table once its depends_on tables have synced, running up to
+    `workers` tables at a time. Tables whose dependencies failed are skipped
+    so the target never receives rows pointing at missing parents.
+    """
+    tables_by_name = {table["table_name"]: table for table in tables}
+    pending = dict(tables_by_name)
+    finished = {}
+    pool = UbuntuConnectionPool(workers)
+    started = time.monotonic()
+
+    def run(table):
+        conn = pool.acquire()
+        if not conn:
+            print(f"❌ Ubuntu DB not available for {table['table_name']}")
+            return {"table_name": table["table_name"], "ok": False, "rows": 0,
+                    "seconds": 0.0, "rows_per_second": 0.0, "lag_seconds": 0.0}
+
+        stats = sync_table(ubuntu_conn=conn, **table)
+        pool.release(conn, broken=not stats["ok"])
+        return stats
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync") as executor:
+        running = {}
+
+        while pending or running:
+            for name, table in list(pending.items()):
+                deps = [dep for dep in table.get("depends_on", []) if dep in tables_by_name]
+
+                if any(dep in finished and not finished[dep]["ok"] for dep in deps):
+                    print(f"⏭ Skipping {name}: a dependency failed")
+                    finished[name] = {"table_name": name, "ok": False, "skipped": True}
+                    del pending[name]
+
+                elif all(dep in finished for dep in deps):
+                    running[executor.submit(run, table)] = name
+                    del pending[name]
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    finished[name] = future.result()
+                except Exception as e:
+                    print(f"❌ Sync failed for {name}:", e)
+                    finished[name] = {"table_name": name, "ok": False}
+
+    pool.close()
+
+    print(f"{'table':<20} {'rows':>8} {'seconds':>9} {'rows/s':>9} {'lag s':>8}")
+    for name in tables_by_name:
+        stats = finished.get(name, {})
+        if not stats.get("ok"):
+            state = "skipped" if stats.get("skipped") else "failed"
+            print(f"{name:<20} {state:>8}")
+            continue
+
+        print(
+            f"{name:<20} {stats['rows']:>8} {stats['seconds']:>9.2f} "
+            f"{stats['rows_per_second']:>9.0f} {stats['lag_seconds']:>8.0f}"
+        )
+
+    print(f"✅ Replication pass finished in {time.monotonic() - started:.2f}s")
+    return finished
 
-    # --- CUSTOMERS table ---
-    sync_table(
-        table_name="customers",
-        columns=["customer_name", "phone", "email", "address"],
-        update_columns=["phone", "email", "address"]
-    )
 
-    sync_table(
-    table_name="products",
-    columns=[
-        "product_number",
-        "product_name",
-        "product_price",
-        "buying_price",
-        "product_stock",
-        "product_description",
-        "created_at",
-        "category_id_fk",
-        "unit",
-        "expiry_date",
-        "reorder_threshold"
-    ],
-    update_columns=[
-        "product_name",
-        "product_price",
-        "buying_price",
-        "product_stock",
-        "product_description",
-        "category_id_fk",
-        "unit",
-        "expiry_date",
-        "reorder_threshold"
-    ]
-)
-
-sync_table(
-    table_name="product_bundles",
-    columns=[
-        "bundle_id",
-        "parent_product_id",
-        "child_product_id",
-        "quantity",
-        "selling_price"
-    ],
-    update_columns=[
-        "quantity",
-        "selling_price"
-    ]
-)
-
-sync_table(
-    table_name="raw_materials",
-    columns=[
-        "material_id",
-        "material_name",
-        "unit"
-    ],
-    update_columns=[
-        "material_name",
-        "unit"
-    ]
-)
-
-sync_table(
-    table_name="product_recipes",
-    columns=[
-        "product_id",
-        "material_id",
-        "quantity"
-    ],
-    update_columns=[
-        "quantity"
-    ]
-)
-
-sync_table(
-    table_name="material_supplies",
-    columns=[
-        "supply_id",
-        "material_id",
-        "supplier_name",
-        "quantity",
-        "unit_price",
-        "total_cost"
-    ],
-    update_columns=[
-        "supplier_name",
-        "unit_price",
-        "total_cost"
-    ]
-)
-
-sync_table(
-    table_name="categories",
-    columns=[
-        "category_id",
-        "category_name"
-    ],
-    update_columns=[
-        "category_name"
-    ]
-)
-
-
-sync_table(
-    table_name="suppliers",
-    columns=[
-        "supplier_id",
-        "supplier_name",
-        "contact_person",
-        "phone_number",
-        "email",
-        "address"
-    ],
-    update_columns=[
-        "contact_person",
-        "phone_number",
-        "email",
-        "address"
-    ]
-)
-
-
-sync_table(
-    table_name="supplier_products",
-    columns=[
-        "supplier_product_id",
-        "supplier_id",
-        "product_id",
-        "stock_supplied",
-        "price",
-        "supply_date"
-    ],
-    update_columns=[
-        "price"
-    ]
-)
-
-
-
-    # --- Add other tables here as needed ---
-
-    # --- PRODUCTS table example ---
-    # sync_table(
-    #     table_name="products",
-    #     columns=["product_id", "name", "price", "stock"],
-    #     update_columns=["price", "stock"]
-    # )
-
-    # --- Add more tables here ---
+if __name__ == "__main__":
+    sync_all_tables()
@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+import sys
+
+# Importing app starts the background workers unless they are switched off
+os.environ.setdefault("OUTBOX_WORKERS", "0")
+os.environ.setdefault("IMPORT_JOB_WORKERS", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,115 @@
+# tests/test_invoices.py
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app as peakers_app
+
+
+def invoices_db():
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"detect_types": sqlite3.PARSE_DECLTYPES, "check_same_thread": False}
+    )
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE invoices (
+                invoice_id INTEGER PRIMARY KEY, invoice_number TEXT, customer_id INTEGER,
+                issue_date TEXT, due_date TEXT, subtotal NUMERIC, vat NUMERIC,
+                discount NUMERIC, total_amount NUMERIC, amount_paid NUMERIC,
+                balance_due NUMERIC, status TEXT, notes TEXT, business_id INTEGER,
+                created_at TIMESTAMP, updated_at TIMESTAMP
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE customers (
+                customer_id INTEGER, customer_name TEXT, phone TEXT, email TEXT,
+                address TEXT, business_id INTEGER
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE invoice_items (
+                invoice_id INTEGER, item_name TEXT, quantity NUMERIC, unit_price NUMERIC,
+                subtotal NUMERIC, product_id INTEGER, business_id INTEGER
+            )
+        """))
+
+        for invoice_id, created_at in (
+            (1, datetime(2026, 1, 1)),
+            (2, None),
+            (3, datetime(2026, 1, 2)),
+            (4, None),
+        ):
+            conn.execute(
+                text("""
+                    INSERT INTO invoices (invoice_id, invoice_number, issue_date, status, business_id, created_at)
+                    VALUES (:invoice_id, :invoice_number, '2026-01-01', 'unpaid', 1, :created_at)
+                """),
+                {"invoice_id": invoice_id, "invoice_number": f"INV-{invoice_id}", "created_at": created_at}
+            )
+
+    return sessionmaker(bind=engine)
+
+
+def invoices_client(monkeypatch):
+    Session = invoices_db()
+
+    @contextmanager
+    def read_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    monkeypatch.setattr(peakers_app, "get_read_db", read_db)
+    monkeypatch.setattr(peakers_app.business_cache, "get", lambda business_id: {})
+
+    client = peakers_app.app.test_client()
+    with client.session_transaction() as session:
+        session["business_id"] = 1
+
+    return client
+
+
+def test_invoice_pages_reach_invoices_without_created_at(monkeypatch):
+    client = invoices_client(monkeypatch)
+
+    seen = []
+    cursor = None
+
+    while True:
+        params = {"limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+
+        response = client.get("/get-invoices", query_string=params)
+        assert response.status_code == 200
+
+        body = response.get_json()
+        seen += [invoice["invoice_id"] for invoice in body["invoices"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == [3, 1, 4, 2]
+
+
+def test_invoice_search_runs_on_the_server(monkeypatch):
+    client = invoices_client(monkeypatch)
+
+    def search(term, **params):
+        response = client.get("/get-invoices", query_string={"search": term, **params})
+        assert response.status_code == 200
+        return [invoice["invoice_id"] for invoice in response.get_json()["invoices"]]
+
+    # Invoices beyond the first page match without loading them first
+    assert search("inv-2", limit=1) == [2]
+    assert search("unpaid") == [3, 1, 4, 2]
+    assert search("%") == []
@@ -0,0 +1,74 @@
+# tests/test_metrics.py
+import re
+
+import pytest
+
+import app as peakers_app
+import query_profiler
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$')
+
+
+@pytest.fixture
+def client():
+    return peakers_app.app.test_client()
+
+
+def parse_metrics(body):
+    """{name: [(labels, value)]} from Prometheus text exposition format"""
+    samples = {}
+
+    for line in body.splitlines():
+        if not line or line.startswith("#"):
+            continue
+
+        match = SAMPLE_LINE.match(line)
+        assert match, f"Malformed metrics line: {line!r}"
+
+        name, labels, value = match.groups()
+        samples.setdefault(name, []).append((labels or "", float(value)))
+
+    return samples
+
+
+def test_metrics_renders_pool_gauges(client, monkeypatch):
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+
+    samples = parse_metrics(response.get_data(as_text=True))
+
+    for key in ("size", "checked_in", "overflow", "total", "connections_in_use"):
+        assert f"peakers_db_pool_{key}" in samples
+
+    assert samples["peakers_db_pool_size"][0][1] == 20
+    assert samples["peakers_db_pool_total"][0][1] >= samples["peakers_db_pool_connections_in_use"][0][1]
+
+
+def test_metrics_counts_previous_requests(client, monkeypatch):
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+
+    client.get("/metrics")
+    samples = parse_metrics(client.get("/metrics").get_data(as_text=True))
+
+    requests_total = dict(samples["peakers_db_requests_total"])
+    assert requests_total['{endpoint="metrics"}'] >= 1
+
+
+def test_metrics_requires_token_when_configured(client, monkeypatch):
+    monkeypatch.setenv("METRICS_TOKEN", "secret")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+def test_slowest_query_is_labelled_by_endpoint_only(monkeypatch):
+    monkeypatch.setattr(query_profiler, "query_metrics", query_profiler.QueryMetrics())
+    query_profiler.query_metrics.record_background("SELECT 1 FROM users WHERE user_id = 7", 0.25)
+
+    samples = parse_metrics(query_profiler.render_metrics())
+
+    assert samples["peakers_db_slowest_query_seconds"] == [('{endpoint="background"}', 0.25)]
@@ -0,0 +1,92 @@
+# tests/test_outbox.py
+import socket
+from email.message import EmailMessage
+
+import pytest
+from aiosmtpd.controller import Controller
+
+import outbox
+
+
+class CollectingHandler:
+    """Accepts every message except those for refused addresses"""
+
+    def __init__(self, refused=()):
+        self.refused = set(refused)
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refused:
+            return "550 Mailbox unavailable"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content))
+        return "250 Message accepted for delivery"
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = CollectingHandler(refused={"refused@example.com"})
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+
+    monkeypatch.setenv("EMAIL_HOST", "127.0.0.1")
+    monkeypatch.setenv("EMAIL_PORT", str(controller.port))
+    monkeypatch.setenv("EMAIL_USE_SSL", "0")
+    monkeypatch.delenv("EMAIL_USER", raising=False)
+    monkeypatch.delenv("EMAIL_PASSWORD", raising=False)
+
+    yield handler
+    controller.stop()
+
+
+def outbox_row(outbox_id, to_email):
+    msg = EmailMessage()
+    msg["Subject"] = f"Invoice {outbox_id}"
+    msg["From"] = "shop@example.com"
+    msg["To"] = to_email
+    msg.set_content("Your invoice is attached")
+
+    return {"outbox_id": outbox_id, "to_email": to_email, "message": msg.as_bytes(), "attempts": 0}
+
+
+def test_worker_delivers_claimed_batch_over_smtp(smtp_server, monkeypatch):
+    rows = [
+        outbox_row(1, "first@example.com"),
+        outbox_row(2, "refused@example.com"),
+        outbox_row(3, "second@example.com"),
+    ]
+    sent, failed = [], []
+
+    monkeypatch.setattr(outbox, "claim_batch", lambda worker_id, batch_size: rows)
+    monkeypatch.setattr(outbox, "mark_sent", sent.extend)
+    monkeypatch.setattr(outbox, "mark_failed", failed.extend)
+
+    assert outbox.OutboxWorker(0).run_once() == 3
+
+    assert sent == [1, 3]
+    assert [(row["outbox_id"], "550" in error) for row, error in failed] == [(2, True)]
+    assert [rcpt_tos for rcpt_tos, _ in smtp_server.messages] == [
+        ["first@example.com"], ["second@example.com"]
+    ]
+    assert b"Subject: Invoice 1" in smtp_server.messages[0][1]
+
+
+def test_unreachable_server_fails_whole_batch(monkeypatch):
+    monkeypatch.setenv("EMAIL_HOST", "127.0.0.1")
+    monkeypatch.setenv("EMAIL_PORT", "1")
+    monkeypatch.setenv("EMAIL_USE_SSL", "0")
+
+    rows = [outbox_row(1, "first@example.com"), outbox_row(2, "second@example.com")]
+    sent_ids, failures = outbox.deliver_batch(rows, outbox.smtp_settings())
+
+    assert sent_ids == []
+    assert [row["outbox_id"] for row, _ in failures] == [1, 2]
@@ -0,0 +1,107 @@
+# tests/test_product_import.py
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import app as peakers_app
+from app import ImportSpool, parse_product_import, write_product_import
+
+
+def catalogue_session():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE categories (
+                category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                business_id INTEGER, category_name TEXT
+            )
+        """))
+        # A failing row stands in for any row the database rejects
+        conn.execute(text("""
+            CREATE TABLE products (
+                product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                business_id INTEGER, product_number TEXT,
+                product_name TEXT CHECK (product_name != 'Rejected'),
+                product_price NUMERIC, buying_price NUMERIC, product_stock NUMERIC,
+                product_description TEXT, category_id_fk INTEGER, unit TEXT,
+                deleted_at TIMESTAMP
+            )
+        """))
+
+    return Session(engine)
+
+
+def sheet(names):
+    return pd.DataFrame({
+        "Product Name": names,
+        "Category": ["Books"] * len(names),
+        "Stock": [5] * len(names),
+        "Buying Price": [100] * len(names),
+        "Selling Price": [150] * len(names),
+        "Unit": ["pcs"] * len(names),
+    })
+
+
+def test_failed_chunk_is_retried_row_by_row():
+    db = catalogue_session()
+    parsed, _ = parse_product_import(sheet(["Atlas", "Rejected", "Bible", "Compass"]), "Imported")
+
+    stats = write_product_import(db, 1, parsed, update_stock=True, chunk_size=3)
+
+    assert stats["imported"] == 3
+    assert [error["row"] for error in stats["errors"]] == [
+        int(parsed.loc[parsed["product_name"] == "Rejected", "row_number"].iloc[0])
+    ]
+
+    names = db.execute(text(
+        "SELECT product_name FROM products WHERE business_id = 1 ORDER BY product_name"
+    )).scalars().all()
+    assert names == ["Atlas", "Bible", "Compass"]
+
+
+def test_new_product_ids_come_from_their_names(monkeypatch):
+    db = catalogue_session()
+    parsed, _ = parse_product_import(sheet(["Atlas", "Bible"]), "Imported")
+    insert_imported_products = peakers_app.insert_imported_products
+
+    def insert_beside_another_writer(db, business_id, rows):
+        db.execute(text("INSERT INTO products (business_id, product_name) VALUES (1, 'Elsewhere')"))
+        insert_imported_products(db, business_id, rows)
+
+    monkeypatch.setattr(peakers_app, "insert_imported_products", insert_beside_another_writer)
+
+    stats = write_product_import(db, 1, parsed, update_stock=True)
+
+    ids = set(db.execute(text(
+        "SELECT product_id FROM products WHERE product_name IN ('Atlas', 'Bible')"
+    )).scalars())
+    assert stats["changed_product_ids"] == ids
+
+
+def test_spooled_sheet_comes_back_as_parsed(tmp_path):
+    spool = ImportSpool(str(tmp_path / "spool"), ttl_seconds=60)
+    parsed, skipped = parse_product_import(sheet(["Atlas", "007"]), "Imported")
+
+    token = spool.put(1, parsed, skipped, "Imported")
+    entry = spool.get(1, token)
+
+    assert entry["default_category"] == "Imported"
+    assert entry["parsed"].to_dict("records") == parsed.to_dict("records")
+    assert spool.get(2, token) is None
+    assert os.stat(spool.directory).st_mode & 0o777 == 0o700
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_spool_refuses_a_directory_others_can_write(tmp_path):
+    directory = tmp_path / "spool"
+    directory.mkdir()
+    directory.chmod(0o777)
+    spool = ImportSpool(str(directory), ttl_seconds=60)
+
+    with pytest.raises(RuntimeError):
+        spool.put(1, parse_product_import(sheet(["Atlas"]), "Imported")[0], 0, "Imported")
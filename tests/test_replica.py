@@ -0,0 +1,50 @@
+# tests/test_replica.py
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+import app as peakers_app
+import db
+
+
+class BlockingReplicaHealth(db.ReplicaHealth):
+    """Lag check that waits until released, standing in for an unreachable replica"""
+
+    def __init__(self):
+        super().__init__(object(), max_lag_seconds=10, check_interval=0)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def measure_lag(self):
+        self.started.set()
+        self.release.wait(5)
+        return 1
+
+
+def test_requests_do_not_wait_for_a_running_lag_check():
+    health = BlockingReplicaHealth()
+    checker = threading.Thread(target=health.available)
+    checker.start()
+    assert health.started.wait(5)
+
+    started = time.monotonic()
+    assert health.available() is False
+    assert time.monotonic() - started < 0.5
+
+    health.release.set()
+    checker.join(5)
+    assert health.usable is True
+
+
+def test_metrics_reports_replica_pool(monkeypatch):
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    monkeypatch.setattr(db, "replica_engine", create_engine("sqlite://", poolclass=QueuePool))
+
+    status = db.get_replica_status()
+    assert status["total"] == status["checked_in"] + status["connections_in_use"]
+
+    body = peakers_app.app.test_client().get("/metrics").get_data(as_text=True)
+    assert "peakers_db_replica_pool_total 0" in body
+    assert "peakers_db_replica_usable 0" in body
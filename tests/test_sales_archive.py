@@ -0,0 +1,150 @@
+# tests/test_sales_archive.py
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app as peakers_app
+import sales_archive
+
+SCHEMA = [
+    """CREATE TABLE {table} (
+        sale_id INTEGER, order_number TEXT, customer_id INTEGER, total_price NUMERIC,
+        payment_type TEXT, sale_date TIMESTAMP, status TEXT, vat NUMERIC,
+        discount NUMERIC, user_id INTEGER, business_id INTEGER, notes TEXT,
+        invoice_id INTEGER
+    )""",
+    """CREATE TABLE {items} (
+        sale_id INTEGER, product_id INTEGER, bundle_id INTEGER, quantity NUMERIC,
+        subtotal NUMERIC, buying_price NUMERIC, profit NUMERIC, business_id INTEGER
+    )""",
+]
+
+
+def orders_db():
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"detect_types": sqlite3.PARSE_DECLTYPES, "check_same_thread": False}
+    )
+
+    with engine.begin() as conn:
+        for table, items in (("sales", "sales_items"), ("sales_archive", "sales_items_archive")):
+            for statement in SCHEMA:
+                conn.execute(text(statement.format(table=table, items=items)))
+
+        conn.execute(text("CREATE TABLE customers (customer_id INTEGER, customer_name TEXT)"))
+        conn.execute(text("CREATE TABLE invoices (invoice_id INTEGER, business_id INTEGER)"))
+        conn.execute(text("INSERT INTO invoices VALUES (5, 1)"))
+        conn.execute(text("CREATE TABLE users (user_id INTEGER, username TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE products (product_id INTEGER, product_name TEXT, "
+            "product_price NUMERIC, business_id INTEGER)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE product_bundles (bundle_id INTEGER, selling_price NUMERIC, "
+            "bundle_buying_price NUMERIC, child_product_id INTEGER, quantity NUMERIC)"
+        ))
+
+        # The archived sale is an unpaid credit sale behind invoice 5
+        for table, items, sale_id, sale_date, payment_type, invoice_id in (
+            ("sales", "sales_items", 2, datetime(2026, 1, 3, 10), "Cash", None),
+            ("sales_archive", "sales_items_archive", 1, datetime(2025, 12, 30, 10), "Credit", 5),
+        ):
+            conn.execute(
+                text(f"""
+                    INSERT INTO {table} VALUES
+                    (:sale_id, :order_number, NULL, 100, :payment_type, :sale_date,
+                     'completed', 0, 0, NULL, 1, NULL, :invoice_id)
+                """),
+                {
+                    "sale_id": sale_id,
+                    "order_number": f"ORD00000{sale_id}",
+                    "sale_date": sale_date,
+                    "payment_type": payment_type,
+                    "invoice_id": invoice_id
+                }
+            )
+            conn.execute(
+                text(f"INSERT INTO {items} VALUES (:sale_id, 7, NULL, 1, 100, 60, 40, 1)"),
+                {"sale_id": sale_id}
+            )
+
+    return sessionmaker(bind=engine)
+
+
+def use_db(monkeypatch, Session):
+    """Serve get_db and get_read_db from Session, with the archive boundary at 2026-01-01"""
+
+    @contextmanager
+    def session_db():
+        session = Session()
+        try:
+            yield session
+            session.commit()
+        finally:
+            session.close()
+
+    monkeypatch.setattr(peakers_app, "get_db", session_db)
+    monkeypatch.setattr(peakers_app, "get_read_db", session_db)
+    monkeypatch.setattr(sales_archive, "archive_state", lambda db: {
+        "archived_before": datetime(2026, 1, 1),
+        "hot_since": None
+    })
+
+    client = peakers_app.app.test_client()
+    with client.session_transaction() as session:
+        session["business_id"] = 1
+        session["user_id"] = 1
+
+    return client
+
+
+def test_tier_source_filters_each_branch():
+    assert sales_archive.tier_source(("sales",), ("sale_id",), "business_id = 1") == "sales"
+
+    source = sales_archive.tier_source(
+        ("sales", "sales_archive"), ("sale_id", "sale_date"), "business_id = 1"
+    )
+    assert source == (
+        "(SELECT sale_id, sale_date FROM sales WHERE business_id = 1 UNION ALL "
+        "SELECT sale_id, sale_date FROM sales_archive WHERE business_id = 1)"
+    )
+
+
+def test_orders_straddling_the_boundary_read_both_tiers(monkeypatch):
+    client = use_db(monkeypatch, orders_db())
+
+    response = client.get("/get-orders?start_date=2025-12-01&end_date=2026-01-31")
+    assert response.status_code == 200
+
+    orders = response.get_json()["orders"]
+    assert [order["sale_id"] for order in orders] == [2, 1]
+    assert [len(order["items"]) for order in orders] == [1, 1]
+
+
+def test_invoice_of_an_archived_sale_cannot_be_deleted(monkeypatch):
+    Session = orders_db()
+    client = use_db(monkeypatch, Session)
+
+    response = client.delete("/delete-invoice/5")
+    assert response.status_code == 409
+
+    with Session() as session:
+        assert session.execute(text("SELECT COUNT(*) FROM invoices")).scalar() == 1
+
+
+def test_credit_payment_settles_an_archived_sale(monkeypatch):
+    Session = orders_db()
+    client = use_db(monkeypatch, Session)
+
+    response = client.post("/mark-credit-paid", json={"sale_id": 1, "payment_type": "Mpesa"})
+    assert response.status_code == 200
+
+    with Session() as session:
+        assert session.execute(
+            text("SELECT payment_type FROM sales_archive WHERE sale_id = 1")
+        ).scalar() == "Mpesa"
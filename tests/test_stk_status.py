@@ -0,0 +1,80 @@
+# tests/test_stk_status.py
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+import app as peakers_app
+import stk_payments
+
+
+@pytest.fixture
+def client():
+    client = peakers_app.app.test_client()
+    with client.session_transaction() as session:
+        session["business_id"] = 7
+    return client
+
+
+def stored_payment(status):
+    return {
+        "reference": "abc123",
+        "phone": "254700000001",
+        "amount": Decimal("150.00"),
+        "status": status,
+        "gateway_status_code": 200,
+        "result_code": None,
+        "result_desc": None,
+        "mpesa_receipt": None,
+        "last_error": None,
+        "created_at": datetime(2026, 1, 5, 10, 0),
+        "updated_at": datetime(2026, 1, 5, 10, 0),
+        "completed_at": None,
+    }
+
+
+class FakeSession:
+    def __init__(self, payment):
+        self.payment = payment
+        self.calls = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params):
+        self.calls += 1
+        assert params == {"reference": "abc123", "business_id": 7}
+        return self
+
+    def mappings(self):
+        return self
+
+    def fetchone(self):
+        return self.payment
+
+
+@pytest.mark.parametrize("callback_base_url, tracks_callbacks", [
+    (None, False),
+    ("https://pos.example.com", True),
+])
+def test_status_is_read_once_without_waiting(client, monkeypatch, callback_base_url, tracks_callbacks):
+    fake = FakeSession(stored_payment("sent"))
+    monkeypatch.setattr(stk_payments, "get_db", lambda: fake)
+    monkeypatch.setattr(stk_payments, "STK_CALLBACK_BASE_URL", callback_base_url)
+
+    response = client.get("/api/stk-push/abc123?wait=20&status=sent")
+
+    assert response.status_code == 200
+    assert fake.calls == 1
+    assert response.json["status"] == "sent"
+    assert response.json["amount"] == 150.0
+    assert response.json["tracks_callbacks"] is tracks_callbacks
+
+
+def test_unknown_reference_is_404(client, monkeypatch):
+    monkeypatch.setattr(stk_payments, "get_db", lambda: FakeSession(None))
+
+    assert client.get("/api/stk-push/abc123").status_code == 404